@@ -1,5 +1,7 @@
 # -*- coding: utf-8; -*-
 """Utilities for GPG signature handling."""
+import os
+
 import gnupg
 
 from django.utils.translation import gettext as _
@@ -9,6 +11,18 @@ from django.conf import settings
 from pharmaship.core.utils import log
 
 
+def remove_file(filename):
+    """Remove a file if it exists.
+
+    :param filename: Path of the file to remove.
+    :type filename: path-like or str
+    """
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
 class KeyManager:
     """Class used to manage PGP keys used for external data import."""
 
@@ -134,6 +148,27 @@ class KeyManager:
             return False
 
         # Then check that it is in the keyring
+        if not self.check_key(verified):
+            return False
+
+        # Decrypt the file
+        log.info(
+            "Package signature correct and verified (%s, %s)",
+            verified.username,
+            verified.key_id[-8:]
+            )
+        return self.gpg.decrypt(signed_data).data
+
+    def check_key(self, verified):
+        """Check the key of a valid signature is in the keyring.
+
+        The key found is stored in ``self.key`` property.
+
+        :param gnupg.Verify verified: Result of the signature verification.
+
+        :return: ``True`` if the key is in the keyring.
+        :rtype: bool
+        """
         self.key = None
         for k in self.gpg.list_keys():
             if k['keyid'] == verified.key_id:
@@ -150,10 +185,42 @@ class KeyManager:
             self.status = _("Signature not in the keyring.")
             return False
 
-        # Decrypt the file
+        return True
+
+    def check_signature_file(self, filename, output):
+        """Check a signed file has a valid known signature.
+
+        The file is streamed to GPG, so the memory used does not depend on
+        its size.
+
+        :param filename: Path of the GPG signed file to verify (armored).
+        :type filename: path-like or str
+        :param output: Path of the file receiving the validated data.
+        :type output: path-like or str
+
+        :return: ``True`` if the signature is valid and the data written to \
+        ``output``, ``False`` otherwise.
+        :rtype: bool
+        """
+        # Verifying the signature and extracting the data in one pass: the
+        # data written is the one which signature is checked
+        result = self.gpg.decrypt_file(str(filename), output=str(output))
+
+        # Check first is the signature is valid
+        if not result.valid:
+            log.warning("Signature not verified: %s", result.status)
+            self.status = _("No signature found.")
+            remove_file(output)
+            return False
+
+        # Then check that it is in the keyring
+        if not self.check_key(result):
+            remove_file(output)
+            return False
+
         log.info(
             "Package signature correct and verified (%s, %s)",
-            verified.username,
-            verified.key_id[-8:]
+            result.username,
+            result.key_id[-8:]
             )
-        return self.gpg.decrypt(signed_data).data
+        return True
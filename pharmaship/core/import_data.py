@@ -6,9 +6,18 @@ import tarfile
 
 import io
 import os
+import bz2
+import gzip
+import lzma
+import shutil
 import hashlib
+import tempfile
 import importlib
 
+from concurrent.futures import ThreadPoolExecutor
+
+from pathlib import Path
+
 from django.conf import settings
 
 # Signature
@@ -17,6 +26,17 @@ from pharmaship.core.gpg import KeyManager
 from pharmaship.core.utils import log
 from pharmaship.core.config import load_config
 
+# Size of the blocks read when streaming files
+CHUNK_SIZE = 64 * 1024
+# Number of threads hashing the package files
+HASH_WORKERS = 4
+# Magic numbers of compressed tar files and their decompression function
+COMPRESSIONS = {
+    b"\x1f\x8b": gzip.open,
+    b"\xfd7zXZ\x00": lzma.open,
+    b"BZh": bz2.open,
+}
+
 
 def extract_manifest(manifest_descriptor):
     """Extract the ``MANIFEST`` information and put it into a list of dict.
@@ -41,51 +61,175 @@ def extract_manifest(manifest_descriptor):
     return result
 
 
+def get_hash(fileobj):
+    """Return the SHA-256 checksum of a file object read by blocks.
+
+    :param file-object fileobj: File object opened in "read binary".
+
+    :return: Hexadecimal checksum.
+    :rtype: str
+    """
+    m = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+        m.update(chunk)
+    return m.hexdigest()
+
+
+def get_member_hash(tar_file, member):
+    """Return the SHA-256 checksum of a regular member of a tar file.
+
+    The member is read with its own file object (or from the in-memory \
+    buffer of the archive) so that several members can be hashed \
+    concurrently. Hashing releases the GIL.
+
+    :param tarfile.Tarfile tar_file: The tar file containing the member.
+    :param tarfile.TarInfo member: Regular (not sparse) member.
+
+    :return: Hexadecimal checksum.
+    :rtype: str
+    """
+    start = member.offset_data
+    end = start + member.size
+    if isinstance(tar_file.fileobj, io.BytesIO):
+        with tar_file.fileobj.getbuffer() as buffer:
+            return hashlib.sha256(buffer[start:end]).hexdigest()
+
+    m = hashlib.sha256()
+    with open(tar_file.name, "rb") as fdesc:
+        fdesc.seek(start)
+        remaining = member.size
+        while remaining > 0:
+            chunk = fdesc.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            m.update(chunk)
+            remaining -= len(chunk)
+    return m.hexdigest()
+
+
+def get_hashes(tar_file, members):
+    """Return the SHA-256 checksum of tar file members.
+
+    Members of uncompressed archives are hashed in a thread pool. Other \
+    members (compressed archive, sparse or special files) are read \
+    sequentially.
+
+    :param tarfile.Tarfile tar_file: The tar file containing the members.
+    :param list(tarfile.TarInfo) members: Members to hash.
+
+    :return: List of hexadecimal checksums (``None`` for members without \
+    content) in the same order as ``members``.
+    :rtype: list(str)
+    """
+    seekable = isinstance(tar_file.fileobj, io.BytesIO) or (
+        isinstance(tar_file.fileobj, io.BufferedReader) and tar_file.name
+        )
+
+    result = [None] * len(members)
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+        for index, member in enumerate(members):
+            if seekable and member.isreg() and not member.issparse():
+                jobs[index] = executor.submit(get_member_hash, tar_file, member)
+                continue
+            fileobj = tar_file.extractfile(member)
+            if fileobj:
+                result[index] = get_hash(fileobj)
+
+        for index, job in jobs.items():
+            result[index] = job.result()
+
+    return result
+
+
 def check_integrity(tar_file):
     """Check the files listed in the ``MANIFEST`` and their checksum.
 
+    All files are checked: every missing or corrupted file is logged.
+
     :param tarfile.Tarfile tar_file: The tar file to check
 
     :return: ``True`` if the content is conform to the MANIFEST.
     :rtype: bool
     """
+    # Index members by name (last occurrence wins, as in tarfile)
+    members = {member.name: member for member in tar_file.getmembers()}
     # Open the MANIFEST
-    names = tar_file.getnames()
-    if "MANIFEST" not in names:
+    if "MANIFEST" not in members:
         log.error("MANIFEST not found.")
         return False
 
-    manifest = extract_manifest(tar_file.extractfile("MANIFEST"))
+    manifest = extract_manifest(tar_file.extractfile(members["MANIFEST"]))
     # TODO: Raise an error when a file (not a directory) in the archive
     # is not in the MANIFEST.
-    # Check the SHA256sum
+    result = True
+    items = []
     for item in manifest:
-        if item['filename'] not in names:
-            log.debug(names)
+        if item['filename'] not in members:
             log.error("File not in the tar file: %s", item['filename'])
-            return False
+            result = False
+            continue
+        items.append(item)
 
-        content = tar_file.extractfile(item['filename']).read()
-        m = hashlib.sha256(content)
-        tarfile_hash = m.hexdigest()
+    # Check the SHA256sum
+    hashes = get_hashes(tar_file, [members[item['filename']] for item in items])
+    for item, tarfile_hash in zip(items, hashes):
         if tarfile_hash != item['hash']:
             log.error("File corrupted: %s", item['filename'])
-            return False
+            result = False
 
-    return True
+    return result
+
+
+def decompress_file(filename, output):
+    """Write the uncompressed content of a compressed tar file.
+
+    Members of an uncompressed tar file on disk can be read directly (see \
+    :func:`get_hashes`), without decompressing the stream from its start.
+
+    :param filename: Path of the tar file (compressed or not).
+    :type filename: path-like or str
+    :param output: Path of the uncompressed tar file to write.
+    :type output: path-like or str
+
+    :return: Path of the uncompressed tar file (``filename`` if it is not \
+    compressed) or ``None`` if the decompression failed.
+    :rtype: path-like or str
+    """
+    with open(filename, "rb") as fdesc:
+        magic = fdesc.read(6)
+
+    for prefix, decompressor in COMPRESSIONS.items():
+        if not magic.startswith(prefix):
+            continue
+        try:
+            with decompressor(filename, "rb") as source, open(output, "wb") as fdesc:
+                shutil.copyfileobj(source, fdesc, CHUNK_SIZE)
+        except (OSError, EOFError, lzma.LZMAError) as error:
+            log.error("Unable to decompress the package. %s", error)
+            Path(output).unlink(missing_ok=True)
+            return None
+        return output
+
+    return filename
 
 
 def check_tarfile(data):
     """Check that the data input is a valid Tar file.
 
-    :param bytes data: binary string issued from GPG armor decoding containing\
-    a tar file.
+    :param data: binary string issued from GPG armor decoding containing\
+    a tar file or path of the file containing it (read from disk when \
+    needed).
+    :type data: bytes or path-like or str
 
     :return: A Tarfile object.
     :rtype: tarfile.TarFile
     """
     try:
-        tar = tarfile.open(fileobj=io.BytesIO(data), mode="r")
+        if isinstance(data, (str, os.PathLike)):
+            tar = tarfile.open(name=data, mode="r")
+        else:
+            tar = tarfile.open(fileobj=io.BytesIO(data), mode="r")
         return tar
     except (tarfile.ReadError, tarfile.CompressionError) as error:
         log.error("File is not a valid Tar file. %s", error)
@@ -122,7 +266,8 @@ class Importer:
     The modules available for importation must have:
         * an ``import_data.py`` file (ie: ``pharmaship.inventory.import_data``)
         * inside this file, a ``DataImport`` class
-        * this class must have an ``update`` method
+        * this class must have an ``update`` method (with a ``dry_run``\
+        argument to support simulated imports)
 
     The package to import must:
         * be an armored GPG-signed file
@@ -153,11 +298,37 @@ class Importer:
 
     def __init__(self):
         self.km = KeyManager()
-        self.content = None
+        self.filename = None
+        self.workdir = None
+        self.archive = None
         self.data = None
         self.status = ''
         self.import_log = []
         self.modules = []
+        # Changes reported by each module DataImport instance
+        self.changes = {}
+
+    def get_workdir(self):
+        """Return the temporary directory of the import.
+
+        The directory is removed by :meth:`close` or when the instance is
+        garbage collected.
+
+        :return: Path of the directory.
+        :rtype: pathlib.Path
+        """
+        if self.workdir is None:
+            self.workdir = tempfile.TemporaryDirectory(prefix="pharmaship-")
+        return Path(self.workdir.name)
+
+    def close(self):
+        """Close the package and remove the temporary files."""
+        if self.archive:
+            self.archive.close()
+            self.archive = None
+        if self.workdir is not None:
+            self.workdir.cleanup()
+            self.workdir = None
 
     def read_package(self, filename):
         """Read the package content.
@@ -165,10 +336,12 @@ class Importer:
         It is normally an armored PGP file with signature. The signed file
         contains a Tar file.
 
-        Content is stored in ``self.content`` property.
+        The content is not loaded in memory: the path of the package is
+        stored in ``self.filename`` property. File objects are copied into a
+        temporary file.
 
         :param filename: path of the file to read.
-        :type filename: path-like or str or bytes
+        :type filename: path-like or str or bytes or io.TextIOWrapper
 
         :return: ``True`` if file is read properly, ``False`` otherwise
         :rtype: bool
@@ -176,8 +349,9 @@ class Importer:
         if isinstance(filename, (str, bytes, os.PathLike)):
             try:
                 with open(filename, "r") as fdesc:
-                    self.content = fdesc.read()
-                    fdesc.close()
+                    # Check the file is a text file, block by block
+                    while fdesc.read(CHUNK_SIZE):
+                        pass
             except IOError as error:
                 log.error("File impossible to read. %s", error)
                 self.status = _("File impossible to read. See detailled log.")
@@ -186,13 +360,17 @@ class Importer:
                 log.error("File impossible to read (not an ASCII file). %s", error)
                 self.status = _("File impossible to read. See detailled log.")
                 return False
+            self.filename = filename
         elif isinstance(filename, io.TextIOWrapper):
+            copy = self.get_workdir() / "package.asc"
             try:
-                self.content = filename.read()
+                with open(copy, "w") as fdesc:
+                    shutil.copyfileobj(filename, fdesc, CHUNK_SIZE)
             except UnicodeDecodeError as error:
                 log.error("File impossible to read (not an ASCII file). %s", error)
                 self.status = _("File impossible to read. See detailled log.")
                 return False
+            self.filename = copy
         else:
             log.error("Filename instance not compatible! What is this?!!")
             self.status = _("File impossible to read. See detailled log.")
@@ -202,19 +380,29 @@ class Importer:
     def check_signature(self):
         """Check the signature of the package.
 
-        Decoded data is stored in ``self.data`` property.
+        Decoded data is written in a temporary file, uncompressed (see
+        :func:`decompress_file`). Its path is stored in ``self.data``
+        property.
 
         :return: ``True`` if the signature is correct, ``False`` otherwise.
         :rtype: bool
         """
-        res = self.km.check_signature(self.content)
+        output = self.get_workdir() / "signed_data"
+        res = self.km.check_signature_file(self.filename, output)
         if not res:
             log.error("Error during signature check: %s", self.km.status)
             self.status = _("Signature not validated. See detailled log.")
             return False
 
+        data = decompress_file(output, self.get_workdir() / "package.tar")
+        if data is None:
+            self.status = _("Signed data is not a valid Tar file. Check logs.")
+            return False
+        if data != output:
+            os.remove(output)
+
         # Save the result in the instance
-        self.data = res
+        self.data = data
         return True
 
     def check_conformity(self):
@@ -265,6 +453,8 @@ class Importer:
         self.import_log.append({'name': _('Package Author'), 'value': self.conf['info']['author']})
         self.import_log.append({'name': _('Package Version'), 'value': self.conf['info']['version']})
         self.import_log.append({'name': _('Package Date'), 'value': self.conf['info']['date']})
+        if 'base_version' in self.conf['info']:
+            self.import_log.append({'name': _('Package Base Version'), 'value': self.conf['info']['base_version']})
 
         # Save the list of the packages and check if the related django application exists.
         self.modules = self.conf['modules']
@@ -276,11 +466,16 @@ class Importer:
                 return False
         return True
 
-    def deploy(self):
+    def deploy(self, dry_run=False):
         """Propagate the import to concerned modules.
 
         For each module listed in the configuration, the import class
-        ``update()`` method is called.
+        ``update()`` method is called. The changes reported by the import
+        class (``changes`` attribute) are stored by module name in
+        ``self.changes``.
+
+        :param bool dry_run: If ``True``, modules compare the package with \
+        the database and report the changes without applying them.
 
         :return: ``True`` if all updates are applied correctly, ``False``\
         otherwise
@@ -302,7 +497,12 @@ class Importer:
                 self.status = _("Target module has no update method. See detailed log.")
                 return False
 
-            step_result = data_import.update()
+            if dry_run:
+                step_result = data_import.update(dry_run=True)
+            else:
+                step_result = data_import.update()
+            self.changes[module] = getattr(data_import, "changes", {})
+
             if not step_result:
                 msg = _("Import of module {0} failed. See detailed logs.").format(module)
                 log.error(msg)
@@ -312,6 +512,9 @@ class Importer:
 
             self.import_log.append({'name': module, 'value': msg})
 
-        self.status = _("Import success.")
+        if dry_run:
+            self.status = _("Import simulation success.")
+        else:
+            self.status = _("Import success.")
 
         return True
@@ -5,12 +5,11 @@ import argparse
 from pathlib import Path
 
 from django.core.management.base import BaseCommand
-from django.utils.text import slugify
 
 from pharmaship.core.utils import log
 
 from pharmaship.inventory import models
-from pharmaship.inventory.export import create_archive
+from pharmaship.inventory.export import create_archive, export_allowances, COMPRESSIONS, DEFAULT_COMPRESSION
 
 
 class Command(BaseCommand):
@@ -31,12 +30,19 @@ class Command(BaseCommand):
 
         all_allowances = sp_allowance.add_parser('all', help="Export all allowances.")
         all_allowances.set_defaults(func=self.export_all_allowances)
+        all_allowances.add_argument("--compression", choices=COMPRESSIONS, default=DEFAULT_COMPRESSION, help="Compression of the tar files (default: %(default)s).")
+        all_allowances.add_argument("--no-compression", action="store_const", dest="compression", const=None, help="Do not compress the tar files.")
+        all_allowances.add_argument("--jobs", type=int, help="Number of export processes (default: number of processors).")
+        all_allowances.add_argument("--directory", type=Path, default=Path("."), help="Output directory.")
 
         single_allowance = sp_allowance.add_parser('id', help="Export one allowance.")
         single_allowance.set_defaults(func=self.allowance)
 
         single_allowance.add_argument("id", type=int, help="ID of the allowance to export. Can be found with export list command.")
         single_allowance.add_argument("filename", help='Output filename', type=argparse.FileType('wb'))
+        single_allowance.add_argument("--compression", choices=COMPRESSIONS, default=DEFAULT_COMPRESSION, help="Compression of the tar file (default: %(default)s).")
+        single_allowance.add_argument("--no-compression", action="store_const", dest="compression", const=None, help="Do not compress the tar file.")
+        single_allowance.add_argument("--base", type=Path, help="Previous package of the allowance: export a delta package.")
 
         parser_list = subparsers.add_parser('list', help='List allowances in database.')
         parser_list.set_defaults(func=self.list_allowance)
@@ -59,7 +65,16 @@ class Command(BaseCommand):
             log.error("Allowance does not exists.")
             exit()
 
-        create_archive(allowance, args["filename"])
+        result = create_archive(
+            allowance,
+            args["filename"],
+            args.get("compression"),
+            base=args.get("base")
+            )
+        args["filename"].close()
+        if not result:
+            log.error("Allowance not exported.")
+            Path(args["filename"].name).unlink(missing_ok=True)
 
     def list_allowance(self, args):
         """List `Allowance` objects in database."""
@@ -69,7 +84,11 @@ class Command(BaseCommand):
             log.info("[{0:02d}]  {1} ({2})".format(item.id, item.name, item.version))
 
     def export_all_allowances(self, args):
-        for item in models.Allowance.objects.exclude(id=0).order_by("id"):
-            archive_name = slugify("allowance_{0}_{1}".format(item.name,  item.version))
-
-            self.allowance({"id": item.id, "filename": Path(archive_name).with_suffix(".tar").open('wb')})
+        """Export all `Allowance` instances in tar files (in parallel)."""
+        allowances = models.Allowance.objects.exclude(id=0).order_by("id")
+        export_allowances(
+            allowances,
+            args["directory"],
+            compression=args["compression"],
+            max_workers=args["jobs"]
+            )
@@ -20,6 +20,11 @@ class Command(BaseCommand):
             help='Package filename.',
             type=argparse.FileType('r')
             )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the changes of the package without applying them."
+            )
 
     def handle(self, *args, **options):  # noqa: D102
         handler = Importer()
@@ -33,4 +38,21 @@ class Command(BaseCommand):
         if not handler.check_conformity():
             exit(handler.status)
 
-        handler.deploy()
+        handler.deploy(dry_run=options["dry_run"])
+        handler.close()
+
+        for module, changes in handler.changes.items():
+            if not changes:
+                log.info("%s: no change.", module)
+            for model, report in changes.items():
+                log.info(
+                    "%s.%s: %s added, %s changed, %s removed.",
+                    module,
+                    model,
+                    len(report["added"]),
+                    len(report["changed"]),
+                    len(report["removed"])
+                    )
+                for kind in ("added", "changed", "removed"):
+                    for label in report[kind]:
+                        log.debug("%s %s: %s", kind.capitalize(), model, label)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8; -*-
+"""Process pool worker utilities.
+
+This module does not import any model: it is loaded by worker processes
+before Django is set up (processes may be spawned instead of forked).
+"""
+import importlib
+
+import django
+from django.apps import apps
+
+
+def init_worker(initializer=None, *args):
+    """Initialize a worker process of a process pool.
+
+    Django is set up if needed, then ``initializer`` is imported and called.
+
+    :param str initializer: Dotted path of a function to call once Django \
+    is ready (ie: ``pharmaship.inventory.export.set_catalog``).
+    :param args: Arguments of ``initializer``.
+    """
+    if not apps.ready:
+        django.setup()
+
+    if initializer:
+        module, name = initializer.rsplit(".", 1)
+        function = getattr(importlib.import_module(module), name)
+        function(*args)
@@ -24,7 +24,7 @@ KEYS = [
 ]
 
 def get_values(key, data):
-    """Return a Dict of values from `data[key]`."""
+    """Return a Dict of values from `data[key]` summary counters."""
     if key not in data:
         return {
             "values": [0, 0, 0, 0, 0],
@@ -37,7 +37,7 @@ def get_values(key, data):
     }
 
     for item in KEYS:
-        result["values"].append(len(data[key][item]))
+        result["values"].append(data[key][item])
     result["values"].append(data[key]["in_range"])
 
     return result
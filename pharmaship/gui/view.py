@@ -19,6 +19,7 @@ from gi.repository import Gtk, Gio, Gdk, GLib
 from django.utils.translation import gettext as _
 from django.utils import translation
 from django.conf import settings
+from django.db import connection
 
 from pharmaship.core.utils import log, end_of_month, add_months, get_content_types, query_count_all
 from pharmaship.core.config import read_config, write_config
@@ -26,12 +27,18 @@ from pharmaship.core.config import read_config, write_config
 from pharmaship.gui import views, export, utils, widgets
 
 from pharmaship.inventory import models
-from pharmaship.inventory.utils import get_location_list
+from pharmaship.inventory.utils import get_location_list, get_location_map
 from pharmaship.inventory import search
+from pharmaship.inventory import fuzzy_index
 
 
 # Constants
 MED_OBS_SHT = "medical_observation_sheet.{0}.pdf"
+# Delay (in milliseconds) without keystroke before searching
+SEARCH_DELAY = 300
+# Distance (in pixels) from the end of the search results triggering the
+# loading of the next page
+SEARCH_THRESHOLD = 200
 
 # Language support
 try:
@@ -94,6 +101,7 @@ class GlobalParameters:
         self.today = end_of_month(datetime.date.today())
         self.content_types = get_content_types()
         self.locations = []
+        self.location_map = {}
 
         self.vessel = self.config.vessel
         self.setting = self.config.inventory
@@ -103,8 +111,9 @@ class GlobalParameters:
         self.refresh_locations()
 
     def refresh_locations(self):
-        """Refresh Location instances list."""
+        """Refresh Location instances list and ID-indexed map."""
         self.locations = get_location_list()
+        self.location_map = get_location_map(self.locations)
         return self.locations
 
     def refresh_setting(self):
@@ -124,7 +133,7 @@ class GlobalParameters:
     def refresh(self):
         self.config = read_config()
         self.content_types = get_content_types()
-        self.locations = get_location_list()
+        self.refresh_locations()
         self.allowances = models.Allowance.objects.filter(active=True)
         self.vessel = self.config.vessel
         self.setting = self.config.inventory
@@ -155,6 +164,17 @@ class AppWindow(Gtk.ApplicationWindow):
         # Set default refresh view action (dummy function)
         self.refresh_view = lambda: None
 
+        # Search state: incremented to cancel in-flight searches
+        self.search_generation = 0
+        self.search_timeout = None
+        self.search_popover = None
+        self.search_listbox = None
+        self.search_scrolled = None
+        # Ranked matches, number of displayed results and page loading flag
+        self.search_matches = []
+        self.search_count = 0
+        self.search_loading = False
+
         self.builder = Gtk.Builder()
         self.builder.set_translation_domain("com.devmaretique.pharmaship")
 
@@ -167,6 +187,20 @@ class AppWindow(Gtk.ApplicationWindow):
 
         self.build_header_bar()
 
+        # Build the fuzzy search index before the first search
+        thread = threading.Thread(target=self.build_fuzzy_index, daemon=True)
+        thread.start()
+
+    def build_fuzzy_index(self):
+        """Build the fuzzy search index in a worker thread."""
+        try:
+            fuzzy_index.get_index()
+        except Exception as error:
+            log.exception("Fuzzy search index build failed: %s", error)
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
     def build_header_bar(self):
         # Header bar
         hb = Gtk.HeaderBar()
@@ -191,6 +225,8 @@ class AppWindow(Gtk.ApplicationWindow):
         self.searchbar = Gtk.SearchEntry()
         self.searchbar.set_placeholder_text(_("Search something..."))
         self.searchbar.connect("activate", self.on_search)
+        self.searchbar.connect("search-changed", self.on_search_changed)
+        self.searchbar.connect("stop-search", self.on_stop_search)
         self.searchbar.props.width_request = 300
         hb.pack_end(self.searchbar)
 
@@ -214,72 +250,243 @@ class AppWindow(Gtk.ApplicationWindow):
         self.create_hb_date_button()
         self.expiry_date_button_label()
 
+    def on_search_changed(self, source):
+        """Schedule a search when no keystroke happens for ``SEARCH_DELAY``."""
+        self.cancel_search()
+        self.search_timeout = GLib.timeout_add(SEARCH_DELAY, self.on_search_timeout, source)
+
+    def on_search_timeout(self, source):
+        """Launch the scheduled search."""
+        self.search_timeout = None
+        return self.on_search(source)
+
+    def on_stop_search(self, source):
+        """Cancel the search and hide the results."""
+        self.cancel_search()
+        if self.search_popover:
+            self.search_popover.popdown()
+
+    def cancel_search(self):
+        """Cancel the scheduled search and ignore in-flight search results."""
+        if self.search_timeout is not None:
+            GLib.source_remove(self.search_timeout)
+            self.search_timeout = None
+        self.search_generation += 1
+
     def on_search(self, source):
+        """Launch the search in a worker thread.
+
+        Results are added to the popover page by page, as soon as each set
+        is parsed.
+        """
+        self.cancel_search()
+
         search_text = source.get_text().strip()
         if len(search_text) < 2:
+            if self.search_popover:
+                self.search_popover.popdown()
+            return False
+
+        thread = threading.Thread(
+            target=self.search_worker,
+            args=(search_text, self.search_generation),
+            daemon=True
+            )
+        thread.start()
+        return False
+
+    def search_worker(self, text, generation):
+        """Search a text in a worker thread.
+
+        The ranked matches are sent to the GTK main loop with
+        ``GLib.idle_add``.
+
+        :param str text: Text to search.
+        :param int generation: Search generation at thread start.
+        """
+        try:
+            matches = search.get_matches(text, fuzzy=True)
+        except Exception as error:
+            log.exception("Search `%s` failed: %s", text, error)
+            matches = []
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+        GLib.idle_add(self.set_search_matches, matches, generation)
+
+    def set_search_matches(self, matches, generation):
+        """Display the first page of the search results.
+
+        :param list(tuple) matches: Ranked matches (see \
+        :func:`pharmaship.inventory.search.get_matches`).
+        :param int generation: Search generation of the matches.
+        """
+        if generation != self.search_generation:
+            return False
+
+        self.create_search_popover()
+        self.search_matches = matches
+
+        if not matches:
+            row = Gtk.ListBoxRow()
+            label = Gtk.Label(_("No result found. Try again!"))
+            row.add(label)
+            self.search_listbox.add(row)
+            self.search_listbox.set_selection_mode(0)
+            self.search_scrolled.set_min_content_height(-1)
+            self.search_scrolled.set_max_content_height(-1)
+            self.search_popover.show_all()
             return False
-        search_result = search.search(search_text, self.params)
+
+        self.load_search_page()
+        return False
+
+    def load_search_page(self):
+        """Parse the next page of search results in a worker thread."""
+        if self.search_loading or self.search_count >= len(self.search_matches):
+            return
+
+        page = self.search_matches[self.search_count:self.search_count + search.PAGE_SIZE]
+        self.search_loading = True
+
+        thread = threading.Thread(
+            target=self.page_worker,
+            args=(page, self.search_generation),
+            daemon=True
+            )
+        thread.start()
+
+    def page_worker(self, page, generation):
+        """Parse a page of search results in a worker thread.
+
+        The results are sent to the GTK main loop with ``GLib.idle_add``. The
+        parsing stops if a new search is launched.
+
+        :param list(tuple) page: Matches to parse (see \
+        :func:`pharmaship.inventory.search.get_matches`).
+        :param int generation: Search generation at thread start.
+        """
+        try:
+            for results in search.parse_matches(page, self.params):
+                if generation != self.search_generation:
+                    log.debug("Search cancelled.")
+                    return
+                GLib.idle_add(self.add_search_results, results, generation)
+            query_count_all()
+        except Exception as error:
+            log.exception("Search results parsing failed: %s", error)
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+        GLib.idle_add(self.end_search_page, generation)
+
+    def create_search_popover(self):
+        """Replace the search results popover by an empty one."""
+        if self.search_popover:
+            self.search_popover.destroy()
 
         # Create a Popover with ListBox
         main_builder = utils.get_builder("search_popover.ui")
         popover = main_builder.get_object("popover")
         popover.set_relative_to(self.searchbar)
+        # Keep the focus in the search bar while typing
+        popover.set_modal(False)
         popover.get_style_context().add_class("popover-search")
         popover.props.width_request = self.searchbar.props.width_request
 
-        listbox = main_builder.get_object("listbox")
+        self.search_popover = popover
+        self.search_listbox = main_builder.get_object("listbox")
+        self.search_scrolled = main_builder.get_object("scrolled")
+        self.search_matches = []
+        self.search_count = 0
+        self.search_loading = False
+
+        # Load next results when scrolling near the end of the list
+        adjustment = self.search_scrolled.get_vadjustment()
+        adjustment.connect("value-changed", self.on_search_scroll)
+        adjustment.connect("changed", self.on_search_scroll)
+
+    def on_search_scroll(self, adjustment):
+        """Load the next page of results if the end of the list is near."""
+        end = adjustment.get_value() + adjustment.get_page_size()
+        if end >= adjustment.get_upper() - SEARCH_THRESHOLD:
+            self.load_search_page()
+
+    def add_search_results(self, results, generation):
+        """Add search results to the popover.
+
+        :param list results: Parsed results. See \
+        ``pharmaship/schemas/search.json`` for details.
+        :param int generation: Search generation of the results.
+        """
+        if generation != self.search_generation:
+            return False
 
-        if len(search_result) == 0:
-            row = Gtk.ListBoxRow()
-            label = Gtk.Label(_("No result found. Try again!"))
-            row.add(label)
-            listbox.add(row)
-            listbox.set_selection_mode(0)
-            popover.show_all()
-            scrolled = main_builder.get_object("scrolled")
-            scrolled.set_min_content_height(-1)
-            scrolled.set_max_content_height(-1)
-            return True
-
-        for item in search_result:
-            builder = utils.get_builder("search_listboxrow.ui")
-            row = Gtk.ListBoxRow()
-            box = builder.get_object("box")
-            row.add(box)
-            listbox.add(row)
-            parent_name = builder.get_object("parent_name")
-            parent_name_text = "<b>{0}</b> ({1})".format(item["parent_name"], item["details"])
-            parent_name.set_markup(parent_name_text)
-            other_names = builder.get_object("other_names")
-            if item["other_names"]:
-                other_names_text = ", ".join(item["other_names"])
-                other_names.set_text(_("Other names: {0}").format(other_names_text))
-            else:
-                other_names.destroy()
-            locations = builder.get_object("locations")
-            if item["locations"]:
-                locations_text = ", ".join(item["locations"])
-                locations.set_text(_("Locations: {0}").format(locations_text))
-            else:
-                locations.destroy()
+        for item in results:
+            self.add_search_row(item)
+        self.search_count += len(results)
 
-            quantity_text = "<b>{0}<small>/{1}</small></b>".format(item["quantity"], item["required"])
-            quantity = builder.get_object("quantity")
-            quantity.set_markup(quantity_text)
+        if results:
+            self.search_popover.show_all()
+        return False
 
-            group = builder.get_object("group")
-            group.set_text(item["group"])
+    def end_search_page(self, generation):
+        """Allow the loading of the next page of results.
 
-            # Type
-            box = builder.get_object("type-box")
-            for item_type in item["type"]:
-                btn = Gtk.LinkButton("", item_type["label"])
-                # Remove the "pseudo" tooltip showing nothing but existing...
-                btn.set_tooltip_text(None)
-                btn.connect("activate-link", self.search_click, item, item_type["name"])
-                box.pack_start(btn, True, True, 0)
+        :param int generation: Search generation of the page.
+        """
+        if generation != self.search_generation:
+            return False
 
-        popover.show_all()
+        self.search_loading = False
+        # The list may be shorter than the popover
+        self.on_search_scroll(self.search_scrolled.get_vadjustment())
+        return False
+
+    def add_search_row(self, item):
+        """Add a search result row to the popover.
+
+        :param dict item: Parsed result. See \
+        ``pharmaship/schemas/search.json`` for details.
+        """
+        builder = utils.get_builder("search_listboxrow.ui")
+        row = Gtk.ListBoxRow()
+        box = builder.get_object("box")
+        row.add(box)
+        self.search_listbox.add(row)
+        parent_name = builder.get_object("parent_name")
+        parent_name_text = "<b>{0}</b> ({1})".format(item["parent_name"], item["details"])
+        parent_name.set_markup(parent_name_text)
+        other_names = builder.get_object("other_names")
+        if item["other_names"]:
+            other_names_text = ", ".join(item["other_names"])
+            other_names.set_text(_("Other names: {0}").format(other_names_text))
+        else:
+            other_names.destroy()
+        locations = builder.get_object("locations")
+        if item["locations"]:
+            locations_text = ", ".join(item["locations"])
+            locations.set_text(_("Locations: {0}").format(locations_text))
+        else:
+            locations.destroy()
+
+        quantity_text = "<b>{0}<small>/{1}</small></b>".format(item["quantity"], item["required"])
+        quantity = builder.get_object("quantity")
+        quantity.set_markup(quantity_text)
+
+        group = builder.get_object("group")
+        group.set_text(item["group"])
+
+        # Type
+        box = builder.get_object("type-box")
+        for item_type in item["type"]:
+            btn = Gtk.LinkButton("", item_type["label"])
+            # Remove the "pseudo" tooltip showing nothing but existing...
+            btn.set_tooltip_text(None)
+            btn.connect("activate-link", self.search_click, item, item_type["name"])
+            box.pack_start(btn, True, True, 0)
 
     def search_click(self, source, item, item_type):
         """Open the related view of the item clicked."""
@@ -401,6 +401,7 @@ class View:
                 return False
 
             res = handler.deploy()
+            handler.close()
             if not res:
                 label.set_text(handler.status)
                 return False
@@ -7,8 +7,10 @@ import tempfile
 import csv
 import json
 import datetime
+import itertools
 import threading
 
+from django.db import connection
 from django.utils.translation import gettext as _
 
 from pharmaship.core.utils import log, query_count_all
@@ -16,6 +18,7 @@ from pharmaship.core.utils import log, query_count_all
 from pharmaship.gui import utils
 
 import pharmaship.inventory.parsers as parsers
+from pharmaship.inventory import summary
 from pharmaship.gui.export.dashboard import Export, ExportMissing, ExportPerished
 from pharmaship.gui.plots import dispatch
 
@@ -319,33 +322,111 @@ class View:
 
         self.warning_date = self.params.today + datetime.timedelta(days=self.params.setting.expire_date_warning_delay)
 
+        # Counters per section (see pharmaship.inventory.summary)
+        self.summary = {}
+        # Detailed elements per section, parsed on demand
         self.data = {}
+        self.generation = 0
+        self.pending = set()
+
+    def get_sections(self):
+        """Return the sections to display with their summary function.
+
+        :return: Dictionary of summary functions indexed by section name.
+        :rtype: dict
+        """
+        sections = {}
+        for section, function in summary.SECTIONS.items():
+            if section == "laboratory" and not self.params.setting.has_laboratory:
+                continue
+            if section == "telemedical" and not self.params.setting.has_telemedical:
+                continue
+            sections[section] = function
+
+        return sections
 
     def set_layout(self, refresh=False):
-        self.get_molecules()
-        self.get_equipment()
-        self.get_rescue_bag()
-        self.get_first_aid_kit()
+        sections = self.get_sections()
 
         widget = self.builder.get_object("laboratory-box-child")
-        if self.params.setting.has_laboratory:
-            self.get_laboratory()
+        if "laboratory" in sections:
             widget.show_all()
         else:
             widget.hide()
 
         widget = self.builder.get_object("telemedical-box-child")
-        if self.params.setting.has_telemedical:
-            self.get_telemedical()
+        if "telemedical" in sections:
             widget.show_all()
         else:
             widget.hide()
 
-        # Set values in the different widgets
+        # Empty values until the sections are computed
+        self.data = {}
+        self.summary = {}
+        for section in SECTIONS:
+            self.summary[section] = summary.new_summary()
         self.set_values(refresh=refresh)
 
-        # Add visual daashboards
-        self.graphic_condition()
+        # Results of a previous layout still running are discarded
+        self.generation += 1
+        self.pending = set(sections)
+
+        # Compute each section in its own thread (and database connection)
+        for section, function in sections.items():
+            thread = threading.Thread(
+                target=self.parse_section,
+                args=(section, function, self.generation),
+                daemon=True
+                )
+            thread.start()
+
+    def parse_section(self, section, function, generation):
+        """Compute a section summary in a worker thread.
+
+        The result is sent to the GTK main loop with ``GLib.idle_add``.
+
+        :param str section: Name of the section (see ``SECTIONS``).
+        :param function function: Function returning the section summary \
+        (see :mod:`pharmaship.inventory.summary`).
+        :param int generation: Layout generation at thread start.
+        """
+        try:
+            data = function(self.params)
+            query_count_all()
+        except Exception as error:
+            log.exception("Section `%s` summary failed: %s", section, error)
+            data = summary.new_summary()
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+        GLib.idle_add(self.update_section, section, data, generation)
+
+    def update_section(self, section, data, generation):
+        """Display a section summary. Called in the GTK main loop.
+
+        The graphics are added once all sections are computed.
+
+        :param str section: Name of the section (see ``SECTIONS``).
+        :param dict data: Section summary (see \
+        :mod:`pharmaship.inventory.summary`).
+        :param int generation: Layout generation of the parsing thread.
+
+        :return: ``False`` to be removed from the main loop sources.
+        :rtype: bool
+        """
+        if generation != self.generation:
+            return False
+
+        self.summary[section] = data
+        self.set_values(refresh=True, sections=[section])
+
+        self.pending.discard(section)
+        if not self.pending:
+            # Add visual dashboards
+            self.graphic_condition()
+
+        return False
 
     def create_main_layout(self):
         """Create the main layout for Dashboard view."""
@@ -414,10 +495,12 @@ class View:
         t = threading.Thread(target=thread_run)
         t.start()
 
-    def set_values(self, refresh=False):
+    def set_values(self, refresh=False, sections=None):
+        if sections is None:
+            sections = SECTIONS.keys()
+
         objects = []
-        import itertools
-        for item in itertools.product(SECTIONS.keys(), TYPES.keys(), WIDGETS):
+        for item in itertools.product(sections, TYPES.keys(), WIDGETS):
             identifier = "-".join(item)
             obj = self.builder.get_object(identifier)
             if not obj:
@@ -444,13 +527,43 @@ class View:
                 obj.get_style_context().remove_class("bold")
 
     def get_value(self, section, type):
-        if section not in self.data:
-            log.warning("Section `%s` not in `self.data`.", section)
+        if section not in self.summary:
+            log.warning("Section `%s` not in `self.summary`.", section)
             return 0
-        if type not in self.data[section]:
-            log.warning("Type `%s` not in `self.data['%s']`.", type, section)
+        if type not in self.summary[section]:
+            log.warning("Type `%s` not in `self.summary['%s']`.", type, section)
             return 0
-        return len(self.data[section][type])
+        return self.summary[section][type]
+
+    def get_details(self, section):
+        """Return the detailed elements of a section.
+
+        Sections are parsed on first use only.
+
+        :param str section: Name of the section (see ``SECTIONS``).
+
+        :return: Section data (see :func:`get_data_items`) or ``None`` if \
+        the section is unknown.
+        :rtype: dict
+        """
+        if section in self.data:
+            return self.data[section]
+
+        functions = {
+            "molecules": self.get_molecules,
+            "equipment": self.get_equipment,
+            "rescue_bag": self.get_rescue_bag,
+            "first_aid_kit": self.get_first_aid_kit,
+            "laboratory": self.get_laboratory,
+            "telemedical": self.get_telemedical,
+        }
+        if section not in functions:
+            log.warning("Section `%s` unknown.", section)
+            return None
+
+        self.data[section] = functions[section]()
+        query_count_all()
+        return self.data[section]
 
     def show_detail(self, source, param):
         builder = utils.get_builder("dashboard_detail.ui")
@@ -510,14 +623,14 @@ class View:
         section = param[0]
         type = param[1]
 
-        if section not in self.data:
-            log.warning("Section `%s` not in `self.data`.", section)
+        data = self.get_details(section)
+        if data is None:
             return None
-        if type not in self.data[section]:
+        if type not in data:
             log.warning("Type `%s` not in `self.data['%s']`.", type, section)
             return None
 
-        elements = self.data[section][type]
+        elements = data[type]
 
         header = get_header(output, section, type)
 
@@ -588,17 +701,17 @@ class View:
         return True
 
     def create_list_store(self, section, type):
-        if section not in self.data:
-            log.warning("Section `%s` not in `self.data`.", section)
+        data = self.get_details(section)
+        if data is None:
             return None
-        if type not in self.data[section]:
+        if type not in data:
             log.warning("Type `%s` not in `self.data['%s']`.", type, section)
             return None
 
         # Name, quantity, exp-date, required_qty
         list_store = Gtk.ListStore(str, str, str)
 
-        elements = self.data[section][type]
+        elements = data[type]
 
         parser = DataParser(elements, section, type, self.params)
         items = parser.get_items()
@@ -627,42 +740,36 @@ class View:
 
     def get_molecules(self):
         data = parsers.medicines.parser(self.params)
-        self.data["molecules"] = get_data_items(data)
-        query_count_all()
+        return get_data_items(data)
 
     def get_equipment(self):
         data = parsers.equipment.parser(self.params)
-        self.data["equipment"] = get_data_items(data)
-        query_count_all()
+        return get_data_items(data)
 
     def get_rescue_bag(self):
         raw_data = parsers.rescue_bag.parser(self.params)
         data = {"data": raw_data["all"]["elements"]}
-        self.data["rescue_bag"] = get_data_items(data)
-        query_count_all()
+        return get_data_items(data)
 
     def get_first_aid_kit(self):
         raw_data = parsers.first_aid.parser(self.params)
         data = {}
         for kit in raw_data:
             data[kit["name"]] = kit["elements"]
-        self.data["first_aid_kit"] = get_data_items(data)
-        query_count_all()
+        return get_data_items(data)
 
     def get_laboratory(self):
         data = {"data": parsers.laboratory.parser(self.params)}
-        self.data["laboratory"] = get_data_items(data)
-        query_count_all()
+        return get_data_items(data)
 
     def get_telemedical(self):
         data = {"data": parsers.telemedical.parser(self.params)}
-        self.data["telemedical"] = get_data_items(data)
-        query_count_all()
+        return get_data_items(data)
 
     # Visual dashboards
     def graphic_condition(self):
         """Create a graph showing situation of elements per category."""
-        canvas = dispatch.figure(self.data, self.params.setting)
+        canvas = dispatch.figure(self.summary, self.params.setting)
         graphicbox = self.builder.get_object("graphics")
         graphicbox.pack_start(canvas, True, True, 0)
         graphicbox.show_all()
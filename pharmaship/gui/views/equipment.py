@@ -32,8 +32,13 @@ class View:
         if isinstance(chosen, int):
             self.chosen = chosen
 
-    def parser(self, params):
-        return parser(params)
+        # Row number and parsed data of each equipment in the grid
+        self.rows = {}
+        # Lazy creation of the grid rows
+        self.lazy = None
+
+    def parser(self, params, parent_ids=None):
+        return parser(params, parent_ids)
 
     def refresh_grid(self):
         # Get present scroll position
@@ -49,18 +54,67 @@ class View:
         if self.toggled:
             toggle_row_num = self.toggled[0] - 1
 
+        # Number of rows to re-create to restore the scroll position
+        realized = self.lazy.realized
+
         # Reset toggled value
         self.toggled = False
         self.chosen = None
         self.row_widget_num = None
+        self.rows = {}
 
         # Re-create the Grid and attach it to the viewport
         grid = self.create_grid(toggle_row_num)
+        self.lazy.realize_until(realized)
 
         viewport.add(grid)
         viewport.show_all()
         viewport.get_vadjustment().set_value(position)
 
+    def refresh_row(self, equipment_id):
+        """Re-parse one equipment and replace its row in the grid.
+
+        The whole grid is refreshed if the equipment appears or disappears.
+
+        :param int equipment_id: ID of the equipment to refresh.
+        """
+        data = self.parser(self.params, parent_ids=[equipment_id])
+        if isinstance(data, dict):
+            equipments = [item for group in data for item in data[group]]
+        else:
+            equipments = data
+
+        if equipment_id not in self.rows or not equipments:
+            self.refresh_grid()
+            return
+
+        viewport = self.scrolled.get_children()[0]
+        grid = viewport.get_children()[0]
+
+        # Close the toggled part to get back to the initial rows numbering
+        toggle_row_num = None
+        if self.toggled:
+            toggle_row_num = self.toggled[0] - 1
+            utils.grid_row_class(grid, toggle_row_num, 7, False)
+            for i in range(self.toggled[1] - self.toggled[0] + 1):
+                grid.remove_row(self.toggled[0])
+            self.toggled = False
+
+        self.chosen = None
+        row_num = self.rows[equipment_id][0]
+        grid.remove_row(row_num)
+        grid.insert_row(row_num)
+        self.create_row(grid, equipments[0], row_num)
+
+        if toggle_row_num:
+            for row, equipment in self.rows.values():
+                if row == toggle_row_num:
+                    self.toggle_article(source=None, grid=grid, equipment=equipment, row_num=row)
+                    break
+
+        grid.show_all()
+        query_count_all()
+
     def grid_header(self, grid):
         # Header
         label = Gtk.Label(_("Name"), xalign=0)
@@ -91,17 +145,55 @@ class View:
         label.set_size_request(125, -1)
         grid.attach(label, 6, 0, 1, 1)
 
-    def create_row(self, grid, equipment, toggle_equipment, toggle_row_num, i):
-        # If toggle_row_num is defined, record first the equipment
-        # then, when all construction is done, call toggle_article
-        # function.
-        if toggle_row_num and toggle_row_num == i:
-            toggle_equipment = equipment
+    def grid_row(self, i):
+        """Return the grid row of the row number `i`.
+
+        Rows created after the toggled part are shifted by its length.
+        """
+        if self.toggled and i >= self.toggled[0]:
+            return i + self.toggled[1] - self.toggled[0] + 1
+        return i
+
+    def create_lazy(self, grid):
+        """Prepare the lazy creation of the rows of `grid`."""
+        if self.lazy:
+            self.lazy.disconnect()
+        self.lazy = widgets.LazyRows(grid, self.scrolled.get_vadjustment())
+
+    def add_row(self, grid, equipment, i):
+        """Register the row `i` of `equipment` for lazy creation."""
+        self.lazy.add(self.create_row, grid, equipment, i)
         if self.chosen and self.chosen == equipment["id"]:
-            toggle_equipment = equipment
-            toggle_row_num = i
             self.row_widget_num = i
 
+    def realize_grid(self, grid, toggle_equipment=None, toggle_row_num=None):
+        """Create the first rows of `grid` and toggle the active one."""
+        # Create at least the rows up to the toggled or chosen one
+        self.lazy.realize_until(max(
+            self.lazy.batch_size,
+            toggle_row_num or 0,
+            self.row_widget_num or 0
+            ))
+
+        # Toggle if active
+        if toggle_row_num and toggle_equipment:
+            self.toggle_article(
+                source=None,
+                grid=grid,
+                equipment=toggle_equipment,
+                row_num=toggle_row_num
+                )
+
+        query_count_all()
+
+    def create_group_row(self, grid, group, i):
+        label = Gtk.Label(group, xalign=0)
+        label.get_style_context().add_class("group-cell")
+        grid.attach(label, 0, self.grid_row(i), 7, 1)
+
+    def create_row(self, grid, equipment, i):
+        row = self.grid_row(i)
+
         label = Gtk.Label(equipment["name"], xalign=0)
         label.set_line_wrap(True)
         label.set_lines(1)
@@ -109,7 +201,7 @@ class View:
         label.get_style_context().add_class("item-cell")
         evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
         evbox.add(label)
-        grid.attach(evbox, 0, i, 1, 1)
+        grid.attach(evbox, 0, row, 1, 1)
 
         label = Gtk.Label(equipment["remark"], xalign=0)
         label.set_line_wrap(True)
@@ -119,7 +211,7 @@ class View:
         label.get_style_context().add_class("article-remark")
         evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
         evbox.add(label)
-        grid.attach(evbox, 1, i, 1, 1)
+        grid.attach(evbox, 1, row, 1, 1)
 
         label = Gtk.Label(equipment["packaging"], xalign=0)
         label.get_style_context().add_class("item-cell")
@@ -128,7 +220,7 @@ class View:
         label.set_line_wrap_mode(2)
         evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
         evbox.add(label)
-        grid.attach(evbox, 2, i, 1, 1)
+        grid.attach(evbox, 2, row, 1, 1)
 
         # Get list of locations
         locations_len = len(equipment["locations"])
@@ -147,7 +239,7 @@ class View:
         label.get_style_context().add_class("item-cell")
         evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
         evbox.add(label)
-        grid.attach(evbox, 3, i, 1, 1)
+        grid.attach(evbox, 3, row, 1, 1)
 
         # Get first expiry date
         date_display = ""
@@ -164,7 +256,7 @@ class View:
 
         evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
         evbox.add(label)
-        grid.attach(evbox, 4, i, 1, 1)
+        grid.attach(evbox, 4, row, 1, 1)
 
         label = Gtk.Label(xalign=0.5)
         label.set_markup("{0}<small>/{1}</small>".format(equipment["quantity"], equipment["required_quantity"]))
@@ -175,7 +267,7 @@ class View:
 
         evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
         evbox.add(label)
-        grid.attach(evbox, 5, i, 1, 1)
+        grid.attach(evbox, 5, row, 1, 1)
 
         # Set tooltip to give information on allowances requirements
         tooltip_text = []
@@ -190,7 +282,7 @@ class View:
             linked_btn.get_style_context().add_class("equipment-item-buttons")
             evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
             evbox.add(linked_btn)
-            grid.attach(evbox, 6, i, 1, 1)
+            grid.attach(evbox, 6, row, 1, 1)
 
             # Picture
             picture = equipment["picture"]
@@ -206,9 +298,9 @@ class View:
             label.get_style_context().add_class("item-cell")
             evbox = widgets.EventBox(equipment, self.toggle_article, 7, i)
             evbox.add(label)
-            grid.attach(evbox, 6, i, 1, 1)
+            grid.attach(evbox, 6, row, 1, 1)
 
-        return toggle_equipment
+        self.rows[equipment["id"]] = (i, equipment)
 
     def create_grid(self, toggle_row_num=None):
         grid = Gtk.Grid()
@@ -217,29 +309,21 @@ class View:
 
         data = self.parser(self.params)
 
+        self.create_lazy(grid)
+
         i = 0
         toggle_equipment = None
         for group in data:
             i += 1
-
-            label = Gtk.Label(group, xalign=0)
-            label.get_style_context().add_class("group-cell")
-            grid.attach(label, 0, i, 7, 1)
+            self.lazy.add(self.create_group_row, grid, group, i)
 
             for equipment in data[group]:
                 i += 1
-                toggle_equipment = self.create_row(grid, equipment, toggle_equipment, toggle_row_num, i)
+                self.add_row(grid, equipment, i)
+                if toggle_row_num and toggle_row_num == i:
+                    toggle_equipment = equipment
 
-        # Toggle if active
-        if toggle_row_num and toggle_equipment:
-            self.toggle_article(
-                source=None,
-                grid=grid,
-                equipment=toggle_equipment,
-                row_num=toggle_row_num
-                )
-
-        query_count_all()
+        self.realize_grid(grid, toggle_equipment, toggle_row_num)
 
         return grid
 
@@ -578,8 +662,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(equipment["id"])
 
     def response_modify(self, source, dialog, article, builder):
         fields = {
@@ -639,8 +723,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(article["equipment"]["id"])
 
     def response_delete(self, source, dialog, article, builder):
         invalid = False
@@ -678,8 +762,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(article["equipment"]["id"])
 
     def response_use(self, source, dialog, article, builder):
         # Get response
@@ -715,8 +799,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(article["equipment"]["id"])
 
     def toggle_article(self, source, grid, equipment, row_num):
         # If already toggled, destroy the toggled part
@@ -4,7 +4,7 @@ gi.require_version("Gtk", "3.0")  # noqa: E402
 from gi.repository import Gtk
 
 
-from pharmaship.core.utils import log, query_count_all
+from pharmaship.core.utils import log
 
 from pharmaship.inventory.parsers.laboratory import parser
 
@@ -15,8 +15,8 @@ class View(EquipmentView):
     def __init__(self, window, chosen=None):
         super().__init__(window, chosen=None)
 
-    def parser(self, params):
-        return parser(params)
+    def parser(self, params, parent_ids=None):
+        return parser(params, parent_ids)
 
     def create_grid(self, toggle_row_num=None):
         grid = Gtk.Grid()
@@ -26,27 +26,17 @@ class View(EquipmentView):
 
         data = parser(self.params)
 
+        self.create_lazy(grid)
+
         i = 0
         toggle_equipment = None
 
         for equipment in data:
             i += 1
-            toggle_equipment = self.create_row(
-                grid, equipment,
-                toggle_equipment,
-                toggle_row_num,
-                i
-                )
-
-        # Toggle if active
-        if toggle_row_num and toggle_equipment:
-            self.toggle_article(
-                source=None,
-                grid=grid,
-                equipment=toggle_equipment,
-                row_num=toggle_row_num
-                )
-
-        query_count_all()
+            self.add_row(grid, equipment, i)
+            if toggle_row_num and toggle_row_num == i:
+                toggle_equipment = equipment
+
+        self.realize_grid(grid, toggle_equipment, toggle_row_num)
 
         return grid
@@ -32,6 +32,11 @@ class View:
         if isinstance(chosen, int):
             self.chosen = chosen
 
+        # Row number and parsed data of each molecule in the grid
+        self.rows = {}
+        # Lazy creation of the grid rows
+        self.lazy = None
+
     def refresh_grid(self):
         # Get present scroll position
         position = self.scrolled.get_vadjustment().get_value()
@@ -46,18 +51,172 @@ class View:
         if self.toggled:
             toggle_row_num = self.toggled[0] - 1
 
+        # Number of rows to re-create to restore the scroll position
+        realized = self.lazy.realized
+
         # Reset toggled value
         self.toggled = False
         self.chosen = None
         self.row_widget_num = None
+        self.rows = {}
 
         # Re-create the Grid and attach it to the viewport
         grid = self.create_grid(toggle_row_num)
+        self.lazy.realize_until(realized)
 
         viewport.add(grid)
         viewport.show_all()
         viewport.get_vadjustment().set_value(position)
 
+    def refresh_row(self, molecule_id):
+        """Re-parse one molecule and replace its row in the grid.
+
+        The whole grid is refreshed if the molecule appears or disappears.
+
+        :param int molecule_id: ID of the molecule to refresh.
+        """
+        data = parser(self.params, parent_ids=[molecule_id])
+        molecules = [item for group in data for item in data[group]]
+
+        if molecule_id not in self.rows or not molecules:
+            self.refresh_grid()
+            return
+
+        viewport = self.scrolled.get_children()[0]
+        grid = viewport.get_children()[0]
+
+        # Close the toggled part to get back to the initial rows numbering
+        toggle_row_num = None
+        if self.toggled:
+            toggle_row_num = self.toggled[0] - 1
+            utils.grid_row_class(grid, toggle_row_num, 7, False)
+            for i in range(self.toggled[1] - self.toggled[0] + 1):
+                grid.remove_row(self.toggled[0])
+            self.toggled = False
+
+        self.chosen = None
+        row_num = self.rows[molecule_id][0]
+        grid.remove_row(row_num)
+        grid.insert_row(row_num)
+        self.create_row(grid, molecules[0], row_num)
+
+        if toggle_row_num:
+            for row, molecule in self.rows.values():
+                if row == toggle_row_num:
+                    self.toggle_medicine(source=None, grid=grid, molecule=molecule, row_num=row)
+                    break
+
+        grid.show_all()
+        query_count_all()
+
+    def grid_row(self, i):
+        """Return the grid row of the row number `i`.
+
+        Rows created after the toggled part are shifted by its length.
+        """
+        if self.toggled and i >= self.toggled[0]:
+            return i + self.toggled[1] - self.toggled[0] + 1
+        return i
+
+    def create_group_row(self, grid, group, i):
+        label = Gtk.Label(group, xalign=0)
+        label.get_style_context().add_class("group-cell")
+        grid.attach(label, 0, self.grid_row(i), 7, 1)
+
+    def create_row(self, grid, molecule, i):
+        row = self.grid_row(i)
+
+        text = molecule["name"]
+        if molecule["remark"]:
+            text += " <span foreground=\"#696969\"><i>({0})</i></span>".format(molecule["remark"])
+
+        label = Gtk.Label(xalign=0)
+        label.set_markup(text)
+        label.set_line_wrap(True)
+        label.set_lines(1)
+        label.set_line_wrap_mode(2)
+        label.get_style_context().add_class("item-cell")
+        evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
+        evbox.add(label)
+        grid.attach(evbox, 0, row, 1, 1)
+
+        label = Gtk.Label(molecule["roa"], xalign=0)
+        label.get_style_context().add_class("item-cell")
+        evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
+        evbox.add(label)
+        grid.attach(evbox, 1, row, 1, 1)
+
+        label = Gtk.Label("{0} ({1})".format(molecule["dosage_form"], molecule["composition"]), xalign=0)
+        label.get_style_context().add_class("item-cell")
+        label.set_line_wrap(True)
+        label.set_lines(1)
+        label.set_line_wrap_mode(2)
+        evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
+        evbox.add(label)
+        grid.attach(evbox, 2, row, 1, 1)
+
+        # Get list of locations
+        locations_len = len(molecule["locations"])
+        if locations_len == 0:
+            locations_display = ""
+        elif locations_len >= 1:
+            molecule["locations"].sort()
+            locations_display = molecule["locations"][0]
+        if locations_len > 1:
+            locations_display += ", ..."
+
+        label = Gtk.Label(locations_display, xalign=0)
+        label.set_line_wrap(True)
+        label.set_lines(1)
+        label.set_line_wrap_mode(2)
+        label.get_style_context().add_class("item-cell")
+        evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
+        evbox.add(label)
+        grid.attach(evbox, 3, row, 1, 1)
+
+        # Get first expiry date
+        date_display = ""
+        if len(molecule["exp_dates"]) > 0:
+            date_display = min(molecule["exp_dates"]).strftime("%Y-%m-%d")
+
+        label = Gtk.Label(date_display, xalign=0.5)
+
+        label.get_style_context().add_class("item-cell")
+        label.get_style_context().add_class("text-mono")
+        if molecule["has_date_expired"]:
+            label.get_style_context().add_class("medicine-expired")
+        elif molecule["has_date_warning"]:
+            label.get_style_context().add_class("medicine-warning")
+        evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
+        evbox.add(label)
+        grid.attach(evbox, 4, row, 1, 1)
+
+        # label = Gtk.Label("{0}/{1}".format(molecule["quantity"], molecule["required_quantity"]), xalign=0.5)
+        label = Gtk.Label(xalign=0.5)
+        label.set_markup("{0}<small>/{1}</small>".format(molecule["quantity"], molecule["required_quantity"]))
+        label.get_style_context().add_class("item-cell")
+        label.get_style_context().add_class("text-mono")
+        # Set style according to quantity
+        utils.quantity_set_style(label, molecule)
+        evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
+        evbox.add(label)
+        grid.attach(evbox, 5, row, 1, 1)
+
+        # Set tooltip to give information on allowances requirements
+        tooltip_text = []
+        for item in molecule["allowance"]:
+            tooltip_text.append("<b>{0}</b> ({1})".format(item["name"], item["quantity"]))
+        label.set_tooltip_markup("\n".join(tooltip_text))
+
+        # Empty item for styling purpose
+        label = Gtk.Label("", xalign=0.5)
+        label.get_style_context().add_class("item-cell")
+        evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
+        evbox.add(label)
+        grid.attach(evbox, 6, row, 1, 1)
+
+        self.rows[molecule["id"]] = (i, molecule)
+
     def create_grid(self, toggle_row_num=None):
         grid = Gtk.Grid()
 
@@ -89,14 +248,15 @@ class View:
 
         data = parser(self.params)
 
+        if self.lazy:
+            self.lazy.disconnect()
+        self.lazy = widgets.LazyRows(grid, self.scrolled.get_vadjustment())
+
         i = 0
         toggle_molecule = None
         for group in data:
             i += 1
-
-            label = Gtk.Label(group, xalign=0)
-            label.get_style_context().add_class("group-cell")
-            grid.attach(label, 0, i, 7, 1)
+            self.lazy.add(self.create_group_row, grid, group, i)
 
             for molecule in data[group]:
                 # Do not show orphans without quantity
@@ -104,9 +264,10 @@ class View:
                     continue
 
                 i += 1
+                self.lazy.add(self.create_row, grid, molecule, i)
 
-                # If toggle_row_num is defined, record first the molecule then,
-                # when all construction is done, call toggle_medicine function.
+                # If toggle_row_num is defined, record first the molecule
+                # then, when the row is created, call toggle_medicine.
                 if toggle_row_num and toggle_row_num == i:
                     toggle_molecule = molecule
                 if self.chosen and self.chosen == molecule["id"]:
@@ -114,94 +275,8 @@ class View:
                     toggle_row_num = i
                     self.row_widget_num = i
 
-                text = molecule["name"]
-                if molecule["remark"]:
-                    text += " <span foreground=\"#696969\"><i>({0})</i></span>".format(molecule["remark"])
-
-                label = Gtk.Label(xalign=0)
-                label.set_markup(text)
-                label.set_line_wrap(True)
-                label.set_lines(1)
-                label.set_line_wrap_mode(2)
-                label.get_style_context().add_class("item-cell")
-                evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
-                evbox.add(label)
-                grid.attach(evbox, 0, i, 1, 1)
-
-                label = Gtk.Label(molecule["roa"], xalign=0)
-                label.get_style_context().add_class("item-cell")
-                evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
-                evbox.add(label)
-                grid.attach(evbox, 1, i, 1, 1)
-
-                label = Gtk.Label("{0} ({1})".format(molecule["dosage_form"], molecule["composition"]), xalign=0)
-                label.get_style_context().add_class("item-cell")
-                label.set_line_wrap(True)
-                label.set_lines(1)
-                label.set_line_wrap_mode(2)
-                evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
-                evbox.add(label)
-                grid.attach(evbox, 2, i, 1, 1)
-
-                # Get list of locations
-                locations_len = len(molecule["locations"])
-                if locations_len == 0:
-                    locations_display = ""
-                elif locations_len >= 1:
-                    molecule["locations"].sort()
-                    locations_display = molecule["locations"][0]
-                if locations_len > 1:
-                    locations_display += ", ..."
-
-                label = Gtk.Label(locations_display, xalign=0)
-                label.set_line_wrap(True)
-                label.set_lines(1)
-                label.set_line_wrap_mode(2)
-                label.get_style_context().add_class("item-cell")
-                evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
-                evbox.add(label)
-                grid.attach(evbox, 3, i, 1, 1)
-
-                # Get first expiry date
-                date_display = ""
-                if len(molecule["exp_dates"]) > 0:
-                    date_display = min(molecule["exp_dates"]).strftime("%Y-%m-%d")
-
-                label = Gtk.Label(date_display, xalign=0.5)
-
-                label.get_style_context().add_class("item-cell")
-                label.get_style_context().add_class("text-mono")
-                if molecule["has_date_expired"]:
-                    label.get_style_context().add_class("medicine-expired")
-                elif molecule["has_date_warning"]:
-                    label.get_style_context().add_class("medicine-warning")
-                evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
-                evbox.add(label)
-                grid.attach(evbox, 4, i, 1, 1)
-
-                # label = Gtk.Label("{0}/{1}".format(molecule["quantity"], molecule["required_quantity"]), xalign=0.5)
-                label = Gtk.Label(xalign=0.5)
-                label.set_markup("{0}<small>/{1}</small>".format(molecule["quantity"], molecule["required_quantity"]))
-                label.get_style_context().add_class("item-cell")
-                label.get_style_context().add_class("text-mono")
-                # Set style according to quantity
-                utils.quantity_set_style(label, molecule)
-                evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
-                evbox.add(label)
-                grid.attach(evbox, 5, i, 1, 1)
-
-                # Set tooltip to give information on allowances requirements
-                tooltip_text = []
-                for item in molecule["allowance"]:
-                    tooltip_text.append("<b>{0}</b> ({1})".format(item["name"], item["quantity"]))
-                label.set_tooltip_markup("\n".join(tooltip_text))
-
-                # Empty item for styling purpose
-                label = Gtk.Label("", xalign=0.5)
-                label.get_style_context().add_class("item-cell")
-                evbox = widgets.EventBox(molecule, self.toggle_medicine, 7, i)
-                evbox.add(label)
-                grid.attach(evbox, 6, i, 1, 1)
+        # Create the first rows (at least up to the toggled one)
+        self.lazy.realize_until(max(self.lazy.batch_size, toggle_row_num or 0))
 
         # Toggle if active
         if toggle_row_num and toggle_molecule:
@@ -551,8 +626,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(molecule["id"])
 
     def response_modify(self, source, dialog, medicine, builder):
         fields = {
@@ -616,8 +691,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(medicine["molecule"]["id"])
 
     def response_delete(self, source, dialog, medicine, builder):
         invalid = False
@@ -656,8 +731,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(medicine["molecule"]["id"])
 
     def response_use(self, source, dialog, medicine, builder):
         # Get response
@@ -693,8 +768,8 @@ class View:
 
         # At the end only
         dialog.destroy()
-        # Refresh the list!
-        self.refresh_grid()
+        # Refresh the row!
+        self.refresh_row(medicine["molecule"]["id"])
 
 
     def toggle_medicine(self, source, grid, molecule, row_num):
@@ -33,6 +33,8 @@ class View:
         }
 
         self.children = {}
+        # Lazy creation of the "all bags" grid rows
+        self.lazy = None
 
     def refresh_single_grid(self, visible_child_name):
         try:
@@ -163,6 +165,11 @@ class View:
         label.set_size_request(45, -1)
         grid.attach(label, 4, 0, 1, 1)
 
+        scrolled = builder.get_object("child-scrolled")
+        if self.lazy:
+            self.lazy.disconnect()
+        self.lazy = widgets.LazyRows(grid, scrolled.get_vadjustment())
+
         i = 0
         toggle_item = None
 
@@ -172,80 +179,10 @@ class View:
             if toggle_row_num and toggle_row_num == i:
                 toggle_item = element
 
-            label = Gtk.Label(element["name"], xalign=0)
-            label.set_line_wrap(True)
-            label.set_lines(1)
-            label.set_line_wrap_mode(2)
-            label.get_style_context().add_class("item-cell")
-            evbox = widgets.EventBox(element, self.toggle_item, 5, i)
-            evbox.add(label)
-            grid.attach(evbox, 0, i, 1, 1)
-
-            label = Gtk.Label(element["remark"], xalign=0)
-            label.set_line_wrap(True)
-            label.set_lines(1)
-            label.set_line_wrap_mode(2)
-            label.get_style_context().add_class("item-cell")
-            label.get_style_context().add_class("article-remark")
-            evbox = widgets.EventBox(element, self.toggle_item, 5, i)
-            evbox.add(label)
-            grid.attach(evbox, 1, i, 1, 1)
-
-            date_display = ""
-            if len(element["exp_dates"]) > 0 and None not in element["exp_dates"]:
-                date_display = min(element["exp_dates"]).strftime("%Y-%m-%d")
-
-            label = Gtk.Label(date_display, xalign=0.5)
-            label.get_style_context().add_class("item-cell")
-            label.get_style_context().add_class("text-mono")
-            if element["has_date_expired"]:
-                label.get_style_context().add_class("article-expired")
-            elif element["has_date_warning"]:
-                label.get_style_context().add_class("article-warning")
-            evbox = widgets.EventBox(element, self.toggle_item, 5, i)
-            evbox.add(label)
-            grid.attach(evbox, 2, i, 1, 1)
-
-            label = Gtk.Label(xalign=0.5)
-            label.set_markup("{0}<small>/{1}</small>".format(element["quantity"], element["required_quantity"]))
-            label.get_style_context().add_class("item-cell")
-            label.get_style_context().add_class("text-mono")
-            # Set style according to quantity
-            utils.quantity_set_style(label, element)
-            evbox = widgets.EventBox(element, self.toggle_item, 5, i)
-            evbox.add(label)
-            grid.attach(evbox, 3, i, 1, 1)
-
-            # Set tooltip to give information on allowances requirements
-            tooltip_text = []
-            for item in element["allowance"]:
-                tooltip_text.append("<b>{0}</b> ({1})".format(item["name"], item["quantity"]))
-            label.set_tooltip_markup("\n".join(tooltip_text))
+            self.lazy.add(self.create_full_row, grid, element, i)
 
-            if element["picture"]:
-                # Button box for actions
-                linked_btn = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
-                linked_btn.get_style_context().add_class("linked")
-                linked_btn.get_style_context().add_class("article-item-buttons")
-                evbox = widgets.EventBox(element, self.toggle_item, 5, i)
-                evbox.add(linked_btn)
-                grid.attach(evbox, 4, i, 1, 1)
-
-                # Picture
-                picture = element["picture"]
-                btn_picture = widgets.ButtonWithImage(
-                    "image-x-generic-symbolic.svg",
-                    tooltip=_("View picture"),
-                    connect=utils.picture_frame,
-                    data=picture
-                    )
-                linked_btn.pack_end(btn_picture, False, True, 0)
-            else:
-                label = Gtk.Label("", xalign=0.5)
-                label.get_style_context().add_class("item-cell")
-                evbox = widgets.EventBox(element, self.toggle_item, 5, i)
-                evbox.add(label)
-                grid.attach(evbox, 4, i, 1, 1)
+        # Create the first rows (at least up to the toggled one)
+        self.lazy.realize_until(max(self.lazy.batch_size, toggle_row_num or 0))
 
         # Toggle if active
         if toggle_row_num and toggle_item:
@@ -260,6 +197,94 @@ class View:
 
         query_count_all()
 
+    def grid_row(self, i, bag_id=0):
+        """Return the grid row of the row number `i` of a bag grid.
+
+        Rows created after the toggled part are shifted by its length.
+        """
+        toggled = self.toggled[bag_id]
+        if toggled and i >= toggled[0]:
+            return i + toggled[1] - toggled[0] + 1
+        return i
+
+    def create_full_row(self, grid, element, i):
+        row = self.grid_row(i)
+
+        label = Gtk.Label(element["name"], xalign=0)
+        label.set_line_wrap(True)
+        label.set_lines(1)
+        label.set_line_wrap_mode(2)
+        label.get_style_context().add_class("item-cell")
+        evbox = widgets.EventBox(element, self.toggle_item, 5, i)
+        evbox.add(label)
+        grid.attach(evbox, 0, row, 1, 1)
+
+        label = Gtk.Label(element["remark"], xalign=0)
+        label.set_line_wrap(True)
+        label.set_lines(1)
+        label.set_line_wrap_mode(2)
+        label.get_style_context().add_class("item-cell")
+        label.get_style_context().add_class("article-remark")
+        evbox = widgets.EventBox(element, self.toggle_item, 5, i)
+        evbox.add(label)
+        grid.attach(evbox, 1, row, 1, 1)
+
+        date_display = ""
+        if len(element["exp_dates"]) > 0 and None not in element["exp_dates"]:
+            date_display = min(element["exp_dates"]).strftime("%Y-%m-%d")
+
+        label = Gtk.Label(date_display, xalign=0.5)
+        label.get_style_context().add_class("item-cell")
+        label.get_style_context().add_class("text-mono")
+        if element["has_date_expired"]:
+            label.get_style_context().add_class("article-expired")
+        elif element["has_date_warning"]:
+            label.get_style_context().add_class("article-warning")
+        evbox = widgets.EventBox(element, self.toggle_item, 5, i)
+        evbox.add(label)
+        grid.attach(evbox, 2, row, 1, 1)
+
+        label = Gtk.Label(xalign=0.5)
+        label.set_markup("{0}<small>/{1}</small>".format(element["quantity"], element["required_quantity"]))
+        label.get_style_context().add_class("item-cell")
+        label.get_style_context().add_class("text-mono")
+        # Set style according to quantity
+        utils.quantity_set_style(label, element)
+        evbox = widgets.EventBox(element, self.toggle_item, 5, i)
+        evbox.add(label)
+        grid.attach(evbox, 3, row, 1, 1)
+
+        # Set tooltip to give information on allowances requirements
+        tooltip_text = []
+        for item in element["allowance"]:
+            tooltip_text.append("<b>{0}</b> ({1})".format(item["name"], item["quantity"]))
+        label.set_tooltip_markup("\n".join(tooltip_text))
+
+        if element["picture"]:
+            # Button box for actions
+            linked_btn = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+            linked_btn.get_style_context().add_class("linked")
+            linked_btn.get_style_context().add_class("article-item-buttons")
+            evbox = widgets.EventBox(element, self.toggle_item, 5, i)
+            evbox.add(linked_btn)
+            grid.attach(evbox, 4, row, 1, 1)
+
+            # Picture
+            picture = element["picture"]
+            btn_picture = widgets.ButtonWithImage(
+                "image-x-generic-symbolic.svg",
+                tooltip=_("View picture"),
+                connect=utils.picture_frame,
+                data=picture
+                )
+            linked_btn.pack_end(btn_picture, False, True, 0)
+        else:
+            label = Gtk.Label("", xalign=0.5)
+            label.get_style_context().add_class("item-cell")
+            evbox = widgets.EventBox(element, self.toggle_item, 5, i)
+            evbox.add(label)
+            grid.attach(evbox, 4, row, 1, 1)
+
     def build_bags(self, data, bags):
         # Get the location_id of all bags to avoid the possibility to select a
         # bag as a location.
@@ -1,3 +1,4 @@
 from pharmaship.gui.widgets.button import ButtonWithImage
 from pharmaship.gui.widgets.entry import EntryMasked
 from pharmaship.gui.widgets.eventbox import EventBox
+from pharmaship.gui.widgets.lazy import LazyRows
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Lazy creation of Gtk.Grid rows."""
+import collections
+
+# Number of rows created at once
+BATCH_SIZE = 40
+# Distance (in pixels) from the end of the scrolled area triggering the
+# creation of the next rows
+THRESHOLD = 400
+
+
+class LazyRows:
+    """Create the rows of a grid only when they are about to be displayed.
+
+    Rows are registered with a function creating their widgets. The first
+    rows are created immediately, the next ones when the user scrolls near
+    the end of the already created rows.
+    """
+
+    def __init__(self, grid, adjustment, batch_size=BATCH_SIZE):
+        """Initialize the loader.
+
+        :param Gtk.Grid grid: Grid receiving the rows.
+        :param Gtk.Adjustment adjustment: Vertical adjustment of the \
+        scrolled window displaying the grid.
+        :param int batch_size: Number of rows created at once.
+        """
+        self.grid = grid
+        self.adjustment = adjustment
+        self.batch_size = batch_size
+
+        self.pending = collections.deque()
+        # Number of rows already created
+        self.realized = 0
+
+        self.handlers = [
+            adjustment.connect("value-changed", self.check),
+            adjustment.connect("changed", self.check),
+        ]
+
+    def add(self, function, *args):
+        """Register a row.
+
+        :param function function: Function creating the row widgets.
+        :param args: Arguments of ``function``.
+        """
+        self.pending.append((function, args))
+
+    def realize(self, count=None):
+        """Create the next rows.
+
+        :param int count: Number of rows to create. If ``None``, \
+        ``batch_size`` rows are created.
+
+        :return: ``True`` if some rows are still pending.
+        :rtype: bool
+        """
+        if count is None:
+            count = self.batch_size
+
+        while self.pending and count > 0:
+            function, args = self.pending.popleft()
+            function(*args)
+            self.realized += 1
+            count -= 1
+
+        self.grid.show_all()
+
+        if not self.pending:
+            self.disconnect()
+
+        return len(self.pending) > 0
+
+    def realize_until(self, count):
+        """Create rows until ``count`` rows are created.
+
+        :param int count: Total number of rows to create.
+        """
+        if count > self.realized:
+            self.realize(count - self.realized)
+
+    def check(self, adjustment):
+        """Create the next rows if the end of the grid is near."""
+        if not self.pending:
+            return
+
+        end = adjustment.get_value() + adjustment.get_page_size()
+        if end >= adjustment.get_upper() - THRESHOLD:
+            self.realize()
+
+    def disconnect(self):
+        """Disconnect the adjustment signals."""
+        for handler in self.handlers:
+            if self.adjustment.handler_is_connected(handler):
+                self.adjustment.disconnect(handler)
+        self.handlers = []
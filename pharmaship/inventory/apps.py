@@ -0,0 +1,16 @@
+# -*- coding: utf-8; -*-
+"""Inventory application configuration."""
+from django.apps import AppConfig
+
+
+class InventoryConfig(AppConfig):
+    """Inventory application configuration.
+
+    Connect the signal handlers when the application is ready.
+    """
+
+    name = "pharmaship.inventory"
+    label = "inventory"
+
+    def ready(self):  # noqa: D102
+        from pharmaship.inventory import signals  # noqa: F401
@@ -1,33 +1,213 @@
 # -*- coding: utf-8; -*-
 """Export methods for Inventory application."""
 import tarfile
+import pickle
 import time
+import json
 import io
 
 import hashlib
 
-from pathlib import PurePath
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePath
 
-from yaml import dump
+from yaml import load, dump
 try:
-    from yaml import CDumper as Dumper
+    from yaml import CLoader as Loader, CDumper as Dumper
 except ImportError:
-    from yaml import Dumper
+    from yaml import Loader, Dumper
 
-from django.core import serializers
 from django.conf import settings
+from django.db import connections
 from django.utils.text import slugify
 
-from rest_framework.renderers import JSONRenderer
-
 import pharmaship.inventory.models as models
-import pharmaship.inventory.serializers
+import pharmaship.inventory.utils as utils
 
-from pharmaship.core.utils import remove_yaml_pk, get_content_types
+from pharmaship.core.import_data import extract_manifest
+from pharmaship.core.utils import get_content_types
+from pharmaship.core.worker import init_worker
 from pharmaship.core.utils import log, query_count_all
 
 
-def serialize_allowance(allowance, content_types):
+# Required quantities files: (filename, model, kind of base).
+# Kind is ``None`` for models with a generic relation to their base.
+REQUIRED = [
+    ("inventory/molecule_reqqty.json", models.MoleculeReqQty, "molecule"),
+    ("inventory/equipment_reqqty.json", models.EquipmentReqQty, "equipment"),
+    ("inventory/laboratory_reqqty.json", models.LaboratoryReqQty, "equipment"),
+    ("inventory/telemedical_reqqty.json", models.TelemedicalReqQty, "equipment"),
+    ("inventory/first_aid_kit_reqqty.json", models.FirstAidKitReqQty, None),
+    ("inventory/rescue_bag_reqqty.json", models.RescueBagReqQty, None),
+]
+
+# Exported fields of Molecule and Equipment objects
+MOLECULE_FIELDS = (
+    "name_en",
+    "composition_en",
+    "remark_en",
+    "roa",
+    "dosage_form",
+    "medicine_list",
+    )
+EQUIPMENT_FIELDS = (
+    "name_en",
+    "packaging_en",
+    "remark_en",
+    "consumable",
+    "perishable",
+    )
+ALLOWANCE_FIELDS = ("name", "author", "version", "date", "additional")
+
+# Natural key fields of objects in YAML files (see DELTA_FILES)
+MOLECULE_KEY = ("name_en", "roa", "dosage_form", "composition_en")
+EQUIPMENT_KEY = ("name_en", "packaging_en", "consumable", "perishable")
+
+# Serialized files of a delta package: only modified entries are exported
+DELTA_FILES = {
+    "inventory/molecule_obj.yaml": MOLECULE_KEY,
+    "inventory/equipment_obj.yaml": EQUIPMENT_KEY,
+}
+DELTA_FILES.update({item[0]: None for item in REQUIRED})
+
+# Size of the blocks read when hashing files
+CHUNK_SIZE = 64 * 1024
+# Available compressions of the package tar file
+COMPRESSIONS = ("gz", "xz")
+DEFAULT_COMPRESSION = "gz"
+
+
+def get_yaml_object(instance, fields):
+    """Return the serializable data of an instance (without primary key).
+
+    The structure is the one of Django serializers: ``model`` and ``fields``
+    keys.
+
+    :param instance: Instance to serialize.
+    :param tuple(str) fields: Fields to export.
+
+    :return: Dictionary with model label and fields values.
+    :rtype: dict
+    """
+    return {
+        "model": instance._meta.label_lower,
+        "fields": {field: getattr(instance, field) for field in fields},
+    }
+
+
+def get_yaml_objects(instances, fields, pictures=None):
+    """Return the data of Molecule or Equipment objects for a YAML export.
+
+    The group is exported with its natural key and the picture (of
+    Equipment objects) with its name in the archive.
+
+    :param list instances: Molecule or Equipment instances.
+    :param tuple(str) fields: Fields to export.
+    :param dict pictures: Archive names of pictures indexed by picture \
+    name (see :func:`get_pictures`). Pictures not found keep their name.
+
+    :return: List of dictionaries (see :func:`get_yaml_object`).
+    :rtype: list(dict)
+    """
+    result = []
+    for instance in instances:
+        data = get_yaml_object(instance, fields)
+        data["fields"]["group"] = list(instance.group.natural_key())
+        if hasattr(instance, "picture"):
+            name = instance.picture.name
+            data["fields"]["picture"] = (pictures or {}).get(name) or name
+        result.append(data)
+    return result
+
+
+def render_json(data):
+    """Render a required quantities list in JSON (indented).
+
+    :param list(dict) data: Data to render.
+
+    :return: UTF-8 encoded JSON.
+    :rtype: bytes
+    """
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+
+def get_objects(model):
+    """Return the queryset of exported Molecule or Equipment objects.
+
+    Objects are loaded with their group and sorted in a deterministic order
+    (default ordering of the model, then ID).
+
+    :param model: Model class.
+    :type model: models.Molecule or models.Equipment
+
+    :return: Queryset of all objects.
+    :rtype: django.db.models.query.QuerySet
+    """
+    return model.objects.select_related("group").order_by(*model._meta.ordering, "id")
+
+
+def get_catalog():
+    """Return all Molecule and Equipment instances (with their group).
+
+    The catalog can be shared by exports of several allowances (see \
+    :func:`serialize_allowance`). Archive names of all pictures are computed
+    once (see :func:`get_pictures`).
+
+    :return: Dictionary indexed by kind (``molecule``, ``equipment``) of \
+    instances indexed by ID (in default ordering of models) and archive \
+    names of pictures (``pictures``).
+    :rtype: dict
+    """
+    catalog = {
+        "molecule": {
+            item.id: item for item in get_objects(models.Molecule)
+        },
+        "equipment": {
+            item.id: item for item in get_objects(models.Equipment)
+        },
+    }
+    catalog["pictures"] = get_pictures(catalog["equipment"].values())
+    return catalog
+
+
+def get_required(allowance_list, content_types):
+    """Return the required quantities of allowances.
+
+    One query is done per required quantity model, whatever the number of
+    allowances.
+
+    :param list(models.Allowance) allowance_list: Allowances to export.
+    :param dict content_types: Content types ID indexed by model name (see \
+    :func:`pharmaship.core.utils.get_content_types`).
+
+    :return: Dictionary indexed by allowance ID of lists of tuples \
+    (filename, kind, rows) for each file of ``REQUIRED``. Rows are tuples \
+    (kind of base, base ID, required quantity).
+    :rtype: dict
+    """
+    kinds = {content_types["molecule"]: "molecule", content_types["equipment"]: "equipment"}
+
+    result = {allowance.id: [] for allowance in allowance_list}
+    for filename, model, kind in REQUIRED:
+        rows = {allowance_id: [] for allowance_id in result}
+        queryset = model.objects.filter(allowance_id__in=result.keys()).order_by("id")
+        if kind:
+            for allowance_id, base_id, quantity in queryset.values_list(
+                    "allowance_id", "base_id", "required_quantity"):
+                rows[allowance_id].append((kind, base_id, quantity))
+        else:
+            for allowance_id, content_type_id, object_id, quantity in queryset.filter(
+                    content_type_id__in=kinds.keys()
+                    ).values_list("allowance_id", "content_type_id", "object_id", "required_quantity"):
+                rows[allowance_id].append((kinds[content_type_id], object_id, quantity))
+
+        for allowance_id in result:
+            result[allowance_id].append((filename, kind, rows[allowance_id]))
+
+    return result
+
+
+def serialize_allowance(allowance, content_types, catalog=None, required=None, pictures=None):
     """Export an allowance using the YAML format.
 
     To have an usable export, the user needs:
@@ -52,176 +232,165 @@ def serialize_allowance(allowance, content_types):
 
     In addition, it returns the Equipment and Molecule lists.
 
+    Data is collected with one query per required quantity model and one
+    query for each of Molecule and Equipment models, whatever the size of
+    the allowance. Files are generated without primary keys.
+
+    When ``catalog`` and ``required`` are given, no query is done: several
+    allowances can be serialized with the same preloaded data.
+
     :param pharmaship.inventory.models.Allowance allowance: Allowance to \
     serialize.
+    :param dict content_types: Content types ID indexed by model name (see \
+    :func:`pharmaship.core.utils.get_content_types`). Not used if \
+    ``required`` is given.
+    :param dict catalog: Molecule and Equipment instances (see \
+    :func:`get_catalog`). If ``None``, used instances are queried.
+    :param list required: Required quantities of the allowance (see \
+    :func:`get_required`). If ``None``, they are queried.
+    :param dict pictures: Archive names of pictures already computed (see \
+    :func:`get_pictures`), completed with the pictures of the allowance. \
+    If ``None``, the ones of ``catalog`` are used.
 
     :return: List of tuples filenames and streams
     :rtype: tuple(list(tuple(str, str)), django.db.models.query.QuerySet, \
-    django.db.models.query.QuerySet)
+    django.db.models.query.QuerySet) (lists when ``catalog`` is given)
     """
     log.debug("Start serialize")
 
-    renderer = JSONRenderer()
-    # Molecules used by the allowance
-    molecule_id_list = []
-    equipment_id_list = []
-
-    # Required quantities for molecules
-    molecule_reqqty_list = models.MoleculeReqQty.objects.filter(allowance__in=[allowance]).prefetch_related("base")
-    molecule_id_list += molecule_reqqty_list.values_list("base_id", flat=True)
+    if required is None:
+        required = get_required([allowance], content_types)[allowance.id]
 
-    serialized = pharmaship.inventory.serializers.MoleculeReqQtySerializer(molecule_reqqty_list, many=True)
-    molecule_reqqty_data = renderer.render(
-        data=serialized.data,
-        accepted_media_type='application/json; indent=2'
-        )
-    query_count_all()
+    id_lists = {"molecule": set(), "equipment": set()}
+    for _filename, _kind, rows in required:
+        for row in rows:
+            id_lists[row[0]].add(row[1])
 
-    # Required quantities for equipments
-    equipment_reqqty_list = models.EquipmentReqQty.objects.filter(allowance__in=[allowance]).prefetch_related("base")
-    equipment_id_list += equipment_reqqty_list.values_list("base_id", flat=True)
-
-    serialized = pharmaship.inventory.serializers.EquipmentReqQtySerializer(equipment_reqqty_list, many=True)
-    equipment_reqqty_data = renderer.render(
-        data=serialized.data,
-        accepted_media_type='application/json; indent=2'
-        )
-    query_count_all()
-
-    # Required quantities for Laboratory
-    laboratory_reqqty_list = models.LaboratoryReqQty.objects.filter(allowance__in=[allowance]).prefetch_related("base")
-    equipment_id_list += laboratory_reqqty_list.values_list("base_id", flat=True)
-
-    serialized = pharmaship.inventory.serializers.LaboratoryReqQtySerializer(laboratory_reqqty_list, many=True)
-    laboratory_reqqty_data = renderer.render(
-        data=serialized.data,
-        accepted_media_type='application/json; indent=2'
-        )
-    query_count_all()
-
-    # Required quantities for Telemedical
-    telemedical_reqqty_list = models.TelemedicalReqQty.objects.filter(allowance__in=[allowance]).prefetch_related("base")
-    equipment_id_list += telemedical_reqqty_list.values_list("base_id", flat=True)
-
-    serialized = pharmaship.inventory.serializers.TelemedicalReqQtySerializer(telemedical_reqqty_list, many=True)
-    telemedical_reqqty_data = renderer.render(
-        data=serialized.data,
-        accepted_media_type='application/json; indent=2'
-        )
-    query_count_all()
-
-    # Required quantities for First Aid Kit
-    first_aid_kit_reqqty_list = models.FirstAidKitReqQty.objects.filter(allowance__in=[allowance]).prefetch_related("base")
-    molecule_id_list += first_aid_kit_reqqty_list.filter(
-        content_type_id=content_types["molecule"]
-        ).values_list("object_id", flat=True)
-    equipment_id_list += first_aid_kit_reqqty_list.filter(
-        content_type_id=content_types["equipment"]
-        ).values_list("object_id", flat=True)
-
-    serialized = pharmaship.inventory.serializers.FirstAidKitReqQtySerializer(first_aid_kit_reqqty_list, many=True)
-    first_aid_kit_reqqty_data = renderer.render(
-        data=serialized.data,
-        accepted_media_type='application/json; indent=2'
-        )
-    query_count_all()
-
-    # Required quantities for Rescue Bag
-    rescue_bag_reqqty_list = models.RescueBagReqQty.objects.filter(allowance__in=[allowance]).prefetch_related("base")
-    molecule_id_list += rescue_bag_reqqty_list.filter(
-        content_type_id=content_types["molecule"]
-        ).values_list("object_id", flat=True)
-    equipment_id_list += rescue_bag_reqqty_list.filter(
-        content_type_id=content_types["equipment"]
-        ).values_list("object_id", flat=True)
-
-    serialized = pharmaship.inventory.serializers.RescueBagReqQtySerializer(rescue_bag_reqqty_list, many=True)
-    rescue_bag_reqqty_data = renderer.render(
-        data=serialized.data,
-        accepted_media_type='application/json; indent=2'
-        )
-    query_count_all()
-
-    # Equipment used by the allowance
-    equipment_list = models.Equipment.objects.filter(id__in=equipment_id_list).prefetch_related("group")
-    equipment_data = serializers.serialize(
-        "yaml",
-        equipment_list,
-        use_natural_foreign_keys=True,
-        fields=(
-            "name_en",
-            "packaging_en",
-            "remark_en",
-            "consumable",
-            "perishable",
-            "picture",
-            "group",
+    # Molecule and Equipment used by the allowance
+    if catalog is None:
+        molecule_list = get_objects(models.Molecule).filter(
+            id__in=id_lists["molecule"]
             )
-        )
-    log.debug("Equipment")
-    query_count_all()
-
-    # Molecule used by the allowance
-    molecule_list = models.Molecule.objects.filter(id__in=molecule_id_list).prefetch_related("group")
-    molecule_data = serializers.serialize(
-        "yaml",
-        molecule_list,
-        use_natural_foreign_keys=True,
-        fields=(
-            "name_en",
-            "composition_en",
-            "remark_en",
-            "roa",
-            "dosage_form",
-            "medicine_list",
-            "group",
+        equipment_list = get_objects(models.Equipment).filter(
+            id__in=id_lists["equipment"]
             )
-        )
-    log.debug("Molecule")
+    else:
+        molecule_list = [
+            item for key, item in catalog["molecule"].items()
+            if key in id_lists["molecule"]
+        ]
+        equipment_list = [
+            item for key, item in catalog["equipment"].items()
+            if key in id_lists["equipment"]
+        ]
+
+    # Natural keys of bases indexed by kind and ID
+    bases = {"molecule": {}, "equipment": {}}
+    for item in molecule_list:
+        bases["molecule"][item.id] = {
+            "name_en": item.name_en,
+            "roa": item.roa,
+            "dosage_form": item.dosage_form,
+            "composition_en": item.composition_en,
+        }
+    for item in equipment_list:
+        bases["equipment"][item.id] = {
+            "name_en": item.name_en,
+            "packaging_en": item.packaging_en,
+            "consumable": item.consumable,
+            "perishable": item.perishable,
+        }
     query_count_all()
 
-    # Allowance record
-    allowance_data = serializers.serialize(
-        "yaml",
-        (allowance,),
-        fields=('name', 'author', 'version', 'date', 'additional'),
-        use_natural_foreign_keys=True
-        )
-    log.debug("Allowance")
-    query_count_all()
+    if pictures is None:
+        pictures = catalog["pictures"] if catalog else {}
+    pictures = get_pictures(equipment_list, pictures)
+
+    result = [
+        ('inventory/molecule_obj.yaml', dump(
+            get_yaml_objects(molecule_list, MOLECULE_FIELDS),
+            Dumper=Dumper
+            )),
+        ('inventory/equipment_obj.yaml', dump(
+            get_yaml_objects(equipment_list, EQUIPMENT_FIELDS, pictures),
+            Dumper=Dumper
+            )),
+    ]
+
+    for filename, kind, rows in required:
+        if kind:
+            data = [
+                {"base": bases[kind][base_id], "required_quantity": quantity}
+                for kind, base_id, quantity in rows
+            ]
+        else:
+            data = [
+                {
+                    "required_quantity": quantity,
+                    "base": bases[kind][base_id],
+                    "content_type": {"app_label": "inventory", "name": kind},
+                }
+                for kind, base_id, quantity in rows
+            ]
+        result.append((filename, render_json(data)))
+
+    result.append(('inventory/allowance.yaml', dump(
+        [get_yaml_object(allowance, ALLOWANCE_FIELDS)],
+        Dumper=Dumper
+        )))
 
     log.debug("End serialize")
 
     # Returning a list with tuples: (filename, data)
-    return ([
-        ('inventory/molecule_obj.yaml', remove_yaml_pk(molecule_data)),
-        ('inventory/equipment_obj.yaml', remove_yaml_pk(equipment_data)),
+    return (result, equipment_list, molecule_list)
+
+
+def get_picture_arcname(name):
+    """Return the name of a picture in the archive.
 
-        ('inventory/molecule_reqqty.json', molecule_reqqty_data),
-        ('inventory/equipment_reqqty.json', equipment_reqqty_data),
+    Pictures are stored under their SHA-256 checksum (see \
+    :func:`pharmaship.inventory.utils.get_picture_name`). Pictures already
+    stored under such a name in ``PICTURES_FOLDER`` are not read.
 
-        ('inventory/laboratory_reqqty.json', laboratory_reqqty_data),
-        ('inventory/telemedical_reqqty.json', telemedical_reqqty_data),
+    :param str name: Name of the picture in ``PICTURES_FOLDER``.
 
-        ('inventory/first_aid_kit_reqqty.json', first_aid_kit_reqqty_data),
-        ('inventory/rescue_bag_reqqty.json', rescue_bag_reqqty_data),
+    :return: Content-addressed name or ``None`` if the picture is not \
+    readable.
+    :rtype: str
+    """
+    if utils.is_picture_name(name):
+        return name
 
-        ('inventory/allowance.yaml', remove_yaml_pk(allowance_data)),
-    ], equipment_list, molecule_list)
+    result = get_hash(name, filename=settings.PICTURES_FOLDER / name)
+    if result is None:
+        return None
+    return utils.get_picture_name(result[1], name)
 
 
-def get_pictures(equipment_list):
-    """Return a list of picture paths to include in the archive.
+def get_pictures(equipment_list, names=None):
+    """Return the pictures to include in the archive.
 
     :param equipment_list: List of equipment for serialized allowance.
     :type equipment_list: django.db.models.query.QuerySet
+    :param dict names: Archive names already computed, indexed by picture \
+    name. New pictures are added to it.
 
-    :return: List of pictures filenames.
-    :rtype: list
+    :return: Archive names (see :func:`get_picture_arcname`) indexed by \
+    picture name.
+    :rtype: dict
     """
+    if names is None:
+        names = {}
+
     # Pictures attached to equipments
-    pictures = equipment_list.exclude(picture='').values_list(
-        'picture', flat=True)
+    pictures = {}
+    for item in equipment_list:
+        name = item.picture.name
+        if not name:
+            continue
+        if name not in names:
+            names[name] = get_picture_arcname(name)
+        pictures[name] = names[name]
 
     return pictures
 
@@ -249,7 +418,8 @@ def get_hash(name, content=None, filename=None):
     elif filename:
         try:
             with open(filename, 'rb') as fdesc:
-                m.update(fdesc.read())
+                for chunk in iter(lambda: fdesc.read(CHUNK_SIZE), b""):
+                    m.update(chunk)
         except IOError as error:
             log.error("File %s not readable. %s", filename, error)
             return None
@@ -298,11 +468,136 @@ def create_manifest(items):
     return content
 
 
-def create_package_yaml(allowance):
+class HashingReader:
+    """Read-only file object computing the SHA-256 checksum of read data.
+
+    :param file-object fileobj: File object opened in "read binary".
+    """
+
+    def __init__(self, fileobj):  # noqa: D107
+        self.fileobj = fileobj
+        self.hash = hashlib.sha256()
+
+    def read(self, size=-1):
+        """Read data from the file object and update the checksum.
+
+        :param int size: Maximum number of bytes to read.
+
+        :return: Data read.
+        :rtype: bytes
+        """
+        data = self.fileobj.read(size)
+        self.hash.update(data)
+        return data
+
+    def hexdigest(self):
+        """Return the checksum of data read so far.
+
+        :return: Hexadecimal checksum.
+        :rtype: str
+        """
+        return self.hash.hexdigest()
+
+
+class PackageWriter:
+    """Write a package tar file with its ``MANIFEST``.
+
+    Members are streamed into the tar file and their SHA-256 checksum is
+    computed while they are written. The ``MANIFEST`` is added by
+    :meth:`close`.
+
+    :param file_obj: Destination file object.
+    :type file_obj: argparse.FileType or any compatible file object
+    :param str compression: Compression of the tar file (``gz``, ``xz``) \
+    or ``None``.
+
+    :Example:
+
+    >>> with PackageWriter(file_obj, compression="xz") as writer:
+    ...     writer.add_content("package.yaml", content)
+    ...     writer.add_file(filename, "pictures/image.jpg")
+    """
+
+    def __init__(self, file_obj, compression=None):  # noqa: D107
+        if compression and compression not in COMPRESSIONS:
+            raise ValueError("Unknown compression: {0}".format(compression))
+
+        mode = "w:{0}".format(compression) if compression else "w"
+        self.tar = tarfile.open(fileobj=file_obj, mode=mode)
+        # List of (name, hash) for the MANIFEST
+        self.hashes = []
+
+    def __enter__(self):  # noqa: D105
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):  # noqa: D105
+        if exc_type is None:
+            self.close()
+        else:
+            self.tar.close()
+
+    def add(self, info, fileobj):
+        """Add a member to the tar file and record its checksum.
+
+        :param tarfile.TarInfo info: Member information (with its size).
+        :param file-object fileobj: Member content opened in "read binary".
+
+        :return: Hexadecimal checksum of the member.
+        :rtype: str
+        """
+        reader = HashingReader(fileobj)
+        self.tar.addfile(info, reader)
+        self.hashes.append((info.name, reader.hexdigest()))
+        return reader.hexdigest()
+
+    def add_content(self, name, content):
+        """Add a virtual file to the tar file.
+
+        :param str name: Name of the file.
+        :param content: Content of the file.
+        :type content: bytes or str
+
+        :return: Hexadecimal checksum of the member.
+        :rtype: str
+        """
+        info, f = create_tarinfo(name, content)
+        return self.add(info, f)
+
+    def add_file(self, filename, arcname):
+        """Add a file to the tar file, read by blocks.
+
+        :param filename: Path of the file to add.
+        :type filename: path-like or str
+        :param arcname: Name of the file in the tar file.
+        :type arcname: path-like or str
+
+        :return: Hexadecimal checksum of the member or ``None`` if the file \
+        is not readable.
+        :rtype: str
+        """
+        try:
+            with open(filename, "rb") as fdesc:
+                info = self.tar.gettarinfo(arcname=str(arcname), fileobj=fdesc)
+                return self.add(info, fdesc)
+        except OSError as error:
+            log.error("File %s not readable. %s", filename, error)
+            return None
+
+    def close(self):
+        """Add the ``MANIFEST`` and close the tar file."""
+        manifest_content = create_manifest(self.hashes)
+        info, f = create_tarinfo("MANIFEST", manifest_content)
+        self.tar.addfile(info, f)
+        self.tar.close()
+
+
+def create_package_yaml(allowance, base_version=None):
     """Export package info in YAML string.
 
     :param allowance: Allowance instance to export
     :type allowance: pharmaship.inventory.models.Allowance
+    :param str base_version: Version of the allowance a delta package \
+    applies to. ``None`` for a full package.
 
     :return: YAML string containing Allowance data.
     :rtype: str
@@ -319,11 +614,132 @@ def create_package_yaml(allowance):
             }
         }
     }
+    if base_version is not None:
+        content["info"]["base_version"] = base_version
     content_string = dump(content, Dumper=Dumper)
 
     return content_string
 
 
+def read_base_package(filename):
+    """Read a previous package of an allowance (base of a delta package).
+
+    :param filename: Path of the package tar file (not signed, optionally \
+    compressed) or file object.
+    :type filename: path-like or str or file-object
+
+    :return: Dictionary with keys:
+
+      * ``name``: name of the allowance in the package,
+      * ``version``: version of the allowance in the package,
+      * ``hashes``: checksums of the package files indexed by name,
+      * ``files``: content of ``DELTA_FILES`` indexed by name.
+
+    :rtype: dict
+    """
+    if hasattr(filename, "read"):
+        tar = tarfile.open(fileobj=filename, mode="r")
+    else:
+        tar = tarfile.open(name=filename, mode="r")
+
+    with tar:
+        conf = load(tar.extractfile("package.yaml").read(), Loader=Loader)
+        allowance = load(tar.extractfile("inventory/allowance.yaml").read(), Loader=Loader)
+        hashes = {
+            item["filename"]: item["hash"]
+            for item in extract_manifest(tar.extractfile("MANIFEST"))
+        }
+        files = {
+            name: tar.extractfile(name).read()
+            for name in DELTA_FILES if name in hashes
+        }
+
+    return {
+        "name": allowance[0]["fields"]["name"],
+        "version": conf["info"]["version"],
+        "hashes": hashes,
+        "files": files,
+    }
+
+
+def get_delta_objects(content, base_content, key):
+    """Return the YAML objects added or modified since a base package.
+
+    :param str content: YAML file of the allowance.
+    :param bytes base_content: Same YAML file in the base package.
+    :param tuple(str) key: Natural key fields of objects.
+
+    :return: YAML string of added or modified objects.
+    :rtype: str
+    """
+    base = {}
+    for item in load(base_content or "[]", Loader=Loader) or []:
+        base[tuple(item["fields"][field] for field in key)] = item
+
+    return dump([
+        item for item in load(content, Loader=Loader) or []
+        if base.get(tuple(item["fields"][field] for field in key)) != item
+        ], Dumper=Dumper)
+
+
+def get_delta_required(content, base_content):
+    """Return the required quantities modified since a base package.
+
+    Entries are identified by their base (and content type). Added and
+    modified entries are exported as in a full package. Removed entries
+    have a ``removed`` key set to ``true``.
+
+    :param bytes content: JSON file of the allowance.
+    :param bytes base_content: Same JSON file in the base package.
+
+    :return: UTF-8 encoded JSON.
+    :rtype: bytes
+    """
+    def get_key(item):
+        return json.dumps([item["base"], item.get("content_type")], sort_keys=True)
+
+    base = {get_key(item): item for item in json.loads(base_content or "[]")}
+
+    result = []
+    for item in json.loads(content):
+        if base.pop(get_key(item), None) != item:
+            result.append(item)
+    for item in base.values():
+        item["removed"] = True
+        result.append(item)
+
+    return render_json(result)
+
+
+def get_delta(serialized_data, base):
+    """Return the serialized files of a delta package.
+
+    :param list(tuple) serialized_data: Files of the allowance (see \
+    :func:`serialize_allowance`).
+    :param dict base: Base package (see :func:`read_base_package`).
+
+    :return: List of tuples filenames and streams with only modified \
+    entries for ``DELTA_FILES``.
+    :rtype: list(tuple(str, str))
+    """
+    result = []
+    for name, content in serialized_data:
+        if name not in DELTA_FILES:
+            result.append((name, content))
+        elif DELTA_FILES[name]:
+            result.append((name, get_delta_objects(
+                content,
+                base["files"].get(name),
+                DELTA_FILES[name]
+                )))
+        else:
+            result.append((name, get_delta_required(
+                content,
+                base["files"].get(name)
+                )))
+    return result
+
+
 def create_pot(allowance):
     """Create of PO template file for Equipment & Molecule strings."""
     # Get serialized Allowance data
@@ -393,54 +809,93 @@ msgstr ""
     return result
 
 
-def create_archive(allowance, file_obj):
+def create_archive(allowance, file_obj, compression=DEFAULT_COMPRESSION, catalog=None, required=None, base=None):
     """Create an archive from the given `Allowance` instance.
 
-    The response is a tar.gz file containing YAML files generated by the
-    function `serialize_allowance`.
+    The response is a tar file (optionally compressed) containing YAML files
+    generated by the function `serialize_allowance`.
 
-    Pictures are added if any.
+    Pictures are added if any, under their SHA-256 checksum: a picture
+    shared by several equipments is added once.
 
     The package description file (``package.yaml``) and the ``MANIFEST`` file
     are created at the end.
 
+    Files are streamed in the archive and their checksum is computed while
+    they are written (see :class:`PackageWriter`).
+
+    If a ``base`` package is given, a delta package is created: it only
+    contains the objects, required quantities, pictures and translations
+    modified since the base package. Its version is recorded in
+    ``package.yaml`` (``base_version``). The base package must be a package
+    of the same allowance with another version.
+
+    The archive is compressed with gzip by default.
+
     :param allowance: Allowance instance to export
     :type allowance: pharmaship.inventory.models.Allowance
     :param file_obj: Destination file object
     :type file_obj: argparse.FileType or any compatible file object
-
-    :return: ``True`` if success
+    :param str compression: Compression of the tar file (``gz``, ``xz``) \
+    or ``None``.
+    :param dict catalog: Preloaded Molecule and Equipment instances (see \
+    :func:`get_catalog`).
+    :param list required: Preloaded required quantities of the allowance \
+    (see :func:`get_required`).
+    :param base: Previous package of the allowance (base of a delta package).
+    :type base: path-like or str or file-object
+
+    :return: ``True`` if success, ``False`` if the base package is not \
+    valid.
     :rtype: bool
     """
-    # Creating a tar.gz archive
-    hashes = []
+    if required is None:
+        required = get_required([allowance], get_content_types())[allowance.id]
 
+    pictures = catalog["pictures"] if catalog else {}
     serialized_data, equipment_list, molecule_list = serialize_allowance(
         allowance=allowance,
-        content_types=get_content_types()
+        content_types=None,
+        catalog=catalog,
+        required=required,
+        pictures=pictures
         )
 
-    with tarfile.open(fileobj=file_obj, mode='w') as tar:
+    base_version = None
+    if base is not None:
+        base = read_base_package(base)
+        if base["name"] != allowance.name:
+            log.error("Base package is not a package of %s: %s", allowance.name, base["name"])
+            return False
+        if base["version"] == allowance.version:
+            log.error("Base package has the same version as the allowance: %s", allowance.version)
+            return False
+        base_version = base["version"]
+        serialized_data = get_delta(serialized_data, base)
+
+    def is_modified(name, filename):
+        """Return ``True`` if the file is not in the base package."""
+        if base is None:
+            return True
+        result = get_hash(str(name), filename=filename)
+        return result is None or base["hashes"].get(result[0]) != result[1]
+
+    with PackageWriter(file_obj, compression) as writer:
         # Processing the database
         for item in serialized_data:
-            info, f = create_tarinfo(item[0], item[1])
-            tar.addfile(info, f)
-
-            hashes.append(get_hash(info.name, content=item[1]))
-
-        # Adding the pictures of Equipment
-        for item in get_pictures(equipment_list):
-            picture_filename = settings.PICTURES_FOLDER / item
-            log.debug(picture_filename)
-            try:
-                tar.add(picture_filename, arcname=PurePath("pictures", item))
-            # TODO: Detail Exception
-            except Exception as error:
-                log.error("Error: %s", error)
-
-            hashes.append(
-                get_hash(PurePath("pictures", item), filename=picture_filename)
-                )
+            writer.add_content(item[0], item[1])
+
+        # Adding the pictures of Equipment (not readable ones are skipped)
+        added = set()
+        for name, arcname in get_pictures(equipment_list, pictures).items():
+            if arcname is None or arcname in added:
+                continue
+            added.add(arcname)
+            arcname = PurePath("pictures", arcname)
+            # Content-addressed: a picture of the base package is unchanged
+            if base is None or str(arcname) not in base["hashes"]:
+                log.debug(arcname)
+                writer.add_file(settings.PICTURES_FOLDER / name, arcname)
 
         # Adding the translation files if any
         # TODO: Generate MO if only PO is found...
@@ -448,26 +903,126 @@ def create_archive(allowance, file_obj):
         for item in settings.TRANSLATIONS_FOLDER.glob("*/LC_MESSAGES/{0}".format(mo_filename)):
             log.debug(item)
             relative_path = PurePath("locale", item.relative_to(settings.TRANSLATIONS_FOLDER))
-            tar.add(item, arcname=relative_path)
-            hashes.append(get_hash(relative_path, filename=item))
+            if is_modified(relative_path, item):
+                writer.add_file(item, relative_path)
             # Try to get also the PO file
             po_filename = item.with_suffix(".po")
             if po_filename.exists():
                 log.debug(po_filename)
                 relative_path = PurePath("locale", po_filename.relative_to(settings.TRANSLATIONS_FOLDER))
-                tar.add(po_filename, arcname=relative_path)
-                hashes.append(get_hash(relative_path, filename=po_filename))
-
+                if is_modified(relative_path, po_filename):
+                    writer.add_file(po_filename, relative_path)
 
         # Add the package description file
-        package_content = create_package_yaml(allowance)
-        info, f = create_tarinfo("package.yaml", package_content)
-        tar.addfile(info, f)
-        hashes.append(get_hash("package.yaml", content=package_content))
-
-        # Add the MANIFEST
-        manifest_content = create_manifest(hashes)
-        info, f = create_tarinfo("MANIFEST", manifest_content)
-        tar.addfile(info, f)
+        writer.add_content("package.yaml", create_package_yaml(allowance, base_version))
 
     return True
+
+
+def get_archive_name(allowance, compression=DEFAULT_COMPRESSION):
+    """Return the filename of an allowance archive.
+
+    :param allowance: Allowance instance to export
+    :type allowance: pharmaship.inventory.models.Allowance
+    :param str compression: Compression of the tar file (``gz``, ``xz``) \
+    or ``None``.
+
+    :return: Filename (``allowance_<name>_<version>.tar[.gz|.xz]``).
+    :rtype: str
+    """
+    archive_name = slugify("allowance_{0}_{1}".format(allowance.name, allowance.version))
+    if compression:
+        return "{0}.tar.{1}".format(archive_name, compression)
+    return "{0}.tar".format(archive_name)
+
+
+# Catalog of export worker processes (see set_catalog)
+_catalog = None
+
+
+def set_catalog(catalog):
+    """Set the catalog of an export worker process.
+
+    :param bytes catalog: Pickled catalog (see :func:`get_catalog`). It is \
+    unpickled once Django is set up (see \
+    :func:`pharmaship.core.worker.init_worker`).
+    """
+    global _catalog
+    _catalog = pickle.loads(catalog)
+
+
+def export_worker(allowance, required, filename, compression):
+    """Create the archive of an allowance in a worker process.
+
+    The database is not accessed: the catalog and required quantities are
+    preloaded by the main process.
+
+    :param allowance: Allowance instance to export
+    :type allowance: pharmaship.inventory.models.Allowance
+    :param list required: Required quantities of the allowance (see \
+    :func:`get_required`).
+    :param str filename: Path of the archive to create.
+    :param str compression: Compression of the tar file (``gz``, ``xz``) \
+    or ``None``.
+
+    :return: Export duration in seconds.
+    :rtype: float
+    """
+    start = time.perf_counter()
+    with open(filename, "wb") as file_obj:
+        create_archive(allowance, file_obj, compression, _catalog, required)
+    return time.perf_counter() - start
+
+
+def export_allowances(allowance_list, directory, compression=DEFAULT_COMPRESSION, max_workers=None):
+    """Export allowances archives in parallel.
+
+    The catalog of molecules and equipments (with their groups) and the
+    required quantities of all allowances are loaded once. Archives are
+    then serialized and written by a pool of processes.
+
+    :param list(models.Allowance) allowance_list: Allowances to export.
+    :param directory: Directory where archives are created.
+    :type directory: path-like or str
+    :param str compression: Compression of the tar files (``gz``, ``xz``) \
+    or ``None``.
+    :param int max_workers: Number of processes. If ``None``, the number of \
+    processors is used.
+
+    :return: List of tuples (allowance, archive path, export duration in \
+    seconds) in the order of ``allowance_list``.
+    :rtype: list(tuple)
+    """
+    allowance_list = list(allowance_list)
+    start = time.perf_counter()
+    catalog = pickle.dumps(get_catalog())
+    required = get_required(allowance_list, get_content_types())
+    log.info("Catalog loaded in %.2fs.", time.perf_counter() - start)
+
+    # Workers must not share the database connection of the main process
+    connections.close_all()
+
+    jobs = []
+    with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=init_worker,
+            initargs=("pharmaship.inventory.export.set_catalog", catalog)) as executor:
+        for allowance in allowance_list:
+            filename = Path(directory) / get_archive_name(allowance, compression)
+            job = executor.submit(
+                export_worker,
+                allowance,
+                required[allowance.id],
+                str(filename),
+                compression
+                )
+            jobs.append((allowance, filename, job))
+
+        result = []
+        for allowance, filename, job in jobs:
+            duration = job.result()
+            log.info("%s exported in %.2fs: %s", allowance, duration, filename)
+            result.append((allowance, filename, duration))
+
+    log.info("%s allowances exported in %.2fs.", len(result), time.perf_counter() - start)
+    return result
@@ -0,0 +1,313 @@
+# -*- coding: utf-8; -*-
+"""Accent and typo tolerant search of molecules and equipments.
+
+Words of the indexed texts (see
+:func:`pharmaship.inventory.search_index.get_documents`) are folded (lower
+case, no accent) and stored once in a vocabulary. An index of their trigrams
+gives the candidate words of a searched word, which are then checked with an
+edit distance.
+
+The index is built at first search and cleared by signal handlers (see
+:mod:`pharmaship.inventory.signals`) when an indexed model is modified.
+"""
+import array
+import re
+import threading
+import unicodedata
+
+from pharmaship.core.utils import log
+
+from pharmaship.inventory import search_index
+
+WORD_RE = re.compile(r"\w+")
+
+# Score of a word found in each column (see search_index.COLUMNS)
+WEIGHTS = [weight / max(search_index.WEIGHTS) for weight in search_index.WEIGHTS]
+# Score factor of a searched word matching only the beginning of a word
+PREFIX_FACTOR = 0.9
+
+_index = None
+_lock = threading.Lock()
+# Incremented at each invalidation to avoid storing an index built while
+# the database was modified.
+_generation = 0
+
+
+def fold(text):
+    """Return a text without accent and in lower case.
+
+    :param str text: Text to fold.
+
+    :return: Folded text (``Paracétamol`` gives ``paracetamol``).
+    :rtype: str
+    """
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in normalized if not unicodedata.combining(char)).casefold()
+
+
+def get_words(text):
+    """Return the folded words of a text.
+
+    :param str text: Text to split.
+
+    :return: List of folded words.
+    :rtype: list(str)
+    """
+    return WORD_RE.findall(fold(text))
+
+
+def get_trigrams(word):
+    """Return the trigrams of a word.
+
+    The word is padded with spaces to give more importance to its beginning.
+
+    :param str word: Folded word.
+
+    :return: Set of trigrams.
+    :rtype: set(str)
+    """
+    padded = "  {0} ".format(word)
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def get_max_distance(word):
+    """Return the maximum number of typos accepted for a searched word.
+
+    :param str word: Searched word.
+
+    :return: Maximum edit distance.
+    :rtype: int
+    """
+    if len(word) < 3:
+        return 0
+    if len(word) < 6:
+        return 1
+    return 2
+
+
+def get_distances(word, candidate):
+    """Return the edit distances between a searched word and a candidate.
+
+    :param str word: Searched word.
+    :param str candidate: Word of the vocabulary.
+
+    :return: Levenshtein distance with the whole candidate and with its \
+    closest beginning.
+    :rtype: tuple(int, int)
+    """
+    previous = list(range(len(word) + 1))
+    prefix = previous[-1]
+    for index, char in enumerate(candidate, 1):
+        current = [index]
+        for position, word_char in enumerate(word, 1):
+            current.append(min(
+                previous[position] + 1,
+                current[position - 1] + 1,
+                previous[position - 1] + (char != word_char)
+                ))
+        previous = current
+        prefix = min(prefix, current[-1])
+    return previous[-1], prefix
+
+
+def get_score(word, candidate):
+    """Return the similarity score of a candidate for a searched word.
+
+    :param str word: Searched word.
+    :param str candidate: Word of the vocabulary.
+
+    :return: Score between 0 and 1 (1 for identical words) or ``None`` if \
+    the candidate has too many differences.
+    :rtype: float
+    """
+    distance, prefix = get_distances(word, candidate)
+    max_distance = get_max_distance(word)
+    if prefix > max_distance:
+        return None
+
+    score = PREFIX_FACTOR * (1 - prefix / len(word))
+    if distance <= max_distance:
+        score = max(score, 1 - distance / max(len(word), len(candidate)))
+    return score
+
+
+class FuzzyIndex:
+    """Index of words of molecules and equipments texts.
+
+    Element keys are encoded in integers to keep the index compact (see
+    :meth:`get_key`).
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        # Folded words
+        self.words = []
+        # Element keys of each word
+        self.elements = []
+        # ID of the words containing each trigram
+        self.trigrams = {}
+
+    @staticmethod
+    def get_key(kind, object_id, column):
+        """Return the key of an element column.
+
+        :param str kind: Kind of element (``molecule`` or ``equipment``).
+        :param int object_id: Element ID.
+        :param int column: Index of the column (see \
+        ``search_index.COLUMNS``).
+
+        :return: Encoded key.
+        :rtype: int
+        """
+        return search_index.get_rowid(kind, object_id) * len(WEIGHTS) + column
+
+    @staticmethod
+    def parse_key(key):
+        """Return the element and column of a key.
+
+        :param int key: Encoded key (see :meth:`get_key`).
+
+        :return: Element rowid (see :func:`search_index.get_rowid`) and \
+        column index.
+        :rtype: tuple(int, int)
+        """
+        return divmod(key, len(WEIGHTS))
+
+    def build(self):
+        """Index all molecules and equipments texts.
+
+        :return: The index.
+        :rtype: FuzzyIndex
+        """
+        word_ids = {}
+        elements = []
+        for kind in search_index.KINDS:
+            documents = search_index.get_documents(kind)
+            for object_id, values in documents.items():
+                for column, text in enumerate(values):
+                    key = self.get_key(kind, object_id, column)
+                    for word in set(get_words(text)):
+                        if word not in word_ids:
+                            word_ids[word] = len(elements)
+                            elements.append(set())
+                        elements[word_ids[word]].add(key)
+
+        self.words = list(word_ids)
+        self.elements = [array.array("Q", sorted(keys)) for keys in elements]
+
+        trigrams = {}
+        for word_id, word in enumerate(self.words):
+            for trigram in get_trigrams(word):
+                trigrams.setdefault(trigram, []).append(word_id)
+        self.trigrams = {key: array.array("I", value) for key, value in trigrams.items()}
+
+        log.debug("Fuzzy index built: %s words.", len(self.words))
+        return self
+
+    def get_candidates(self, word):
+        """Return the vocabulary words close to a searched word.
+
+        :param str word: Folded searched word.
+
+        :return: Dictionary of scores indexed by word ID.
+        :rtype: dict
+        """
+        if len(word) < 3:
+            # Too short for typos: only words beginning with it
+            return {
+                word_id: get_score(word, candidate)
+                for word_id, candidate in enumerate(self.words)
+                if candidate.startswith(word)
+            }
+
+        trigrams = get_trigrams(word)
+        counts = {}
+        for trigram in trigrams:
+            for word_id in self.trigrams.get(trigram, []):
+                counts[word_id] = counts.get(word_id, 0) + 1
+
+        # Each typo changes at most 3 trigrams
+        minimum = max(1, len(trigrams) - 3 * get_max_distance(word))
+        result = {}
+        for word_id, count in counts.items():
+            if count < minimum:
+                continue
+            score = get_score(word, self.words[word_id])
+            if score is not None:
+                result[word_id] = score
+        return result
+
+    def search(self, text, kind):
+        """Return the elements matching all words of a text.
+
+        :param str text: Text to search.
+        :param str kind: Kind of element (``molecule`` or ``equipment``).
+
+        :return: List of elements ID, best score first.
+        :rtype: list(int)
+        """
+        kind_index = search_index.KINDS[kind][0]
+        result = None
+        for word in get_words(text):
+            scores = {}
+            for word_id, score in self.get_candidates(word).items():
+                for key in self.elements[word_id]:
+                    rowid, column = self.parse_key(key)
+                    object_id, element_kind = divmod(rowid, len(search_index.KINDS))
+                    if element_kind != kind_index:
+                        continue
+                    scores[object_id] = max(scores.get(object_id, 0), score * WEIGHTS[column])
+
+            # All words must match
+            if result is None:
+                result = scores
+            else:
+                result = {
+                    key: value + scores[key]
+                    for key, value in result.items()
+                    if key in scores
+                }
+
+        if not result:
+            return []
+        return sorted(result, key=lambda item: (-result[item], item))
+
+
+def get_index():
+    """Return the fuzzy index, built if needed.
+
+    :return: The index.
+    :rtype: FuzzyIndex
+    """
+    global _index
+    with _lock:
+        if _index is not None:
+            return _index
+        generation = _generation
+
+    index = FuzzyIndex().build()
+
+    with _lock:
+        if generation == _generation:
+            _index = index
+    return index
+
+
+def clear():
+    """Remove the fuzzy index (built again at next search)."""
+    global _index, _generation
+    with _lock:
+        _index = None
+        _generation += 1
+
+
+def search(text, kind):
+    """Return the elements matching a text with accents and typos tolerance.
+
+    :param str text: Text to search.
+    :param str kind: Kind of element (``molecule`` or ``equipment``).
+
+    :return: List of elements ID, best match first.
+    :rtype: list(int)
+    """
+    return get_index().search(text, kind)
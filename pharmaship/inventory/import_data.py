@@ -1,26 +1,42 @@
 # -*- coding: utf-8; -*-
 """Import methods for Inventory application."""
 # import os.path
+import io
 import json
 import gettext
+import functools
 
-from pathlib import PurePath
+import inspect
+
+from pathlib import Path, PurePath
 
 from django.core import serializers
+from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.conf import settings
 from django.utils.text import slugify
 
 from pharmaship.inventory import models
+from pharmaship.inventory import fuzzy_index
+from pharmaship.inventory import search_index
+from pharmaship.inventory import utils
+from pharmaship.inventory.parsers import cache
 # from pharmaship.inventory import serializers
 
 from pharmaship.core.utils import log, query_count_all
 
 
-def pictures_files(members):
+def pictures_files(members, folder=None):
     """Change the picture path in TarInfo instance.
 
+    Pictures are named after their SHA-256 checksum (see
+    :func:`pharmaship.inventory.utils.get_picture_name`): the ones already
+    present in ``folder`` are identical and skipped.
+
     :param list(tarfile.TarInfo) members: files in the tar file.
+    :param folder: Folder where pictures are extracted.
+    :type folder: path-like or str
 
     :return: An iterator with tar file members containing ``pictures`` as\
     first path part.
@@ -31,16 +47,50 @@ def pictures_files(members):
             continue
 
         if path_strings[0] == "pictures":
+            name = path_strings[1]
+            if folder and utils.is_picture_name(name) and (Path(folder) / name).exists():
+                log.debug("Picture already present: %s", name)
+                continue
             # Modify the path of the picture to manage later the full path
-            tarinfo.name = path_strings[1]
+            tarinfo.name = name
             yield tarinfo
 
 
-def update_allowance(allowance, key):
+def add_changes(changes, model, added=(), changed=(), removed=(), label=str):
+    """Add instances to a changes report.
+
+    :param dict changes: Report of changes: dictionary indexed by model name \
+    with ``added``, ``changed`` and ``removed`` lists of labels. If \
+    ``None``, nothing is reported.
+    :param model: Model class of instances.
+    :param list added: Added instances.
+    :param list changed: Changed instances.
+    :param list removed: Removed instances.
+    :param function label: Function returning the label of an instance.
+    """
+    if changes is None:
+        return
+
+    for kind, instances in (("added", added), ("changed", changed), ("removed", removed)):
+        labels = [label(instance) for instance in instances]
+        if not labels:
+            continue
+        report = changes.setdefault(
+            model.__name__,
+            {"added": [], "changed": [], "removed": []}
+            )
+        report[kind] += labels
+
+
+def update_allowance(allowance, key, changes=None):
     """Update or create an allowance instance from serialized allowance data.
 
+    Only modified fields of an existing allowance are saved. The allowance
+    is set active (the whole import is cancelled in case of error).
+
     :param models.Allowance allowance: Up-to-date Allowance instance.
     :param str key: GPG key ID used for signing the package archive.
+    :param dict changes: Report of changes (see :func:`add_changes`).
 
     :return: the updated (or create) allowance instance
     :rtype: models.Allowance
@@ -50,16 +100,29 @@ def update_allowance(allowance, key):
     allowance_dict = allowance.__dict__
     allowance_dict.pop('id', None)
     allowance_dict.pop('_state', None)
+    allowance_dict['active'] = True
     allowance_dict['signature'] = key
     # Unique: (name, )
-    obj, created = models.Allowance.objects.update_or_create(
-        name=allowance.name,
-        defaults=allowance_dict
-    )
-    if not created:
+    try:
+        obj = models.Allowance.objects.get(name=allowance.name)
+    except models.Allowance.DoesNotExist:
+        obj = models.Allowance.objects.create(**allowance_dict)
+        log.info("Allowance `%s` create.", allowance.name)
+        add_changes(changes, models.Allowance, added=[obj])
+        return obj
+
+    fields = [
+        field for field, value in allowance_dict.items()
+        if getattr(obj, field) != value
+    ]
+    if fields:
+        for field in fields:
+            setattr(obj, field, allowance_dict[field])
+        obj.save(update_fields=fields)
         log.info("Allowance `%s` already exists, updated.", allowance.name)
+        add_changes(changes, models.Allowance, changed=[obj])
     else:
-        log.info("Allowance `%s` create.", allowance.name)
+        log.info("Allowance `%s` already up-to-date.", allowance.name)
 
     return obj
 
@@ -138,7 +201,91 @@ def get_base(type, content, model=None):
     return instance
 
 
-def deserialize_json_file(data, tar, allowance):
+class NaturalKeyResolver:
+    """Resolve natural keys of required quantities with preloaded instances.
+
+    To create once per import, after Molecule and Equipment objects import:
+    all instances of a base model are loaded in one query at first use and
+    ContentTypes are cached. Resolving any number of rows then costs a
+    constant number of queries.
+    """
+
+    def __init__(self):  # noqa: D107
+        # Instances indexed by natural key for each model
+        self.instances = {}
+        # ContentType instances indexed by (app_label, name)
+        self.content_types = {}
+
+    def get_model(self, data):
+        """Return the related ContentType from `data` (see :func:`get_model`).
+
+        :param dict data: Dictionnary containing at least following keys:
+
+          * ``app_label``: the application name,
+          * ``name``: the name of the model
+
+        :return: The Django ContentType instance or ``None`` if it does not \
+        exist.
+        :rtype: django.contrib.contenttypes.models.ContentType or None
+        """
+        key = (data["app_label"], data["name"])
+        if key not in self.content_types:
+            self.content_types[key] = get_model(data)
+        return self.content_types[key]
+
+    def get_index(self, model):
+        """Return all instances of a model indexed by natural key.
+
+        :param model: Model class with ``natural_key`` method.
+        :type model: models.Equipment or models.Molecule
+
+        :return: Dictionary of instances. Keys are natural key tuples.
+        :rtype: dict
+        """
+        if model not in self.instances:
+            self.instances[model] = {
+                tuple(instance.natural_key()): instance
+                for instance in model.objects.all()
+            }
+        return self.instances[model]
+
+    def get_base(self, type, content, model=None):
+        """Return a model instance from its natural key (see :func:`get_base`).
+
+        :param type: Model class of base field (Django internal).
+        :type type: models.Equipment or models.Molecule
+        :param dict content: Dictionnary with all natural key fields for the\
+        related base.
+        :param model: Model class of base item to serialize.
+        :type model: models.Equipment or models.Molecule
+
+        :return: A model instance or ``None`` if not found.
+        :rtype: models.Equipment or models.Molecule or None
+        """
+        if not model:
+            try:
+                model = type.field.related_model
+            except AttributeError as error:
+                log.error("Model class not found: %s", error)
+                return None
+
+        # Natural key fields in the order of get_by_natural_key arguments
+        fields = inspect.signature(model.objects.get_by_natural_key).parameters
+        try:
+            key = tuple(content[field] for field in fields)
+        except (KeyError, TypeError) as error:
+            log.error("Invalid natural key for %s: %s", model, error)
+            log.debug(content)
+            return None
+
+        instance = self.get_index(model).get(key)
+        if instance is None:
+            log.error("%s instance does not exist.", model)
+            log.debug(content)
+        return instance
+
+
+def deserialize_json_file(data, tar, allowance, resolver=None):
     """Deserialize a JSON file contained in the tar file.
 
     :param dict data: Dictionnary with filename and model related. The \
@@ -152,6 +299,8 @@ def deserialize_json_file(data, tar, allowance):
     :param tarfile.TarFile tar: tar file archive containing the file to extract
     :param allowance: allowance instance to rattach
     :type allowance: models.Allowance
+    :param NaturalKeyResolver resolver: Resolver of bases natural keys. If \
+    ``None``, a new one is created.
 
     :return: List of `model` instances.
     :rtype: list
@@ -166,18 +315,21 @@ def deserialize_json_file(data, tar, allowance):
         log.error("Corrupted JSON file: %s", error)
         return False
 
+    if resolver is None:
+        resolver = NaturalKeyResolver()
+
     objects = []
     for item in item_data:
         if "content_type" not in item:
-            base = get_base(
+            base = resolver.get_base(
                 type=data["model"].base,
                 content=item["base"]
                 )
         else:
-            ct = get_model(item["content_type"])
+            ct = resolver.get_model(item["content_type"])
             if ct is None:
                 return False
-            base = get_base(
+            base = resolver.get_base(
                 type=data["model"].base,
                 content=item["base"],
                 model=ct.model_class()
@@ -193,17 +345,48 @@ def deserialize_json_file(data, tar, allowance):
             base=base,
             required_quantity=item["required_quantity"]
             )
+        # Entry removed by a delta package
+        instance.removed = item.get("removed", False)
 
         objects.append(instance)
 
     return objects
 
 
-def required_quantity(data, tar, allowance):
+def get_reqqty_key(instance):
+    """Return the key identifying the base of a required quantity.
+
+    :param instance: Required quantity instance.
+
+    :return: ``base_id`` or ``(content_type_id, object_id)`` for generic \
+    relations.
+    :rtype: int or tuple
+    """
+    if isinstance(instance._meta.get_field("base"), GenericForeignKey):
+        return (instance.content_type_id, instance.object_id)
+    return instance.base_id
+
+
+def get_reqqty_label(instance):
+    """Return the label of a required quantity in a changes report.
+
+    :param instance: Required quantity instance.
+
+    :return: Base name and required quantity.
+    :rtype: str
+    """
+    return "{0}: {1}".format(instance.base, instance.required_quantity)
+
+
+def required_quantity(data, tar, allowance, resolver=None, changes=None, delta=False):
     """Update the required quantities for deserialized items.
 
-    After successful deserialization, delete all related required quantity for
-    the selected allowance. Then create all deserialized objects.
+    After successful deserialization, the required quantities of the selected
+    allowance are compared with deserialized objects: only new, modified and
+    removed entries are written.
+
+    In a delta package, entries not in the file are kept and entries marked
+    as ``removed`` are deleted.
 
     :param dict data: Dictionnary with filename and model related. The \
     following keys must be present:
@@ -216,48 +399,296 @@ def required_quantity(data, tar, allowance):
     :param tarfile.TarFile tar: tar file archive containing the file to extract
     :param allowance: allowance instance to rattach
     :type allowance: models.Allowance
+    :param NaturalKeyResolver resolver: Resolver of bases natural keys. If \
+    ``None``, a new one is created.
+    :param dict changes: Report of changes (see :func:`add_changes`).
+    :param bool delta: ``True`` if the file comes from a delta package.
 
     :return: ``True`` if there is no error, ``False`` otherwise.
     :rtype: bool
     """
     log.debug("Updating required quantities for %s", data["filename"])
 
-    deserialized_list = deserialize_json_file(data, tar, allowance)
+    deserialized_list = deserialize_json_file(data, tar, allowance, resolver)
 
     if deserialized_list is False:
         log.error("Error when deserializing file: %s", data["filename"])
         return False
 
-    # As we are sure that the deserialization went fine,
-    # delete all required quantities entry and create new ones
-    data["model"].objects.filter(
-        allowance_id__in=(0, allowance.id)
-        ).delete()
+    model = data["model"]
+
+    # Existing entries indexed by base (a base may be listed several times)
+    existing = {}
+    for instance in model.objects.filter(allowance=allowance):
+        existing.setdefault(get_reqqty_key(instance), []).append(instance)
+
+    to_create = []
+    to_update = []
+    changed = []
+    to_delete = []
+    for instance in deserialized_list:
+        rows = existing.get(get_reqqty_key(instance))
+        if instance.removed:
+            if rows:
+                to_delete.append(rows.pop(0).pk)
+            continue
+        if not rows:
+            to_create.append(instance)
+            continue
+        row = rows.pop(0)
+        if row.required_quantity != instance.required_quantity:
+            row.required_quantity = instance.required_quantity
+            to_update.append(row)
+            changed.append(instance)
+
+    if not delta:
+        to_delete += [row.pk for rows in existing.values() for row in rows]
+    if to_delete:
+        removed = model.objects.filter(pk__in=to_delete)
+        add_changes(
+            changes,
+            model,
+            removed=removed.prefetch_related("base"),
+            label=get_reqqty_label
+            )
+        removed.delete()
+
+    model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, ["required_quantity"])
+    add_changes(
+        changes,
+        model,
+        added=to_create,
+        changed=changed,
+        label=get_reqqty_label
+        )
+    log.debug(
+        "%s: %s created, %s updated, %s deleted.",
+        model.__name__,
+        len(to_create),
+        len(to_update),
+        len(to_delete)
+        )
 
-    data["model"].objects.bulk_create(deserialized_list)
-    log.debug("Created %s instances", len(deserialized_list))
+    if to_create or to_update or to_delete:
+        # Bulk operations do not send signals. Parsers results computed
+        # before the commit would be stale.
+        transaction.on_commit(cache.clear)
     query_count_all()
 
     return True
 
 
+def update_orphans(model, reqqty_model, allowance, changes=None):
+    """Attach the objects without required quantity to the default allowance.
+
+    Objects without required quantity get one in the default allowance
+    with a value of 0. Entries of the default allowance are removed for
+    objects required by another allowance.
+
+    :param model: Model class of objects.
+    :type model: models.Molecule or models.Equipment
+    :param reqqty_model: Model class of required quantities.
+    :type reqqty_model: models.MoleculeReqQty or models.EquipmentReqQty
+    :param models.Allowance allowance: Default allowance (``id=0``).
+    :param dict changes: Report of changes (see :func:`add_changes`).
+    """
+    removed = reqqty_model.objects.filter(
+        allowance=allowance,
+        base_id__in=reqqty_model.objects.exclude(
+            allowance=allowance
+            ).values("base_id")
+        ).select_related("base")
+    add_changes(changes, reqqty_model, removed=removed, label=get_reqqty_label)
+    removed.delete()
+
+    orphans = model.objects.filter(allowances=None)
+    log.info("Orphan %ss: %s", model.__name__, len(orphans))
+
+    created = reqqty_model.objects.bulk_create([
+        reqqty_model(
+            base=item,
+            allowance=allowance,
+            required_quantity=0
+            )
+        for item in orphans
+        ])
+    add_changes(changes, reqqty_model, added=created, label=get_reqqty_label)
+
+
+def bulk_update_or_create(model, deserialized_list, unique_fields, fields):
+    """Update or create instances in bulk from deserialized objects.
+
+    Existing instances are retrieved in one query. Then, new instances are
+    created with ``bulk_create`` and modified existing ones updated with
+    ``bulk_update``.
+
+    :param model: Model class of deserialized objects.
+    :type model: models.Molecule or models.Equipment
+    :param list deserialized_list: List of \
+    :class:`django.core.serializers.base.DeserializedObject`.
+    :param list(str) unique_fields: Fields identifying an instance.
+    :param list(str) fields: Other fields to update.
+
+    :return: List of up-to-date instances, in the same order as \
+    ``deserialized_list``, list of created instances and list of updated \
+    instances.
+    :rtype: tuple(list, list, list)
+    """
+    # Use attribute names to avoid a query per related object
+    attnames = {
+        field: model._meta.get_field(field).attname
+        for field in unique_fields + fields
+    }
+
+    def get_key(instance):
+        return tuple(getattr(instance, attnames[field]) for field in unique_fields)
+
+    existing = model.objects.filter(**{
+        "{0}__in".format(unique_fields[0]): set(
+            getattr(item.object, attnames[unique_fields[0]]) for item in deserialized_list
+            )
+        })
+    index = {get_key(instance): instance for instance in existing}
+
+    result = []
+    to_create = []
+    to_update = {}
+    for item in deserialized_list:
+        key = get_key(item.object)
+        instance = index.get(key)
+        if instance is None:
+            instance = model(**{
+                attnames[field]: getattr(item.object, attnames[field])
+                for field in unique_fields + fields
+                })
+            index[key] = instance
+            to_create.append(instance)
+        else:
+            for field in fields:
+                value = getattr(item.object, attnames[field])
+                if getattr(instance, attnames[field]) == value:
+                    continue
+                setattr(instance, attnames[field], value)
+                if instance.pk is not None:
+                    to_update[instance.pk] = instance
+        result.append(instance)
+
+    model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update.values(), fields)
+    log.debug(
+        "%s: %s created, %s updated.",
+        model.__name__,
+        len(to_create),
+        len(to_update)
+        )
+
+    return result, to_create, list(to_update.values())
+
+
+def bulk_set_tags(model, deserialized_list, instances):
+    """Replace the tags of instances in bulk.
+
+    Only instances with tags in their deserialized data are modified and
+    only if their tags are different.
+
+    :param model: Model class of deserialized objects.
+    :type model: models.Molecule or models.Equipment
+    :param list deserialized_list: List of \
+    :class:`django.core.serializers.base.DeserializedObject`.
+    :param list instances: Saved instances, in the same order as \
+    ``deserialized_list``.
+
+    :return: List of instances with modified tags.
+    :rtype: list
+    """
+    through = model.tag.through
+    field = "{0}_id".format(model._meta.model_name)
+
+    tags = {}
+    modified = {}
+    for item, instance in zip(deserialized_list, instances):
+        if item.m2m_data.get("tag"):
+            tags[instance.pk] = set(int(tag_id) for tag_id in item.m2m_data["tag"])
+            modified[instance.pk] = instance
+    if not tags:
+        return []
+
+    existing = {}
+    for pk, tag_id in through.objects.filter(
+            **{"{0}__in".format(field): tags.keys()}
+            ).values_list(field, "tag_id"):
+        existing.setdefault(pk, set()).add(tag_id)
+
+    tags = {
+        pk: tag_list for pk, tag_list in tags.items()
+        if existing.get(pk, set()) != tag_list
+    }
+    if not tags:
+        return []
+
+    through.objects.filter(**{"{0}__in".format(field): tags.keys()}).delete()
+    through.objects.bulk_create([
+        through(**{field: pk, "tag_id": tag_id})
+        for pk, tag_list in tags.items()
+        for tag_id in tag_list
+    ])
+
+    return [modified[pk] for pk in tags]
+
+
 class DataImport:
     """Class to import allowance inside the inventory module.
 
     :param tarfile.TarFile tar: Tarfile data to import.
-    :param dict conf: Validated package configuration (not used).
+    :param dict conf: Validated package configuration (``base_version`` \
+    is read for delta packages).
     :param dict key: GPG key data used for signing the package archive.
     """
 
     def __init__(self, tar, conf, key):  # noqa: D107
         self.tar = tar
         self.key = key
+        # Version of the allowance a delta package applies to
+        try:
+            self.base_version = conf["info"].get("base_version")
+        except (KeyError, TypeError, AttributeError):
+            self.base_version = None
         self.data = []
         self.module_name = __name__.split('.')[-2]
 
         self.equipments = []
         self.molecules = []
 
+        # If True, the database is not modified (see update)
+        self.dry_run = False
+        # Added, changed and removed objects per model (see add_changes)
+        self.changes = {}
+        # ID of created or modified objects per kind of search index element
+        self.modified = {"molecule": set(), "equipment": set()}
+
+    def set_modified(self, kind, instances, created=False):
+        """Record created or modified Molecule/Equipment instances.
+
+        Each instance is reported once in the changes.
+
+        :param str kind: ``molecule`` or ``equipment``.
+        :param list instances: Created or modified instances.
+        :param bool created: ``True`` if the instances are created.
+        """
+        model = models.Molecule if kind == "molecule" else models.Equipment
+        instances = [
+            instance for instance in instances
+            if instance.pk not in self.modified[kind]
+        ]
+        self.modified[kind].update(instance.pk for instance in instances)
+        if created:
+            add_changes(self.changes, model, added=instances)
+        else:
+            add_changes(self.changes, model, changed=instances)
+
     def import_allowance(self):
         """Import an Allowance from a YAML file.
 
@@ -279,16 +710,51 @@ class DataImport:
             return False
 
         for allowance in deserialized_allowance:
-            obj = update_allowance(allowance.object, self.key['keyid'][-8:])
+            if not self.check_base_version(allowance.object.name):
+                return False
+            obj = update_allowance(
+                allowance.object,
+                self.key['keyid'][-8:],
+                self.changes
+                )
             break  # FUTURE: Only one allowance per file?
 
         return obj
 
+    def check_base_version(self, name):
+        """Check a delta package applies to the installed allowance version.
+
+        :param str name: Name of the allowance.
+
+        :return: ``True`` if the package is not a delta package or if the \
+        installed allowance version is the base version of the package.
+        :rtype: bool
+        """
+        if self.base_version is None:
+            return True
+
+        try:
+            allowance = models.Allowance.objects.get(name=name)
+        except models.Allowance.DoesNotExist:
+            log.error("Delta package: allowance `%s` is not installed.", name)
+            return False
+
+        if allowance.version != self.base_version:
+            log.error(
+                "Delta package for version %s of allowance `%s` (installed: %s).",
+                self.base_version,
+                name,
+                allowance.version
+                )
+            return False
+
+        return True
+
     def import_molecule(self):
         """Import Molecule objects from a YAML file.
 
-        Use Django's update_or_create method for
-        :mod:`pharmaship.inventory.models.Molecule`.
+        Modified :mod:`pharmaship.inventory.models.Molecule` instances are
+        updated and new ones created in bulk.
 
         :return: ``True`` if successful import, ``False`` otherwise.
         :rtype: bool
@@ -304,44 +770,28 @@ class DataImport:
             log.error("Cannot deserialize molecule objects: %s", error)
             return False
 
-        for molecule in deserialized_list:
-            # Unique: (name, roa, dosage_form, composition)
-            unique_values = {
-                'name_en': molecule.object.name_en,
-                'roa': molecule.object.roa,
-                'dosage_form': molecule.object.dosage_form,
-                'composition_en': molecule.object.composition_en,
-            }
-            molecule_dict = dict(unique_values)  # Hard copy
-            molecule_dict['medicine_list'] = molecule.object.medicine_list
-            molecule_dict['group'] = molecule.object.group
-            molecule_dict['remark_en'] = molecule.object.remark_en
-
-            # TODO: DB calls optimization
-            obj, created = models.Molecule.objects.update_or_create(
-                defaults=molecule_dict,
-                **unique_values
+        # Unique: (name, roa, dosage_form, composition)
+        self.molecules, created, updated = bulk_update_or_create(
+            models.Molecule,
+            deserialized_list,
+            unique_fields=["name_en", "roa", "dosage_form", "composition_en"],
+            fields=["medicine_list", "group", "remark_en"]
+            )
+        self.set_modified("molecule", created, created=True)
+        self.set_modified("molecule", updated)
+        # Add M2M relations
+        self.set_modified(
+            "molecule",
+            bulk_set_tags(models.Molecule, deserialized_list, self.molecules)
             )
-            # Add M2M relations
-            try:
-                if molecule.m2m_data['tag']:
-                    obj.tag = molecule.m2m_data['tag']
-                    obj.save()
-            except KeyError:
-                pass
-
-            if created:
-                log.debug("Created molecule: %s", obj)
-
-            self.molecules.append(obj)
 
         return True
 
     def import_equipment(self):
         """Import Equipment objects from a YAML file.
 
-        Use Django's update_or_create method for
-        :mod:`pharmaship.inventory.models.Equipment`.
+        Modified :mod:`pharmaship.inventory.models.Equipment` instances are
+        updated and new ones created in bulk.
 
         :return: ``True`` if successful import, ``False`` otherwise.
         :rtype: bool
@@ -357,34 +807,58 @@ class DataImport:
             log.error("Cannot deserialize equipment objects: %s", error)
             return False
 
-        for equipment in deserialized_list:
-            # Unique: (name, packaging, perishable, consumable)
-            unique_values = {
-                'name_en': equipment.object.name_en,
-                'packaging_en': equipment.object.packaging_en,
-                'perishable': equipment.object.perishable,
-                'consumable': equipment.object.consumable
-            }
-            equipment_dict = dict(unique_values)  # Hard copy
-            equipment_dict["group"] = equipment.object.group
-            equipment_dict['picture'] = equipment.object.picture
-            equipment_dict['remark_en'] = equipment.object.remark_en
-
-            # TODO: DB calls optimization
-            obj, created = models.Equipment.objects.update_or_create(
-                defaults=equipment_dict,
-                **unique_values
+        # Unique: (name, packaging, perishable, consumable)
+        self.equipments, created, updated = bulk_update_or_create(
+            models.Equipment,
+            deserialized_list,
+            unique_fields=["name_en", "packaging_en", "perishable", "consumable"],
+            fields=["group", "picture", "remark_en"]
+            )
+        self.set_modified("equipment", created, created=True)
+        self.set_modified("equipment", updated)
+        # Add M2M relations
+        self.set_modified(
+            "equipment",
+            bulk_set_tags(models.Equipment, deserialized_list, self.equipments)
             )
-
-            if created:
-                log.debug("Created equipment: %s", obj)
-
-            self.equipments.append(obj)
 
         return True
 
     def import_translation(self, allowance):
+        """Translate Molecule and Equipment objects with package translations.
+
+        Translated fields are computed from the ``.mo`` file of each language
+        and only modified objects are updated. For a delta package, all the
+        objects of the allowance are translated, with the installed ``.mo``
+        file when it is unchanged since the base package (not in the delta
+        package). Translation files are copied in ``TRANSLATIONS_FOLDER``
+        (not in dry-run mode).
+
+        :param models.Allowance allowance: Imported allowance (its name \
+        gives the translation domain).
+
+        :return: ``True`` if successful import.
+        :rtype: bool
+        """
         domain = slugify(allowance.name)
+        equipments = self.equipments
+        molecules = self.molecules
+        if self.base_version is not None:
+            # Delta package: objects of the allowance are not all in it
+            equipments = list({
+                item.id: item for item in list(
+                    models.Equipment.objects.filter(allowances=allowance)
+                    ) + equipments
+                }.values())
+            molecules = list({
+                item.id: item for item in list(
+                    models.Molecule.objects.filter(allowances=allowance)
+                    ) + molecules
+                }.values())
+        translated = [
+            ("equipment", models.Equipment, equipments, ["name", "packaging", "remark"]),
+            ("molecule", models.Molecule, molecules, ["name", "composition", "remark"]),
+        ]
         for language in settings.LANGUAGES:
             if language[0] == "en":
                 continue
@@ -392,78 +866,52 @@ class DataImport:
             lang = language[0].lower()
 
             filename = "locale/{0}/LC_MESSAGES/{1}.mo".format(lang, domain)
-            content = get_file(filename, self.tar)
+            domain_path = settings.TRANSLATIONS_FOLDER / lang / "LC_MESSAGES" / domain
+            full_filename = domain_path.with_suffix(".mo")
+            in_package = (
+                self.base_version is None
+                or filename in self.tar.getnames()
+                or not full_filename.exists()
+                )
+            if in_package:
+                content = get_file(filename, self.tar)
+            else:
+                # Delta package: translation file unchanged since the base
+                content = full_filename.read_bytes()
             if not content:
                 log.debug("Translation for language `%s` not found.", lang)
                 continue
 
-            domain_path = settings.TRANSLATIONS_FOLDER / lang / "LC_MESSAGES" / domain
-            full_filename = domain_path.with_suffix(".mo")
-            full_filename.parent.mkdir(parents=True, exist_ok=True)
-            full_filename.write_bytes(content)
+            if in_package and not self.dry_run:
+                full_filename.parent.mkdir(parents=True, exist_ok=True)
+                full_filename.write_bytes(content)
 
-            trad = gettext.translation(
-                    domain=domain,
-                    localedir=settings.TRANSLATIONS_FOLDER.resolve(),
-                    languages=[lang]
-                )
+            trad = gettext.GNUTranslations(io.BytesIO(content))
 
             _ = trad.gettext
 
-            # Update one by one...
-            to_update = []
-            for equipment in self.equipments:
-                setattr(
-                    equipment,
-                    "name_{0}".format(lang),
-                    _(equipment.name_en)
-                    )
-                setattr(
-                    equipment,
-                    "packaging_{0}".format(lang),
-                    _(equipment.packaging_en)
-                    )
-                setattr(
-                    equipment,
-                    "remark_{0}".format(lang),
-                    _(equipment.remark_en)
-                    )
-                to_update.append(equipment)
-
-            models.Equipment.objects.bulk_update(
-                to_update,
-                [
-                    "name_{0}".format(lang),
-                    "packaging_{0}".format(lang),
-                    "remark_{0}".format(lang),
-                ])
-
-            to_update = []
-            for molecule in self.molecules:
-                setattr(
-                    molecule,
-                    "name_{0}".format(lang),
-                    _(molecule.name_en)
-                    )
-                setattr(
-                    molecule,
-                    "composition_{0}".format(lang),
-                    _(molecule.composition_en)
-                    )
-                setattr(
-                    molecule,
-                    "remark_{0}".format(lang),
-                    _(molecule.remark_en)
-                    )
-                to_update.append(molecule)
-
-            models.Molecule.objects.bulk_update(
-                to_update,
-                [
-                    "name_{0}".format(lang),
-                    "composition_{0}".format(lang),
-                    "remark_{0}".format(lang),
-                ])
+            for kind, model, instances, fields in translated:
+                to_update = []
+                for instance in instances:
+                    modified = False
+                    for field in fields:
+                        value = _(getattr(instance, "{0}_en".format(field)))
+                        attname = "{0}_{1}".format(field, lang)
+                        if getattr(instance, attname) != value:
+                            setattr(instance, attname, value)
+                            modified = True
+                    if modified:
+                        to_update.append(instance)
+
+                if to_update:
+                    model.objects.bulk_update(
+                        to_update,
+                        ["{0}_{1}".format(field, lang) for field in fields]
+                        )
+                self.set_modified(kind, to_update)
+
+            if self.dry_run or not in_package:
+                continue
 
             # Copy PO file if there is one...
             filename = "locale/{0}/LC_MESSAGES/{1}.po".format(lang, domain)
@@ -476,7 +924,7 @@ class DataImport:
 
         return True
 
-    def update(self):
+    def update(self, dry_run=False):
         """Launch the importation.
 
         Import first the :mod:`pharmaship.inventory.models.Allowance`.
@@ -499,11 +947,43 @@ class DataImport:
         :mod:`pharmaship.inventory.models.Allowance` (``id=0``) with a
         required quantity of 0.
 
+        Package content is compared with the database: only added, modified
+        or removed rows are written and reported in ``changes`` attribute.
+
+        A delta package (with a ``base_version`` in its configuration) is
+        only applied to the installed allowance of this version. It contains
+        only the modified objects and required quantities.
+
+        All modifications are done in one database transaction: nothing is
+        imported in case of error.
+
+        :param bool dry_run: If ``True``, the transaction is rolled back \
+        and no file is written: ``changes`` lists what the import would do.
+
         :return: ``True`` if import successful, ``False`` otherwise.
         :rtype: bool
         """
         log.info("Inventory import...")
+        self.dry_run = dry_run
+        self.changes = {}
+
+        with transaction.atomic():
+            result = self.import_all()
+            if not result:
+                log.info("Inventory import cancelled.")
+                transaction.set_rollback(True)
+            elif dry_run:
+                log.info("Inventory import simulated, changes not applied.")
+                transaction.set_rollback(True)
+
+        return result
+
+    def import_all(self):
+        """Import the allowance and its items (see :meth:`update`).
 
+        :return: ``True`` if import successful, ``False`` otherwise.
+        :rtype: bool
+        """
         # Detecting objects without allowance (orphan)
         self.no_allowance = models.Allowance.objects.get(pk=0)
         query_count_all()
@@ -526,6 +1006,17 @@ class DataImport:
             return False
         query_count_all()
 
+        # Translations are bulk updated (no signal sent). Indexes are updated
+        # once the import is committed (not in dry-run mode).
+        for kind in ("molecule", "equipment"):
+            transaction.on_commit(functools.partial(
+                search_index.update,
+                kind,
+                list(self.modified[kind])
+                ))
+        if self.modified["molecule"] or self.modified["equipment"]:
+            transaction.on_commit(fuzzy_index.clear)
+
         # Required Quantities
         required = [
             {
@@ -562,43 +1053,42 @@ class DataImport:
 
         query_count_all()
 
+        # Bases of all required quantities are resolved with the same cache
+        resolver = NaturalKeyResolver()
         for item in required:
-            res = required_quantity(item, self.tar, allowance)
+            res = required_quantity(
+                item,
+                self.tar,
+                allowance,
+                resolver,
+                self.changes,
+                delta=self.base_version is not None
+                )
             if not res:
                 return False
 
-        # Listing molecules with no reqqty
-        molecule_orphan_after = models.Molecule.objects.filter(
-            allowances=None)
-        equipment_orphan_after = models.Equipment.objects.filter(
-            allowances=None)
-
-        log.info("Orphan Molecules: %s", len(molecule_orphan_after))
-        log.info("Orphan Equipments: %s", len(equipment_orphan_after))
-
-        # Creating reqqty with special allowance (id=1)
-        for molecule in molecule_orphan_after:
-            models.MoleculeReqQty.objects.create(
-                base=molecule,
-                allowance=self.no_allowance,
-                required_quantity=0
-                )
-
-        for equipment in equipment_orphan_after:
-            models.EquipmentReqQty.objects.create(
-                base=equipment,
-                allowance=self.no_allowance,
-                required_quantity=0
-                )
-
-        # Copying pictures
-        self.tar.extractall(
-            members=pictures_files(self.tar),
-            path=str(settings.PICTURES_FOLDER)
+        # Creating reqqty with special allowance (id=0)
+        update_orphans(
+            models.Molecule,
+            models.MoleculeReqQty,
+            self.no_allowance,
+            self.changes
+            )
+        update_orphans(
+            models.Equipment,
+            models.EquipmentReqQty,
+            self.no_allowance,
+            self.changes
             )
+        # Bulk operations do not send signals
+        if self.changes:
+            transaction.on_commit(cache.clear)
 
-        # Set allowance active as everything went well
-        allowance.active = True
-        allowance.save()
+        # Copying pictures
+        if not self.dry_run:
+            self.tar.extractall(
+                members=pictures_files(self.tar, settings.PICTURES_FOLDER),
+                path=str(settings.PICTURES_FOLDER)
+                )
 
         return True
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Django Command to rebuild the full-text search index."""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from pharmaship.core.utils import log
+
+from pharmaship.inventory import search_index
+
+
+class Command(BaseCommand):
+    """Rebuild the full-text search index of molecules and equipments."""
+
+    help = "Rebuild the full-text search index of molecules and equipments."
+
+    def handle(self, *args, **options):  # noqa: D102
+        if not search_index.is_available() and not search_index.create_table(connection):
+            raise CommandError("Full-text search index not supported by the database.")
+
+        log.info("Rebuilding search index...")
+        count = search_index.rebuild()
+        log.info("Search index rebuilt: %s elements.", count)
@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Django Command to rebuild the items stock from transactions history."""
+from django.core.management.base import BaseCommand
+
+from pharmaship.core.utils import log
+
+from pharmaship.inventory.utils import rebuild_stock
+
+
+class Command(BaseCommand):
+    """Rebuild the stock of all items from the transactions history."""
+
+    help = "Rebuild the stock of all items from the transactions history."
+
+    def handle(self, *args, **options):  # noqa: D102
+        log.info("Rebuilding stock from transactions history...")
+        count = rebuild_stock()
+        log.info("Stock rebuilt: %s items.", count)
@@ -1,16 +1,21 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import gettext
+import functools
 from pathlib import Path
 
 from django.core.management.base import BaseCommand
 from django.utils.text import slugify
 
 from django.conf import settings
+from django.db import transaction
 
 from pharmaship.core.utils import log, get_content_types
 
+from pharmaship.inventory import fuzzy_index
+from pharmaship.inventory import search_index
 from pharmaship.inventory.models import Allowance, Equipment, Molecule
+from pharmaship.inventory.parsers import cache
 from pharmaship.inventory.export import serialize_allowance, create_pot, create_po
 
 
@@ -207,4 +212,18 @@ class Command(BaseCommand):
                 "composition_{0}".format(lang),
                 "remark_{0}".format(lang),
             ])
+
+        # Bulk updates do not send signals: translated fields are indexed
+        transaction.on_commit(functools.partial(
+            search_index.update,
+            "equipment",
+            [item.id for item in equipment_list]
+            ))
+        transaction.on_commit(functools.partial(
+            search_index.update,
+            "molecule",
+            [item.id for item in molecule_list]
+            ))
+        transaction.on_commit(fuzzy_index.clear)
+        transaction.on_commit(cache.clear)
         return
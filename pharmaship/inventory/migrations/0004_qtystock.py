@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_stock(apps, schema_editor):
+    """Compute the stock of each item from existing transactions."""
+    QtyTransaction = apps.get_model('inventory', 'QtyTransaction')
+    QtyStock = apps.get_model('inventory', 'QtyStock')
+
+    result = {}
+    transactions = QtyTransaction.objects.order_by("date", "id").values_list(
+        "content_type_id", "object_id", "transaction_type", "value", "date")
+    for content_type_id, object_id, transaction_type, value, date in transactions.iterator():
+        key = (content_type_id, object_id)
+        if key not in result:
+            result[key] = [0, date]
+        if transaction_type in [1, 8]:
+            result[key][0] = value
+        else:
+            result[key][0] -= value
+        result[key][1] = date
+
+    QtyStock.objects.bulk_create([
+        QtyStock(content_type_id=key[0], object_id=key[1], quantity=value[0], date=value[1])
+        for key, value in result.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('inventory', '0003_allowance_translation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QtyStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Quantity')),
+                ('date', models.DateTimeField(blank=True, null=True)),
+                ('object_id', models.PositiveIntegerField()),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(populate_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from pharmaship.inventory import search_index
+
+
+def create_search_index(apps, schema_editor):
+    """Create the full-text search index and index existing elements."""
+    if search_index.create_table(schema_editor.connection):
+        search_index.rebuild(apps, using=schema_editor.connection.alias)
+
+
+def drop_search_index(apps, schema_editor):
+    """Drop the full-text search index."""
+    search_index.drop_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_qtystock'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
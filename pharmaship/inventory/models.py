@@ -1,6 +1,6 @@
 # -*- coding: utf-8; -*-
 """Inventory application models."""
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext as _
 from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
@@ -155,6 +155,20 @@ class QtyTransaction(models.Model):
     def __str__(self):  # noqa: D105
         return "{0} ({1}: {2})".format(self.content_object, self.get_transaction_type_display(), self.value)
 
+    def save(self, *args, **kwargs):
+        """Save the transaction and refresh the related stock in one DB transaction.
+
+        The :mod:`pharmaship.inventory.models.QtyStock` update is done by the
+        ``post_save`` signal handler, sent inside this atomic block.
+        """
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Delete the transaction and refresh the related stock in one DB transaction."""
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().delete(*args, **kwargs)
+
 
 class BaseItem(models.Model):
     name = models.CharField(_("Name"), max_length=100)  # Brand Name. Example: Doliprane for INN Paracétamol
@@ -171,23 +185,9 @@ class BaseItem(models.Model):
         return "{0} (exp: {1})".format(self.name, self.exp_date)
 
     def get_quantity(self):
-        """Compute the quantity according to the transactions attached to this medicine."""
-        # Get latest Stock Count and then make the sum
-        transactions = self.transactions.order_by("date")
-
-        # Find last IN (type=1) or STOCK COUNT (type=8)
-        last_stock_count = transactions.filter(transaction_type__in=[1, 8]).latest("date")
-        # If found: filter by date (only recent transaction to take in account)
-        # If not found: start from beginning
-        if last_stock_count:
-            transactions = self.transactions.filter(date__gte=last_stock_count.date).order_by("date")
-        # Parse each transactions
-        quantity = 0
-        for transaction in transactions:
-            if transaction.transaction_type in [1, 8]:
-                quantity = transaction.value
-            else:
-                quantity -= transaction.value
+        """Return the quantity of this item from its :mod:`pharmaship.inventory.models.QtyStock`."""
+        content_type = ContentType.objects.get_for_model(self)
+        quantity = utils.get_stock(content_type.id, [self.id]).get(self.id, 0)
 
         if quantity < 0:
             log.warning("Element with negative quantity")
@@ -426,3 +426,31 @@ class TelemedicalReqQty(BaseReqQty):
 
 class LaboratoryReqQty(BaseReqQty):
     base = models.ForeignKey('Equipment', on_delete=models.CASCADE)
+
+
+class QtyStock(models.Model):
+    """Stores the current quantity of an item.
+
+    This is a materialized view of the
+    :mod:`pharmaship.inventory.models.QtyTransaction` history of an item
+    (:mod:`pharmaship.inventory.models.Medicine`,
+    :mod:`pharmaship.inventory.models.Article` or
+    :mod:`pharmaship.inventory.models.FirstAidKitItem`).
+
+    It is kept up-to-date by signal handlers
+    (see :mod:`pharmaship.inventory.signals`) and can be rebuilt from the
+    transactions history with the ``rebuild_stock`` command.
+    """
+
+    quantity = models.IntegerField(_("Quantity"), default=0)
+    date = models.DateTimeField(blank=True, null=True)  # Latest transaction date
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    def __str__(self):  # noqa: D105
+        return "{0} ({1})".format(self.content_object, self.quantity)
+
+    class Meta:  # noqa: D106
+        unique_together = (('content_type', 'object_id'),)
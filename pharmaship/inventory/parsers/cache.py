@@ -0,0 +1,94 @@
+# -*- coding: utf-8; -*-
+"""Process-wide cache of parsers results.
+
+Results are cleared by signal handlers (see
+:mod:`pharmaship.inventory.signals`) when a model used by the parsers is
+saved or deleted.
+"""
+import functools
+import threading
+
+from django.utils import translation
+
+from pharmaship.core.utils import log
+
+_cache = {}
+_lock = threading.Lock()
+# Incremented at each invalidation to avoid storing results computed
+# while the database was modified.
+_generation = 0
+
+
+def get_key(func, params):
+    """Return the cache key of a parser call.
+
+    :param function func: Parser function
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Key made of the parser name, active allowances, date, warning \
+    delay, number of first aid kits and language.
+    :rtype: tuple
+    """
+    return (
+        func.__module__,
+        tuple(sorted(params.allowances.values_list("id", flat=True))),
+        params.today,
+        params.setting.expire_date_warning_delay,
+        params.setting.first_aid_kit,
+        translation.get_language()
+        )
+
+
+def copy_result(data):
+    """Return a copy of the containers (dict and list) of a parser result.
+
+    Other objects (model instances, dates...) are not copied.
+
+    :param data: Parser result
+
+    :return: Copy of ``data`` that can be modified by the caller.
+    """
+    if isinstance(data, dict):
+        return {key: copy_result(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [copy_result(value) for value in data]
+    return data
+
+
+def clear():
+    """Remove all parsers results from the cache."""
+    global _generation
+    with _lock:
+        _cache.clear()
+        _generation += 1
+
+
+def cached(func):
+    """Decorate a parser function to cache its full results.
+
+    Only calls with ``params`` as sole argument are cached. Partial parses
+    (with other arguments like ``parent_ids``) are always computed.
+    """
+    @functools.wraps(func)
+    def wrapper(params, *args, **kwargs):
+        if args or any(value is not None for value in kwargs.values()):
+            return func(params, *args, **kwargs)
+
+        key = get_key(func, params)
+        with _lock:
+            generation = _generation
+            if key in _cache:
+                return copy_result(_cache[key])
+
+        result = func(params)
+
+        with _lock:
+            if generation == _generation:
+                _cache[key] = result
+            else:
+                log.debug("Database modified while parsing. Result not cached.")
+
+        return copy_result(result)
+
+    return wrapper
@@ -8,12 +8,14 @@ from django.utils.translation import gettext as _
 from pharmaship.core.utils import log
 
 from pharmaship.inventory import models
-from pharmaship.inventory.utils import req_qty_element, get_quantity
+from pharmaship.inventory.utils import get_required_quantities, required_quantity, get_stock
+from pharmaship.inventory.parsers.cache import cached
 # from purchase.models import Item
 
 
 # Pre-treatment function
-def parser(params):
+@cached
+def parser(params, parent_ids=None):
     """Parse the database to render a dict of EquipmentGroup/Equipment/Article.
 
     Process database data and set flags on articles missing, expired or \
@@ -28,28 +30,40 @@ def parser(params):
 
     :param object params: Global Parameters of the application \
     (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param list parent_ids: List of :class:`pharmaship.inventory.models.Equipment` \
+    ID to parse (incremental mode, for instance after a transaction on one of \
+    their items). If ``None``, all elements are parsed.
 
     :return: Dictionnary with list of Equipment by EquimentGroup.
     :rtype: dict(list)
     """
     allowance_list = params.allowances
-    location_list = params.locations
+    location_map = params.location_map
     warning_delay = params.setting.expire_date_warning_delay
     today = params.today
     data = {}
     # Required quantities for listed allowances
-    req_qty_list = models.EquipmentReqQty.objects.filter(allowance__in=allowance_list).prefetch_related('base', 'allowance')
+    req_qty_list = models.EquipmentReqQty.objects.filter(allowance__in=allowance_list)
+    if parent_ids is not None:
+        req_qty_list = req_qty_list.filter(base_id__in=parent_ids)
+    required = get_required_quantities(req_qty_list)
     # Equipment list
     equipments = models.Equipment.objects.filter(allowances__in=allowance_list).distinct().prefetch_related('group', 'tag', 'articles').order_by('group', 'name')
-    # Article quantity transaction list
-    data["qty_transactions"] = models.QtyTransaction.objects.filter(content_type=params.content_types['article']).order_by("date")
+    if parent_ids is not None:
+        equipments = equipments.filter(id__in=parent_ids)
+    # Article quantities
+    if parent_ids is not None:
+        items = models.Article.objects.filter(parent_id__in=parent_ids).values_list("id", flat=True)
+        data["quantities"] = get_stock(params.content_types['article'], items)
+    else:
+        data["quantities"] = get_stock(params.content_types['article'])
 
     # Ordered items
     # data["ordered_items"] = Item.objects.filter(
     #     content_type=ContentType.objects.get_for_model(models.Equipment),
     #     requisition__status__in=[4,5])
     # Locations
-    data["locations"] = location_list
+    data["locations"] = location_map
 
     if today is None:
         today = datetime.date.today()
@@ -58,7 +72,7 @@ def parser(params):
 
     for equipment in equipments:
         element = parser_element(equipment, data, warning_delay, today)
-        element["required_quantity"], element["allowance"] = req_qty_element(equipment, req_qty_list)
+        element["required_quantity"], element["allowance"] = required_quantity(required, equipment.id)
         # Do not add not required elemments with zero quantity
         if element["required_quantity"] == 0 and element["quantity"] == 0:
             continue
@@ -83,10 +97,10 @@ def parser_element(equipment, data, warning_delay, today=datetime.date.today()):
     :param models.Equipment equipment: Equipment to parse
     :param dict data: Common data for parsing. Following keys must be present:
 
-        * ``qty_transactions``: QuerySet of \
-        :class:`pharmaship.inventory.models.QtyTransaction`
-        * ``locations``: formatted list of \
-        :class:`pharmaship.inventory.models.Location`
+        * ``quantities``: dictionary of current quantities (keys are \
+        items ID), see :func:`pharmaship.inventory.utils.get_stock`
+        * ``locations``: formatted :class:`pharmaship.inventory.models.Location` \
+        indexed by ID, see :func:`pharmaship.inventory.utils.get_location_map`
 
     :param datetime.date warning_delay: Date from which warning flag must be \
     set
@@ -96,7 +110,7 @@ def parser_element(equipment, data, warning_delay, today=datetime.date.today()):
     :rtype: dict
     """
     # ordered_items = data["ordered_items"]
-    qty_transactions = data["qty_transactions"]
+    quantities = data["quantities"]
     locations = data["locations"]
 
     element_dict = {}
@@ -166,15 +180,14 @@ def parser_element(equipment, data, warning_delay, today=datetime.date.today()):
                 "rescue_bag": None
             }
             location_display = _("Unassigned")
-        else:
-            for item in locations:
-                if article.location_id == item["id"]:
-                    item_dict['location'] = item
-                    location_display = " > ".join(item["sequence"])
-                    if location_display not in element_dict['locations']:
-                        element_dict['locations'].append(location_display)
+        elif article.location_id in locations:
+            location = locations[article.location_id]
+            item_dict['location'] = location["location"]
+            location_display = location["display"]
+            if location_display not in element_dict['locations']:
+                element_dict['locations'].append(location_display)
         # Quantity
-        item_dict['quantity'] = get_quantity(qty_transactions, article.id)
+        item_dict['quantity'] = quantities.get(article.id, 0)
 
         if item_dict['quantity'] < 0:
             log.warning("Article (ID: %s) with negative quantity (%s)", item_dict["id"], item_dict["quantity"])
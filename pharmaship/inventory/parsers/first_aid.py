@@ -8,6 +8,8 @@ import locale
 from pharmaship.core.utils import log
 
 from pharmaship.inventory import models
+from pharmaship.inventory.utils import add_required_quantity, get_stock
+from pharmaship.inventory.parsers.cache import cached
 # from purchase.models import Item
 
 
@@ -34,32 +36,15 @@ def get_required(params):
         else:
             key = "equipments"
 
-        if item.object_id not in required_quantities[key]:
-            required_quantities[key][item.object_id] = {
-                "additional": 0,
-                "maximum": 0,
-                "detail": []
-            }
-
-        element = required_quantities[key][item.object_id]
-
-        detail = {
-            "name": item.allowance.name
-            }
-        if item.allowance.additional:
-            element["additional"] += item.required_quantity
-            detail["quantity"] = "+{0}".format(item.required_quantity)
-        else:
-            element["maximum"] = max(element["maximum"], item.required_quantity)
-            detail["quantity"] = item.required_quantity
-
-        element["detail"].append(detail)
+        add_required_quantity(required_quantities[key], item.object_id, item)
 
     return required_quantities
 
 
 def get_transactions(content_type, items):
-    """Get transactions for selected `items`.
+    """Get current quantities for selected `items`.
+
+    Quantities are read from :class:`pharmaship.inventory.models.QtyStock`.
 
     :param int content_type: ID of ContentType of items
     :param list items: List of items ID
@@ -68,22 +53,7 @@ def get_transactions(content_type, items):
     items ID.
     :rtype: dict
     """
-    transactions = models.QtyTransaction.objects.filter(
-        content_type_id=content_type,
-        object_id__in=items
-        ).order_by("date")
-
-    result = {}
-    for transaction in transactions:
-        if transaction.object_id not in result:
-            result[transaction.object_id] = 0
-
-        if transaction.transaction_type in [1, 8]:
-            result[transaction.object_id] = transaction.value
-        else:
-            result[transaction.object_id] -= transaction.value
-
-    return result
+    return get_stock(content_type, items)
 
 
 def create_molecule(item, content_type, required=None):
@@ -386,6 +356,7 @@ def merge_elements(elements_dict):
     return result
 
 
+@cached
 def parser(params, kits=None):
     """Parse the database to render a list of Kits with their contents.
 
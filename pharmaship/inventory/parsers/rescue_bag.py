@@ -8,9 +8,12 @@ from django.utils.translation import gettext as _
 from pharmaship.core.utils import log
 
 from pharmaship.inventory import models
+from pharmaship.inventory.utils import add_required_quantity, get_stock
+from pharmaship.inventory.parsers.cache import cached
 
 
 # Pre-treatment function
+@cached
 def parser(params):
     """Parse the database to render a list of Equipments & Molecules.
 
@@ -122,7 +125,9 @@ def create_equipments(id_list, required):
 
 
 def get_transactions(content_type, items):
-    """Get transactions for selected `items`.
+    """Get current quantities for selected `items`.
+
+    Quantities are read from :class:`pharmaship.inventory.models.QtyStock`.
 
     :param int content_type: ID of ContentType of items
     :param list items: List of items ID
@@ -131,22 +136,7 @@ def get_transactions(content_type, items):
     items ID.
     :rtype: dict
     """
-    transactions = models.QtyTransaction.objects.filter(
-        content_type_id=content_type,
-        object_id__in=items
-        ).order_by("date")
-
-    result = {}
-    for transaction in transactions:
-        if transaction.object_id not in result:
-            result[transaction.object_id] = 0
-
-        if transaction.transaction_type in [1, 8]:
-            result[transaction.object_id] = transaction.value
-        else:
-            result[transaction.object_id] -= transaction.value
-
-    return result
+    return get_stock(content_type, items)
 
 
 def get_required(params):
@@ -170,26 +160,7 @@ def get_required(params):
         else:
             key = "equipments"
 
-        if item.object_id not in required_quantities[key]:
-            required_quantities[key][item.object_id] = {
-                "additional": 0,
-                "maximum": 0,
-                "detail": []
-            }
-
-        element = required_quantities[key][item.object_id]
-
-        detail = {
-            "name": item.allowance.name
-            }
-        if item.allowance.additional:
-            element["additional"] += item.required_quantity
-            detail["quantity"] = "+{0}".format(item.required_quantity)
-        else:
-            element["maximum"] = max(element["maximum"], item.required_quantity)
-            detail["quantity"] = item.required_quantity
-
-        element["detail"].append(detail)
+        add_required_quantity(required_quantities[key], item.object_id, item)
 
     return required_quantities
 
@@ -5,14 +5,16 @@ import locale
 from pharmaship.core.utils import log
 
 from pharmaship.inventory import models
-from pharmaship.inventory.utils import req_qty_element
+from pharmaship.inventory.utils import get_required_quantities, required_quantity, get_stock
+from pharmaship.inventory.parsers.cache import cached
 # from purchase.models import Item
 
 from pharmaship.inventory.parsers.equipment import parser_element
 
 
 # Pre-treatment function
-def parser(params):
+@cached
+def parser(params, parent_ids=None):
     """Parse the database to render a list of Equipment/Article.
 
     Process database data and set flags on articles missing, expired or \
@@ -25,29 +27,39 @@ def parser(params):
 
     :param object params: Global Parameters of the application \
     (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param list parent_ids: List of :class:`pharmaship.inventory.models.Equipment` \
+    ID to parse (incremental mode, for instance after a transaction on one of \
+    their items). If ``None``, all elements are parsed.
 
     :return: List of Equipment.
     :rtype: list
     """
     data = {}
     allowance_list = params.allowances
-    location_list = params.locations
+    location_map = params.location_map
     warning_delay = params.setting.expire_date_warning_delay
     today = params.today
     # Required quantities for listed allowances
-    req_qty_list = models.TelemedicalReqQty.objects.filter(allowance__in=allowance_list).prefetch_related('base', 'allowance')
+    req_qty_list = models.TelemedicalReqQty.objects.filter(allowance__in=allowance_list)
+    if parent_ids is not None:
+        req_qty_list = req_qty_list.filter(base_id__in=parent_ids)
+    required = get_required_quantities(req_qty_list)
     # Equipment list
     equipment_ids = req_qty_list.values_list("base_id", flat=True)
     equipments = models.Equipment.objects.filter(id__in=equipment_ids).distinct().prefetch_related('tag', 'articles').order_by('name')
-    # Article quantity transaction list
-    data["qty_transactions"] = models.QtyTransaction.objects.filter(content_type=params.content_types['article']).order_by("date")
+    # Article quantities
+    if parent_ids is not None:
+        items = models.Article.objects.filter(parent_id__in=parent_ids).values_list("id", flat=True)
+        data["quantities"] = get_stock(params.content_types['article'], items)
+    else:
+        data["quantities"] = get_stock(params.content_types['article'])
 
     # Ordered items
     # data["ordered_items"] = Item.objects.filter(
     #     content_type=ContentType.objects.get_for_model(models.Equipment),
     #     requisition__status__in=[4,5])
     # Locations
-    data["locations"] = location_list
+    data["locations"] = location_map
 
     if today is None:
         today = datetime.date.today()
@@ -56,7 +68,7 @@ def parser(params):
 
     for equipment in equipments:
         element = parser_element(equipment, data, warning_delay, today)
-        element["required_quantity"], element["allowance"] = req_qty_element(equipment, req_qty_list)
+        element["required_quantity"], element["allowance"] = required_quantity(required, equipment.id)
         result.append(element)
 
     result = sorted(
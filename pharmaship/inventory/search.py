@@ -6,27 +6,32 @@ from django.utils.translation import gettext as _
 from pharmaship.core.utils import log, query_count_all
 
 from pharmaship.inventory import models
-from pharmaship.inventory.utils import req_qty_element
+from pharmaship.inventory import fuzzy_index
+from pharmaship.inventory import search_index
+from pharmaship.inventory.utils import get_required_quantities, required_quantity, get_stock
 
+# Default number of results of a search page
+PAGE_SIZE = 20
 
-def location_display(location_id_list, locations):
+
+def location_display(location_id_list, location_map):
     """Return list of human-readable locations.
 
-    The format of ``locations`` is the same as ``params.locations``.
+    The format of ``location_map`` is the same as ``params.location_map``.
 
     :param list(int) location_id_list: List of Location ID to display.
-    :param list locations: List of all parsed \
-    :class:`pharmaship.inventory.models.Location` instances.
+    :param dict location_map: Parsed \
+    :class:`pharmaship.inventory.models.Location` instances indexed by ID \
+    (see :func:`pharmaship.inventory.utils.get_location_map`).
 
-    :return: List of strings representing each selected Location.
+    :return: List of strings representing each selected Location, sorted \
+    in tree order.
     :rtype: list(str)
     """
-    result = []
-    for item in locations:
-        if item["id"] in location_id_list:
-            result.append(" > ".join(item["sequence"]))
+    result = [location_map[item] for item in location_id_list if item in location_map]
+    result.sort(key=lambda item: item["order"])
 
-    return result
+    return [item["display"] for item in result]
 
 
 def get_quantity(transactions):
@@ -50,7 +55,85 @@ def get_quantity(transactions):
     return result
 
 
-def search(text, params):
+def get_matches(text, fuzzy=False):
+    """Return the elements related to a long enough text, best match first.
+
+    To avoid unnecessary search, text length must be at least 2 chars.
+
+    Molecules are listed before equipments. Only the ID of elements are
+    retrieved: details are parsed with :func:`parse_matches`.
+
+    :param str text: String to search in the different database models.
+    :param bool fuzzy: If ``True``, results also include elements matching \
+    the text without accents and with typos (see \
+    :mod:`pharmaship.inventory.fuzzy_index`).
+
+    :return: List of tuples (kind, ID) where kind is ``molecule`` or \
+    ``equipment``.
+    :rtype: list(tuple)
+    """
+    if len(text) < 2:
+        return []
+
+    result = []
+    for kind, parent_model, item_model in (
+            ("molecule", models.Molecule, models.Medicine),
+            ("equipment", models.Equipment, models.Article)):
+        id_list = get_id_list(text, kind, parent_model, item_model, fuzzy)
+        result += [(kind, item) for item in id_list]
+    return result
+
+
+def parse_matches(matches, params):
+    """Yield the parsed results of elements, one list per kind.
+
+    :param list(tuple) matches: List of tuples (kind, ID) (see \
+    :func:`get_matches`).
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Generator of lists of parsed results. See \
+    ``pharmaship/schemas/search.json`` for details.
+    :rtype: generator
+    """
+    for kind, function in (("molecule", parse_molecules), ("equipment", parse_equipments)):
+        id_list = [item for item_kind, item in matches if item_kind == kind]
+        if id_list:
+            yield function(id_list, params)
+
+
+def iter_search(text, params, fuzzy=False, limit=None, offset=0):
+    """Yield the search results of each set from a long enough text.
+
+    Results are yielded as soon as a set is parsed: first molecules, then
+    equipments (including laboratory and telemedical sets).
+
+    To avoid unnecessary search, text length must be at least 2 chars.
+
+    :param str text: String to search in the different database models.
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param bool fuzzy: If ``True``, results also include elements matching \
+    the text without accents and with typos (see \
+    :mod:`pharmaship.inventory.fuzzy_index`).
+    :param int limit: Maximum number of results. If ``None``, all results \
+    are returned.
+    :param int offset: Number of results to skip.
+
+    :return: Generator of lists of parsed results. See \
+    ``pharmaship/schemas/search.json`` for details.
+    :rtype: generator
+    """
+    matches = get_matches(text, fuzzy)
+    if limit is None:
+        matches = matches[offset:]
+    else:
+        matches = matches[offset:offset + limit]
+
+    yield from parse_matches(matches, params)
+
+
+def search(text, params, fuzzy=False, limit=None, offset=0):
     """Return the search results from a long enough text.
 
     To avoid unnecessary search, text length must be at least 2 chars.
@@ -66,19 +149,53 @@ def search(text, params):
     :param str text: String to search in the different database models.
     :param object params: Global Parameters of the application \
     (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param bool fuzzy: If ``True``, results also include elements matching \
+    the text without accents and with typos (see \
+    :mod:`pharmaship.inventory.fuzzy_index`).
+    :param int limit: Maximum number of results. If ``None``, all results \
+    are returned.
+    :param int offset: Number of results to skip.
 
     :return: List of parsed results. See ``pharmaship/schemas/search.json`` \
     for details.
     :rtype: list
     """
-    if len(text) < 2:
-        return []
-
     result = []
 
-    result += get_molecules(text,  params)
+    for results in iter_search(text, params, fuzzy, limit, offset):
+        result += results
+
+    query_count_all()
+
+    return result
+
+
+def search_page(text, params, limit=PAGE_SIZE, offset=0, fuzzy=False):
+    """Return a page of search results and the total number of results.
 
-    result += get_equipments(text, params)
+    Only the results of the page are parsed.
+
+    :param str text: String to search in the different database models.
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param int limit: Maximum number of results of the page.
+    :param int offset: Number of results to skip.
+    :param bool fuzzy: If ``True``, results also include elements matching \
+    the text without accents and with typos (see \
+    :mod:`pharmaship.inventory.fuzzy_index`).
+
+    :return: Dictionary with ``total`` (number of results) and ``results`` \
+    (list of parsed results, see ``pharmaship/schemas/search.json``).
+    :rtype: dict
+    """
+    matches = get_matches(text, fuzzy)
+
+    result = {
+        "total": len(matches),
+        "results": []
+    }
+    for results in parse_matches(matches[offset:offset + limit], params):
+        result["results"] += results
 
     query_count_all()
 
@@ -107,31 +224,104 @@ def parse_items(items):
     return id_list, locations
 
 
-def get_molecules(text, params):
+def get_id_list(text, kind, parent_model, item_model, fuzzy=False):
+    """Return the ID of elements related to searched text, best match first.
+
+    The full-text search index is used when available (see
+    :mod:`pharmaship.inventory.search_index`). Otherwise, the text is
+    searched in parents and children names.
+
+    :param str text: String to search.
+    :param str kind: Kind of element (``molecule`` or ``equipment``).
+    :param parent_model: Parent model (Molecule or Equipment).
+    :param item_model: Child model (Medicine or Article).
+    :param bool fuzzy: If ``True``, elements matching the text without \
+    accents and with typos are added after exact matches.
+
+    :return: List of parent instances ID.
+    :rtype: list(int)
+    """
+    id_list = search_index.search(text, kind)
+    if id_list is None:
+        log.debug("Search index not available.")
+        items = item_model.objects.filter(name__icontains=text).values("parent_id")
+        parents = parent_model.objects.filter(Q(name__icontains=text) | Q(id__in=items))
+        id_list = list(parents.values_list("id", flat=True))
+
+    if fuzzy:
+        exact = set(id_list)
+        id_list += [item for item in fuzzy_index.search(text, kind) if item not in exact]
+
+    return id_list
+
+
+def sort_results(elements, id_list):
+    """Return the elements sorted in the same order as ``id_list``.
+
+    :param django.db.models.query.QuerySet elements: Set of Molecule or \
+    Equipment instances.
+    :param list(int) id_list: Ranked list of elements ID.
+
+    :return: Sorted list of elements.
+    :rtype: list
+    """
+    rank = {item: index for index, item in enumerate(id_list)}
+    return sorted(elements, key=lambda item: rank[item.id])
+
+
+def get_molecules(text, params, fuzzy=False):
     """Return a list of parsed molecules related to searched text.
 
     :param str text: String to search in the different database models.
     :param object params: Global Parameters of the application \
     (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param bool fuzzy: If ``True``, results also include elements matching \
+    the text without accents and with typos (see \
+    :mod:`pharmaship.inventory.fuzzy_index`).
 
     :return: List of parsed results. See ``pharmaship/schemas/search.json`` \
     for details.
     :rtype: list
     """
-    result = []
+    id_list = get_id_list(text, "molecule", models.Molecule, models.Medicine, fuzzy)
+    return parse_molecules(id_list, params)
 
-    # Medicines
-    medicines = models.Medicine.objects.filter(
-        name__icontains=text).prefetch_related("location")
-    id_list, locations = parse_items(medicines)
 
-    # Molecules
+def parse_molecules(id_list, params):
+    """Return a list of parsed molecules.
+
+    :param list(int) id_list: Ranked list of Molecule ID.
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: List of parsed results, in the same order as ``id_list``. See \
+    ``pharmaship/schemas/search.json`` for details.
+    :rtype: list
+    """
+    result = []
+
     molecules = models.Molecule.objects.filter(
-        Q(name__icontains=text) | Q(id__in=id_list)
-        ).prefetch_related("medicines", "medicines__transactions", "group")
-    req_qty_list = models.MoleculeReqQty.objects.filter(
-        allowance__in=params.allowances
-        ).prefetch_related('base', 'allowance')
+        id__in=id_list
+        ).prefetch_related("medicines", "group")
+    molecules = sort_results(molecules, id_list)
+
+    # Locations of the medicines in stock
+    _id_list, locations = parse_items(
+        medicine
+        for molecule in molecules
+        for medicine in molecule.medicines.all()
+        if not medicine.used
+        )
+    # Current quantities of all medicines in one query
+    quantities = get_stock(
+        params.content_types["medicine"],
+        models.Medicine.objects.filter(parent_id__in=id_list, used=False).values("id")
+        )
+
+    required = get_required_quantities(models.MoleculeReqQty.objects.filter(
+        allowance__in=params.allowances,
+        base_id__in=id_list
+        ))
 
     for item in molecules:
         if item.id not in locations:
@@ -139,7 +329,7 @@ def get_molecules(text, params):
 
         item_locations = location_display(
             locations[item.id].keys(),
-            locations=params.locations
+            location_map=params.location_map
             )
 
         item_dict = {
@@ -154,17 +344,17 @@ def get_molecules(text, params):
             "required": 0
         }
 
-        required_quantity, _allowance = req_qty_element(item, req_qty_list)
-        if required_quantity > 0:
+        quantity, _allowance = required_quantity(required, item.id)
+        if quantity > 0:
             item_dict["type"].append({
                 "label": _("Medicines"),
                 "name": "medicines"
                 })
-            item_dict["required"] += required_quantity
+            item_dict["required"] += quantity
 
         for medicine in item.medicines.all():
             if not medicine.used:
-                item_dict["quantity"] += get_quantity(medicine.transactions.all())
+                item_dict["quantity"] += quantities.get(medicine.id, 0)
             if medicine.name == item.name:
                 continue
             item_dict["other_names"].append(medicine.name)
@@ -173,43 +363,73 @@ def get_molecules(text, params):
     return result
 
 
-def get_equipments(text, params):
+def get_equipments(text, params, fuzzy=False):
     """Return a list of parsed equipments related to searched text.
 
     :param str text: String to search in the different database models.
     :param object params: Global Parameters of the application \
     (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param bool fuzzy: If ``True``, results also include elements matching \
+    the text without accents and with typos (see \
+    :mod:`pharmaship.inventory.fuzzy_index`).
 
     :return: List of parsed results. See ``pharmaship/schemas/search.json`` \
     for details.
     :rtype: list
     """
-    result = []
+    id_list = get_id_list(text, "equipment", models.Equipment, models.Article, fuzzy)
+    return parse_equipments(id_list, params)
 
-    # Articles
-    articles = models.Article.objects.filter(name__icontains=text)
-    id_list, locations = parse_items(articles)
 
-    # Equipment
-    equipments = models.Equipment.objects.filter(
-        Q(name__icontains=text) | Q(id__in=id_list)
-        ).prefetch_related("articles", "articles__transactions", "group")
+def parse_equipments(id_list, params):
+    """Return a list of parsed equipments.
+
+    :param list(int) id_list: Ranked list of Equipment ID.
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
 
-    req_qty_list = models.EquipmentReqQty.objects.filter(
-        allowance__in=params.allowances
-        ).prefetch_related('base', 'allowance')
+    :return: List of parsed results, in the same order as ``id_list``. See \
+    ``pharmaship/schemas/search.json`` for details.
+    :rtype: list
+    """
+    result = []
+
+    equipments = models.Equipment.objects.filter(
+        id__in=id_list
+        ).prefetch_related("articles", "group")
+    equipments = sort_results(equipments, id_list)
+
+    # Locations of the articles in stock
+    _id_list, locations = parse_items(
+        article
+        for equipment in equipments
+        for article in equipment.articles.all()
+        if not article.used
+        )
+    # Current quantities of all articles in one query
+    quantities = get_stock(
+        params.content_types["article"],
+        models.Article.objects.filter(parent_id__in=id_list, used=False).values("id")
+        )
+
+    required = get_required_quantities(models.EquipmentReqQty.objects.filter(
+        allowance__in=params.allowances,
+        base_id__in=id_list
+        ))
     if params.setting.has_telemedical:
-        telemedical_list = models.TelemedicalReqQty.objects.filter(
-            allowance__in=params.allowances
-            ).prefetch_related('base', 'allowance')
+        telemedical_required = get_required_quantities(models.TelemedicalReqQty.objects.filter(
+            allowance__in=params.allowances,
+            base_id__in=id_list
+            ))
     else:
-        telemedical_list = []
+        telemedical_required = {}
     if params.setting.has_laboratory:
-        laboratory_list = models.LaboratoryReqQty.objects.filter(
-            allowance__in=params.allowances
-            ).prefetch_related('base', 'allowance')
+        laboratory_required = get_required_quantities(models.LaboratoryReqQty.objects.filter(
+            allowance__in=params.allowances,
+            base_id__in=id_list
+            ))
     else:
-        laboratory_list = []
+        laboratory_required = {}
 
     for item in equipments:
         if item.id not in locations:
@@ -217,7 +437,7 @@ def get_equipments(text, params):
 
         item_locations = location_display(
             locations[item.id].keys(),
-            locations=params.locations
+            location_map=params.location_map
             )
 
         item_dict = {
@@ -232,35 +452,35 @@ def get_equipments(text, params):
             "required": 0
         }
 
-        required_quantity, _allow = req_qty_element(item, req_qty_list)
-        if required_quantity > 0:
+        quantity, _allow = required_quantity(required, item.id)
+        if quantity > 0:
             item_dict["type"].append({
                 "label": _("Equipment"),
                 "name": "equipment"
                 })
-            item_dict["required"] += required_quantity
+            item_dict["required"] += quantity
 
-        if laboratory_list:
-            required_quantity, _allow = req_qty_element(item, laboratory_list)
-            if required_quantity > 0:
+        if laboratory_required:
+            quantity, _allow = required_quantity(laboratory_required, item.id)
+            if quantity > 0:
                 item_dict["type"].append({
                     "label": _("Laboratory"),
                     "name": "laboratory"
                     })
-                item_dict["required"] += required_quantity
+                item_dict["required"] += quantity
 
-        if telemedical_list:
-            required_quantity, _allow = req_qty_element(item, telemedical_list)
-            if required_quantity > 0:
+        if telemedical_required:
+            quantity, _allow = required_quantity(telemedical_required, item.id)
+            if quantity > 0:
                 item_dict["type"].append({
                     "label": _("Telemedical"),
                     "name": "telemedical"
                     })
-                item_dict["required"] += required_quantity
+                item_dict["required"] += quantity
 
         for article in item.articles.all():
             if not article.used:
-                item_dict["quantity"] += get_quantity(article.transactions.all())
+                item_dict["quantity"] += quantities.get(article.id, 0)
             if article.name == item.name:
                 continue
             item_dict["other_names"].append(article.name)
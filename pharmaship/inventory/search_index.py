@@ -0,0 +1,305 @@
+# -*- coding: utf-8; -*-
+"""Full-text search index of molecules and equipments.
+
+The index is a SQLite FTS5 virtual table using the trigram tokenizer (any
+substring of 3 characters or more can be searched). It contains one row per
+:class:`pharmaship.inventory.models.Molecule` and
+:class:`pharmaship.inventory.models.Equipment` instance with their names
+(in all languages), the names of their children (Medicine/Article),
+compositions or packagings, tags and remarks.
+
+Rows are updated by signal handlers (see
+:mod:`pharmaship.inventory.signals`).
+"""
+from django.apps import apps as django_apps
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.utils import DatabaseError
+
+from pharmaship.core.utils import log
+
+TABLE = "inventory_searchindex"
+
+# Indexed columns and their weight in results ranking
+COLUMNS = ("names", "other_names", "details", "tags", "remarks")
+WEIGHTS = (10.0, 5.0, 2.0, 2.0, 1.0)
+
+# Kind of indexed element: (index, parent model, child model, details field)
+# Index is used to compute an unique rowid for each element.
+KINDS = {
+    "molecule": (0, "Molecule", "Medicine", "composition"),
+    "equipment": (1, "Equipment", "Article", "packaging"),
+}
+
+# Minimal length of a word searched with the trigram tokenizer
+MIN_LENGTH = 3
+
+# Suffixes of translated fields ("" is the original field)
+LANGUAGES = ("", "_en", "_fr")
+
+# Availability of the index per database
+_available = {}
+
+
+def create_table(connection):
+    """Create the search index table.
+
+    :param connection: Database connection.
+
+    :return: ``True`` if the table is created, ``False`` if the database \
+    does not support FTS5 with trigram tokenizer.
+    :rtype: bool
+    """
+    if connection.vendor != "sqlite":
+        return False
+
+    query = (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS {0} USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, {1}, tokenize='trigram')"
+    ).format(TABLE, ", ".join(COLUMNS))
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+    except DatabaseError as error:
+        log.warning("Search index not available: %s", error)
+        return False
+
+    _available.clear()
+    return True
+
+
+def drop_table(connection):
+    """Drop the search index table.
+
+    :param connection: Database connection.
+    """
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS {0}".format(TABLE))
+    _available.clear()
+
+
+def is_available(using=DEFAULT_DB_ALIAS):
+    """Check if the search index exists in the database.
+
+    :param str using: Database alias.
+
+    :return: ``True`` if the search index table exists.
+    :rtype: bool
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return False
+
+    key = (using, str(connection.settings_dict["NAME"]))
+    if key not in _available:
+        _available[key] = TABLE in connection.introspection.table_names()
+    return _available[key]
+
+
+def get_rowid(kind, object_id):
+    """Return the rowid of an element in the search index.
+
+    :param str kind: Kind of element (``molecule`` or ``equipment``).
+    :param int object_id: Element ID.
+
+    :return: Unique rowid for the element.
+    :rtype: int
+    """
+    return object_id * len(KINDS) + KINDS[kind][0]
+
+
+def join(values):
+    """Return a text made of unique non-empty values.
+
+    :param list(str) values: Values to join.
+
+    :return: Values separated by new lines.
+    :rtype: str
+    """
+    result = []
+    for value in values:
+        if value and value not in result:
+            result.append(value)
+    return "\n".join(result)
+
+
+def get_documents(kind, id_list=None, apps=django_apps):
+    """Return the indexed text of elements.
+
+    :param str kind: Kind of element (``molecule`` or ``equipment``).
+    :param list(int) id_list: List of elements ID. If ``None``, all \
+    elements are returned.
+    :param apps: Application registry (historical registry in migrations).
+
+    :return: Dictionary of indexed columns values indexed by element ID.
+    :rtype: dict
+    """
+    _index, parent_name, item_name, details = KINDS[kind]
+    parent_model = apps.get_model("inventory", parent_name)
+    item_model = apps.get_model("inventory", item_name)
+    tag_model = parent_model.tag.through
+
+    fields = ["id"]
+    for field in ("name", details, "remark"):
+        fields += [field + suffix for suffix in LANGUAGES]
+
+    parents = parent_model.objects.all()
+    items = item_model.objects.all()
+    tags = tag_model.objects.all()
+    if id_list is not None:
+        parents = parents.filter(id__in=id_list)
+        items = items.filter(parent_id__in=id_list)
+        tags = tags.filter(**{"{0}_id__in".format(kind): id_list})
+
+    result = {}
+    for element in parents.values(*fields):
+        result[element["id"]] = {
+            "names": [element["name" + suffix] for suffix in LANGUAGES],
+            "other_names": [],
+            "details": [element[details + suffix] for suffix in LANGUAGES],
+            "tags": [],
+            "remarks": [element["remark" + suffix] for suffix in LANGUAGES],
+        }
+
+    for parent_id, name, remark in items.values_list("parent_id", "name", "remark"):
+        if parent_id in result:
+            result[parent_id]["other_names"].append(name)
+            result[parent_id]["remarks"].append(remark)
+
+    for parent_id, name in tags.values_list("{0}_id".format(kind), "tag__name"):
+        if parent_id in result:
+            result[parent_id]["tags"].append(name)
+
+    return {
+        key: [join(value[column]) for column in COLUMNS]
+        for key, value in result.items()
+    }
+
+
+def write(kind, id_list, documents, using=DEFAULT_DB_ALIAS):
+    """Replace the rows of elements in the search index.
+
+    :param str kind: Kind of element (``molecule`` or ``equipment``).
+    :param list(int) id_list: List of elements ID to remove from the index.
+    :param dict documents: Indexed columns values of elements to insert \
+    (see :func:`get_documents`).
+    :param str using: Database alias.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            "DELETE FROM {0} WHERE rowid = %s".format(TABLE),
+            [(get_rowid(kind, object_id),) for object_id in id_list]
+            )
+        cursor.executemany(
+            "INSERT INTO {0} (rowid, kind, object_id, {1}) VALUES ({2})".format(
+                TABLE,
+                ", ".join(COLUMNS),
+                ", ".join(["%s"] * (len(COLUMNS) + 3))
+                ),
+            [
+                [get_rowid(kind, object_id), kind, object_id] + values
+                for object_id, values in documents.items()
+            ]
+            )
+
+
+def update(kind, id_list, using=DEFAULT_DB_ALIAS):
+    """Update the rows of elements in the search index.
+
+    Deleted elements are removed from the index.
+
+    :param str kind: Kind of element (``molecule`` or ``equipment``).
+    :param list(int) id_list: List of elements ID.
+    :param str using: Database alias.
+    """
+    if not id_list or not is_available(using):
+        return
+
+    documents = get_documents(kind, id_list)
+    write(kind, id_list, documents, using)
+
+
+def rebuild(apps=django_apps, using=DEFAULT_DB_ALIAS):
+    """Rebuild the whole search index.
+
+    :param apps: Application registry (historical registry in migrations).
+    :param str using: Database alias.
+
+    :return: Number of indexed elements.
+    :rtype: int
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("DELETE FROM {0}".format(TABLE))
+
+    count = 0
+    for kind in KINDS:
+        documents = get_documents(kind, apps=apps)
+        write(kind, [], documents, using)
+        count += len(documents)
+
+    return count
+
+
+def get_like_pattern(word):
+    """Return a LIKE pattern matching a word.
+
+    :param str word: Word to search.
+
+    :return: Pattern with escaped special characters.
+    :rtype: str
+    """
+    for char in ("\\", "%", "_"):
+        word = word.replace(char, "\\" + char)
+    return "%{0}%".format(word)
+
+
+def search(text, kind, using=DEFAULT_DB_ALIAS):
+    """Return the ID of elements matching all words of a text.
+
+    Words of at least ``MIN_LENGTH`` characters are searched in the full-text
+    index and results are ranked (names first, then other names, details,
+    tags and remarks). Shorter words are matched with LIKE queries on the
+    index content.
+
+    :param str text: Text to search.
+    :param str kind: Kind of element (``molecule`` or ``equipment``).
+    :param str using: Database alias.
+
+    :return: Ranked list of elements ID or ``None`` if the index is not \
+    available.
+    :rtype: list(int)
+    """
+    if not is_available(using):
+        return None
+
+    words = text.split()
+    if not words:
+        return []
+
+    query = "SELECT object_id FROM {0} WHERE kind = %s".format(TABLE)
+    query_params = [kind]
+
+    phrases = ['"{0}"'.format(word.replace('"', '""')) for word in words if len(word) >= MIN_LENGTH]
+    if phrases:
+        query += " AND {0} MATCH %s".format(TABLE)
+        query_params.append(" AND ".join(phrases))
+
+    content = " || ' ' || ".join(COLUMNS)
+    for word in words:
+        if len(word) < MIN_LENGTH:
+            query += " AND ({0}) LIKE %s ESCAPE '\\'".format(content)
+            query_params.append(get_like_pattern(word))
+
+    if phrases:
+        query += " ORDER BY bm25({0}, 0, 0, {1})".format(
+            TABLE,
+            ", ".join(str(weight) for weight in WEIGHTS)
+            )
+    else:
+        query += " ORDER BY names"
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(query, query_params)
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,160 @@
+# -*- coding: utf-8; -*-
+"""Signal handlers for Inventory application."""
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from pharmaship.inventory import models
+from pharmaship.inventory import fuzzy_index
+from pharmaship.inventory import search_index
+from pharmaship.inventory.parsers import cache
+from pharmaship.inventory.utils import refresh_stock
+
+# Models used by the parsers: any change clears the parsers cache
+PARSED_MODELS = (
+    models.Allowance,
+    models.Location,
+    models.Molecule,
+    models.Medicine,
+    models.Equipment,
+    models.Article,
+    models.QtyTransaction,
+    models.FirstAidKit,
+    models.FirstAidKitItem,
+    models.RescueBag,
+    models.MoleculeReqQty,
+    models.EquipmentReqQty,
+    models.LaboratoryReqQty,
+    models.TelemedicalReqQty,
+    models.FirstAidKitReqQty,
+    models.RescueBagReqQty,
+)
+
+# Models indexed for fuzzy search: any change clears the fuzzy index
+FUZZY_MODELS = (
+    models.Molecule,
+    models.Medicine,
+    models.Equipment,
+    models.Article,
+    models.Tag,
+    models.Molecule.tag.through,
+    models.Equipment.tag.through,
+)
+
+
+@receiver(pre_save, sender=models.QtyTransaction)
+def get_previous_item(sender, instance, **kwargs):
+    """Store the item related to the transaction before it is overwritten.
+
+    Needed when an existing transaction is re-assigned to another item
+    (fixtures loading with reused primary keys for instance).
+    """
+    instance._previous_item = None
+    if instance.pk is None:
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values_list(
+        "content_type_id", "object_id"
+        ).first()
+    if previous and previous != (instance.content_type_id, instance.object_id):
+        instance._previous_item = previous
+
+
+@receiver(post_save, sender=models.QtyTransaction)
+@receiver(post_delete, sender=models.QtyTransaction)
+def update_stock(sender, instance, **kwargs):
+    """Refresh the stock of the item related to the saved/deleted transaction.
+
+    Raw saves (fixtures loading) are also handled as the stock is not part of
+    serialized data.
+    """
+    refresh_stock(instance.content_type_id, instance.object_id)
+
+    previous = getattr(instance, "_previous_item", None)
+    if previous:
+        refresh_stock(*previous)
+
+
+@receiver([post_save, post_delete])
+def clear_parsers_cache(sender, **kwargs):
+    """Clear the parsers results cache when a parsed model is modified."""
+    if sender in PARSED_MODELS:
+        cache.clear()
+
+
+@receiver(post_save, sender=models.Molecule)
+@receiver(post_delete, sender=models.Molecule)
+def index_molecule(sender, instance, **kwargs):
+    """Update the search index row of the saved/deleted molecule."""
+    search_index.update("molecule", [instance.id])
+
+
+@receiver(post_save, sender=models.Equipment)
+@receiver(post_delete, sender=models.Equipment)
+def index_equipment(sender, instance, **kwargs):
+    """Update the search index row of the saved/deleted equipment."""
+    search_index.update("equipment", [instance.id])
+
+
+@receiver(post_save, sender=models.Medicine)
+@receiver(post_delete, sender=models.Medicine)
+def index_medicine(sender, instance, **kwargs):
+    """Update the search index row of the molecule of the medicine."""
+    search_index.update("molecule", [instance.parent_id])
+
+
+@receiver(post_save, sender=models.Article)
+@receiver(post_delete, sender=models.Article)
+def index_article(sender, instance, **kwargs):
+    """Update the search index row of the equipment of the article."""
+    search_index.update("equipment", [instance.parent_id])
+
+
+@receiver(pre_delete, sender=models.Tag)
+def get_tagged_elements(sender, instance, **kwargs):
+    """Store the elements related to the tag before the relations deletion."""
+    instance._tagged = (
+        list(instance.molecule_set.values_list("id", flat=True)),
+        list(instance.equipment_set.values_list("id", flat=True))
+        )
+
+
+@receiver(post_save, sender=models.Tag)
+@receiver(post_delete, sender=models.Tag)
+def index_tag(sender, instance, **kwargs):
+    """Update the search index rows of the elements related to the tag."""
+    molecules, equipments = getattr(instance, "_tagged", (
+        list(instance.molecule_set.values_list("id", flat=True)),
+        list(instance.equipment_set.values_list("id", flat=True))
+        ))
+    search_index.update("molecule", molecules)
+    search_index.update("equipment", equipments)
+
+
+@receiver(m2m_changed, sender=models.Molecule.tag.through)
+@receiver(m2m_changed, sender=models.Equipment.tag.through)
+def index_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Update the search index rows of the elements with modified tags."""
+    if sender is models.Molecule.tag.through:
+        kind, related = "molecule", "molecule_set"
+    else:
+        kind, related = "equipment", "equipment_set"
+
+    if not reverse:
+        if action.startswith("post_"):
+            search_index.update(kind, [instance.id])
+        return
+
+    # Elements modified from the tag side
+    if action == "pre_clear":
+        instance._cleared = list(getattr(instance, related).values_list("id", flat=True))
+    elif action == "post_clear":
+        search_index.update(kind, getattr(instance, "_cleared", []))
+    elif action in ["post_add", "post_remove"]:
+        search_index.update(kind, list(pk_set))
+
+
+@receiver([post_save, post_delete, m2m_changed])
+def clear_fuzzy_index(sender, **kwargs):
+    """Clear the fuzzy search index when an indexed model is modified."""
+    if sender in FUZZY_MODELS:
+        fuzzy_index.clear()
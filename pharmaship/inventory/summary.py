@@ -0,0 +1,497 @@
+# -*- coding: utf-8; -*-
+"""Inventory summary computed with aggregate queries.
+
+The counters are the same as the ones computed by the dashboard from the
+parsers results (see :mod:`pharmaship.inventory.parsers`) but items are
+aggregated by the database: no element dictionary is created.
+
+Each section summary is a dictionary with the following keys:
+
+    * ``missing``: number of elements with a quantity lower than required,
+    * ``perished``: number of elements with expired items,
+    * ``warning``: number of elements with items reaching near expiry,
+    * ``nc``: number of elements with non-conform items,
+    * ``in_range``: number of elements without any of the above flags,
+    * ``total``: sum of the above counters.
+"""
+import datetime
+
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from pharmaship.inventory import models
+from pharmaship.inventory.parsers.first_aid import subitem_nc
+
+COUNTERS = ["missing", "perished", "warning", "nc", "in_range", "total"]
+
+# Counters of an element without any item
+EMPTY_ELEMENT = {
+    "quantity": 0,
+    "expired": 0,
+    "warning": 0,
+    "nc": 0
+}
+
+
+def new_summary():
+    """Return an empty section summary.
+
+    :return: Dictionary of counters set to zero.
+    :rtype: dict
+    """
+    return dict.fromkeys(COUNTERS, 0)
+
+
+def add_element(summary, required, counters):
+    """Add an element to a section summary.
+
+    :param dict summary: Section summary to update (see :func:`new_summary`).
+    :param int required: Required quantity of the element.
+    :param dict counters: Aggregated counters of the element items \
+    (see :func:`get_items_counters`).
+
+    :return: Updated summary.
+    :rtype: dict
+    """
+    flag = False
+
+    if counters["nc"]:
+        summary["nc"] += 1
+        flag = True
+
+    if required > counters["quantity"]:
+        summary["missing"] += 1
+        flag = True
+
+    if counters["expired"]:
+        summary["perished"] += 1
+    elif counters["warning"]:
+        summary["warning"] += 1
+    elif flag is False:
+        summary["in_range"] += 1
+
+    summary["total"] = sum(summary[key] for key in COUNTERS[:-1])
+    return summary
+
+
+def get_required(req_qty_list, *fields):
+    """Return the required quantities aggregated by element.
+
+    Quantities of additional allowances are summed, the maximum is kept for
+    the others (same rule as
+    :func:`pharmaship.inventory.utils.add_required_quantity`).
+
+    :param django.db.models.query.QuerySet req_qty_list: Set of required \
+    quantities (:class:`pharmaship.inventory.models.BaseReqQty` subclass).
+    :param str fields: Names of the fields identifying the element (for \
+    instance ``base_id``).
+
+    :return: Required quantities indexed by element. Keys are tuples of \
+    ``fields`` values if several fields are given.
+    :rtype: dict
+    """
+    rows = req_qty_list.order_by().values(*fields).annotate(
+        maximum=Coalesce(Max("required_quantity", filter=Q(allowance__additional=False)), 0),
+        additional=Coalesce(Sum("required_quantity", filter=Q(allowance__additional=True)), 0)
+        )
+
+    result = {}
+    for row in rows:
+        if len(fields) > 1:
+            key = tuple(row[field] for field in fields)
+        else:
+            key = row[fields[0]]
+        result[key] = max(row["maximum"], 0) + row["additional"]
+
+    return result
+
+
+def get_items_counters(items, content_type_id, fields, params, nc_filter=None, quantity_filter=None):
+    """Return the counters of items aggregated by element.
+
+    Quantities are read from :class:`pharmaship.inventory.models.QtyStock`.
+    By default, quantities of expired items are not counted.
+
+    :param django.db.models.query.QuerySet items: Set of items \
+    (:class:`pharmaship.inventory.models.BaseItem` subclass).
+    :param int content_type_id: ContentType ID of ``items`` model.
+    :param list fields: Names of the fields identifying the element (for \
+    instance ``parent_id``).
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param django.db.models.Q nc_filter: Filter selecting non-conform items. \
+    If ``None``, non-conformities are not counted.
+    :param django.db.models.Q quantity_filter: Filter selecting the items \
+    whose quantity is counted. If ``None``, not expired items are selected.
+
+    :return: Dictionary of counters (``quantity``, ``expired``, ``warning`` \
+    and ``nc``) indexed by element. Keys are tuples of ``fields`` values if \
+    several fields are given.
+    :rtype: dict
+    """
+    today = params.today
+    warning_date = today + datetime.timedelta(days=params.setting.expire_date_warning_delay)
+
+    stock = models.QtyStock.objects.filter(
+        content_type_id=content_type_id,
+        object_id=OuterRef("id")
+        ).values("quantity")[:1]
+
+    if quantity_filter is None:
+        quantity_filter = Q(exp_date__isnull=True) | Q(exp_date__gt=today)
+
+    aggregates = {
+        "quantity": Coalesce(Sum("stock", filter=quantity_filter), 0),
+        "expired": Count("id", filter=Q(exp_date__lte=today)),
+        "warning": Count("id", filter=Q(exp_date__lte=warning_date)),
+    }
+    if nc_filter is not None:
+        aggregates["nc"] = Count("id", filter=nc_filter)
+
+    rows = items.order_by().annotate(stock=Subquery(stock)).values(*fields).annotate(**aggregates)
+
+    result = {}
+    for row in rows:
+        if len(fields) > 1:
+            key = tuple(row[field] for field in fields)
+        else:
+            key = row[fields[0]]
+        result[key] = {counter: row.get(counter, 0) for counter in EMPTY_ELEMENT}
+
+    return result
+
+
+def get_chest_summary(params, element_ids, required, items, content_type_id, nc_filter, quantity_filter=None, skip_empty=True):
+    """Return the summary of medicines or articles grouped by parent.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param list element_ids: ID list of the parents \
+    (:class:`pharmaship.inventory.models.Molecule` or \
+    :class:`pharmaship.inventory.models.Equipment`) to count.
+    :param dict required: Required quantities indexed by parent ID \
+    (see :func:`get_required`).
+    :param django.db.models.query.QuerySet items: Set of items \
+    (:class:`pharmaship.inventory.models.Medicine` or \
+    :class:`pharmaship.inventory.models.Article`).
+    :param int content_type_id: ContentType ID of ``items`` model.
+    :param django.db.models.Q nc_filter: Filter selecting non-conform items.
+    :param django.db.models.Q quantity_filter: Filter selecting the items \
+    whose quantity is counted (see :func:`get_items_counters`).
+    :param bool skip_empty: If ``True``, elements not required and without \
+    quantity are not counted (as in parsers).
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    result = new_summary()
+
+    counters = get_items_counters(
+        items=items.filter(used=False, parent_id__in=element_ids),
+        content_type_id=content_type_id,
+        fields=["parent_id"],
+        params=params,
+        nc_filter=nc_filter,
+        quantity_filter=quantity_filter
+        )
+
+    for element_id in element_ids:
+        element_counters = counters.get(element_id, EMPTY_ELEMENT)
+        quantity = required.get(element_id, 0)
+        if skip_empty and quantity == 0 and element_counters["quantity"] == 0:
+            continue
+
+        add_element(result, quantity, element_counters)
+
+    return result
+
+
+def get_medicines(params):
+    """Return the summary of medicines.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    element_ids = models.Molecule.objects.filter(
+        allowances__in=params.allowances
+        ).order_by().values_list("id", flat=True).distinct()
+
+    required = get_required(
+        models.MoleculeReqQty.objects.filter(allowance__in=params.allowances),
+        "base_id"
+        )
+
+    return get_chest_summary(
+        params=params,
+        element_ids=list(element_ids),
+        required=required,
+        items=models.Medicine.objects.all(),
+        content_type_id=params.content_types["medicine"],
+        nc_filter=Q(nc_molecule__gt="") | Q(nc_composition__gt="")
+        )
+
+
+def get_articles_quantity_filter(params):
+    """Return the filter of articles whose quantity is counted.
+
+    Expired articles are counted only for non-perishable equipment.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Filter to apply on :class:`pharmaship.inventory.models.Article`.
+    :rtype: django.db.models.Q
+    """
+    return Q(parent__perishable=False) | Q(exp_date__isnull=True) | Q(exp_date__gt=params.today)
+
+
+def get_equipment(params):
+    """Return the summary of equipment.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    element_ids = models.Equipment.objects.filter(
+        allowances__in=params.allowances
+        ).order_by().values_list("id", flat=True).distinct()
+
+    required = get_required(
+        models.EquipmentReqQty.objects.filter(allowance__in=params.allowances),
+        "base_id"
+        )
+
+    return get_chest_summary(
+        params=params,
+        element_ids=list(element_ids),
+        required=required,
+        items=models.Article.objects.all(),
+        content_type_id=params.content_types["article"],
+        nc_filter=Q(nc_packaging__gt=""),
+        quantity_filter=get_articles_quantity_filter(params)
+        )
+
+
+def get_equipment_subset(params, req_qty_model):
+    """Return the summary of equipment required by a specific model.
+
+    All required equipment are counted, even without quantity.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param req_qty_model: Required quantity model \
+    (:class:`pharmaship.inventory.models.LaboratoryReqQty` or \
+    :class:`pharmaship.inventory.models.TelemedicalReqQty`).
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    required = get_required(
+        req_qty_model.objects.filter(allowance__in=params.allowances),
+        "base_id"
+        )
+
+    return get_chest_summary(
+        params=params,
+        element_ids=list(required.keys()),
+        required=required,
+        items=models.Article.objects.all(),
+        content_type_id=params.content_types["article"],
+        nc_filter=Q(nc_packaging__gt=""),
+        quantity_filter=get_articles_quantity_filter(params),
+        skip_empty=False
+        )
+
+
+def get_laboratory(params):
+    """Return the summary of laboratory equipment.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    return get_equipment_subset(params, models.LaboratoryReqQty)
+
+
+def get_telemedical(params):
+    """Return the summary of telemedical equipment.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    return get_equipment_subset(params, models.TelemedicalReqQty)
+
+
+def get_required_elements(params, required):
+    """Return the existing elements of a generic required quantities index.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+    :param dict required: Required quantities indexed by \
+    ``(content_type_id, object_id)`` (see :func:`get_required`).
+
+    :return: List of ``(content_type_id, object_id)`` tuples of existing \
+    :class:`pharmaship.inventory.models.Molecule` and \
+    :class:`pharmaship.inventory.models.Equipment`.
+    :rtype: list(tuple)
+    """
+    result = []
+    for key, model in [("molecule", models.Molecule), ("equipment", models.Equipment)]:
+        content_type_id = params.content_types[key]
+        id_list = [item[1] for item in required if item[0] == content_type_id]
+        existing = model.objects.filter(id__in=id_list).values_list("id", flat=True)
+        result += [(content_type_id, item) for item in existing]
+
+    return result
+
+
+def get_rescue_bag(params):
+    """Return the summary of all rescue bags.
+
+    Elements are the required molecules and equipment plus the parents of the
+    items located in a rescue bag.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    result = new_summary()
+
+    location_ids = list(models.RescueBag.objects.values_list("location_id", flat=True))
+
+    required = get_required(
+        models.RescueBagReqQty.objects.filter(allowance__in=params.allowances),
+        "content_type_id",
+        "object_id"
+        )
+    elements = dict.fromkeys(get_required_elements(params, required))
+
+    sources = [
+        ("molecule", models.Medicine, "medicine", Q(nc_molecule__gt="") | Q(nc_composition__gt="")),
+        ("equipment", models.Article, "article", Q(nc_packaging__gt="")),
+        ]
+    counters = {}
+    for parent_key, model, item_key, nc_filter in sources:
+        parent_type = params.content_types[parent_key]
+        items_counters = get_items_counters(
+            items=model.objects.filter(location_id__in=location_ids, used=False),
+            content_type_id=params.content_types[item_key],
+            fields=["parent_id"],
+            params=params,
+            nc_filter=nc_filter
+            )
+        for parent_id, item in items_counters.items():
+            counters[(parent_type, parent_id)] = item
+            elements[(parent_type, parent_id)] = None
+
+    for element in elements:
+        add_element(
+            result,
+            required.get(element, 0),
+            counters.get(element, EMPTY_ELEMENT)
+            )
+
+    return result
+
+
+def get_first_aid_kit(params):
+    """Return the summary of first aid kits.
+
+    Each required element is counted once per kit.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Section summary.
+    :rtype: dict
+    """
+    result = new_summary()
+
+    kits = models.FirstAidKit.objects.order_by("id")[:params.setting.first_aid_kit]
+    kits = list(kits.values_list("id", "name"))
+    kit_ids = [item[0] for item in kits]
+
+    required = get_required(
+        models.FirstAidKitReqQty.objects.filter(allowance__in=params.allowances),
+        "content_type_id",
+        "object_id"
+        )
+    elements = get_required_elements(params, required)
+
+    items = models.FirstAidKitItem.objects.filter(kit_id__in=kit_ids, used=False)
+    counters = get_items_counters(
+        items=items,
+        content_type_id=params.content_types["firstaidkititem"],
+        fields=["kit_id", "content_type_id", "object_id"],
+        params=params
+        )
+
+    # Non-conformities are stored as JSON strings: only non-empty ones are read
+    nc_items = items.filter(nc__gt="").values_list("kit_id", "content_type_id", "object_id", "nc")
+    non_conform = set()
+    for kit_id, content_type_id, object_id, nc in nc_items:
+        if subitem_nc(nc)[1]:
+            non_conform.add((kit_id, content_type_id, object_id))
+
+    # Kits with the same name are merged by the dashboard: the last one is kept
+    kit_summaries = {}
+    for kit_id, name in kits:
+        kit_summary = new_summary()
+        for element in elements:
+            key = (kit_id,) + element
+            element_counters = dict(counters.get(key, EMPTY_ELEMENT))
+            element_counters["nc"] = int(key in non_conform)
+            add_element(kit_summary, required.get(element, 0), element_counters)
+        kit_summaries[name] = kit_summary
+
+    for kit_summary in kit_summaries.values():
+        for counter in COUNTERS:
+            result[counter] += kit_summary[counter]
+
+    return result
+
+
+SECTIONS = {
+    "molecules": get_medicines,
+    "equipment": get_equipment,
+    "rescue_bag": get_rescue_bag,
+    "first_aid_kit": get_first_aid_kit,
+    "laboratory": get_laboratory,
+    "telemedical": get_telemedical,
+}
+
+
+def get_summary(params):
+    """Return the summary of all inventory sections.
+
+    Laboratory and telemedical sections are computed only if enabled in the
+    settings.
+
+    :param object params: Global Parameters of the application \
+    (:class:`pharmaship.gui.view.GlobalParameters`)
+
+    :return: Section summaries indexed by section name (same names as the \
+    dashboard).
+    :rtype: dict
+    """
+    result = {}
+    for section, function in SECTIONS.items():
+        if section == "laboratory" and not params.setting.has_laboratory:
+            continue
+        if section == "telemedical" and not params.setting.has_telemedical:
+            continue
+        result[section] = function(params)
+
+    return result
@@ -1,44 +1,221 @@
 # -*- coding: utf-8; -*-
 """Utility functions for model data handling."""
-import copy
+import re
 
 from pathlib import PurePath
 
 import django.utils.text
 
-from mptt.utils import get_cached_trees
+from django.db import transaction
+from django.db.models import Q, QuerySet
 
 from pharmaship.core.utils import log
 from pharmaship.inventory import models
 
 
-def get_quantity(transaction_list, item_id):
-    """Get the item quantity from a transaction list.
+def refresh_stock(content_type_id, object_id):
+    """Update the stock of an item from its transactions history.
 
-    Transactions of type 1 ("in") or 8 ("stock count") are setters.
-    Other types are decreasing the value.
+    Only the transactions since the latest setter (type 1 "in" or 8 "stock
+    count") are parsed.
 
-    :param django.db.models.query.QuerySet transaction_list: List of \
-    transactions :mod:`pharmaship.inventory.models.QtyTransaction`.
-    :param int item_id: ID of item
+    If the item has no transaction anymore, its stock record is deleted.
 
-    :return: Quantity of item
+    :param int content_type_id: ContentType ID of the item
+    :param int object_id: ID of the item
+
+    :return: Updated stock instance or ``None`` if the item has no transaction.
+    :rtype: pharmaship.inventory.models.QtyStock or None
+    """
+    transactions = models.QtyTransaction.objects.filter(
+        content_type_id=content_type_id,
+        object_id=object_id
+        )
+
+    last_setter = transactions.filter(
+        transaction_type__in=[1, 8]
+        ).order_by("date", "id").last()
+    if last_setter:
+        transactions = transactions.filter(
+            Q(date__gt=last_setter.date) | Q(date=last_setter.date, id__gte=last_setter.id)
+            )
+
+    quantity = None
+    date = None
+    for transaction_type, value, date in transactions.order_by("date", "id").values_list("transaction_type", "value", "date"):
+        if quantity is None:
+            quantity = 0
+        if transaction_type in [1, 8]:
+            quantity = value
+        else:
+            quantity -= value
+
+    if quantity is None:
+        models.QtyStock.objects.filter(
+            content_type_id=content_type_id,
+            object_id=object_id
+            ).delete()
+        return None
+
+    stock, created = models.QtyStock.objects.update_or_create(
+        content_type_id=content_type_id,
+        object_id=object_id,
+        defaults={
+            "quantity": quantity,
+            "date": date
+        })
+    return stock
+
+
+def rebuild_stock():
+    """Rebuild all stock records from the transactions history.
+
+    All transactions are parsed once, ordered by date.
+
+    :return: Number of stock records created.
     :rtype: int
     """
-    result = 0
-    for transaction in transaction_list:
-        if transaction.object_id == item_id:
-            if transaction.transaction_type in [1, 8]:
-                result = transaction.value
-            else:
-                result -= transaction.value
-    return result
+    result = {}
+    transactions = models.QtyTransaction.objects.order_by("date", "id").values_list(
+        "content_type_id",
+        "object_id",
+        "transaction_type",
+        "value",
+        "date"
+        )
+    for content_type_id, object_id, transaction_type, value, date in transactions.iterator():
+        key = (content_type_id, object_id)
+        if key not in result:
+            result[key] = [0, date]
+
+        if transaction_type in [1, 8]:
+            result[key][0] = value
+        else:
+            result[key][0] -= value
+        result[key][1] = date
+
+    stock_list = []
+    for (content_type_id, object_id), (quantity, date) in result.items():
+        stock_list.append(models.QtyStock(
+            content_type_id=content_type_id,
+            object_id=object_id,
+            quantity=quantity,
+            date=date
+            ))
+
+    with transaction.atomic():
+        models.QtyStock.objects.all().delete()
+        models.QtyStock.objects.bulk_create(stock_list)
+
+    return len(stock_list)
+
+
+def get_stock(content_type_id, items=None):
+    """Return the current quantities of items from their stock records.
+
+    :param int content_type_id: ContentType ID of items
+    :param list items: List of items ID. If ``None``, all items of \
+    ``content_type_id`` are returned.
+
+    :return: Dictionary of quantities. Dict keys are items ID.
+    :rtype: dict
+    """
+    stock_list = models.QtyStock.objects.filter(content_type_id=content_type_id)
+    if items is not None:
+        stock_list = stock_list.filter(object_id__in=items)
+
+    return dict(stock_list.values_list("object_id", "quantity"))
+
+
+def add_required_quantity(index, base_id, req_qty):
+    """Add a required quantity record to a required quantities index.
+
+    Quantities of additional allowances are summed, the maximum is kept for
+    the others.
+
+    :param dict index: Required quantities index to update (see \
+    :func:`get_required_quantities`)
+    :param int base_id: ID of the element the quantity is required for
+    :param req_qty: Required quantity instance (``allowance`` must be \
+    prefetched to avoid one query per call)
+    :type req_qty: pharmaship.inventory.models.BaseReqQty
+
+    :return: Updated entry of the index
+    :rtype: dict
+    """
+    if base_id not in index:
+        index[base_id] = {
+            "additional": 0,
+            "maximum": 0,
+            "detail": []
+        }
+
+    element = index[base_id]
+
+    detail = {
+        "name": req_qty.allowance.name
+        }
+    if req_qty.allowance.additional:
+        element["additional"] += req_qty.required_quantity
+        detail["quantity"] = "+{0}".format(req_qty.required_quantity)
+    else:
+        element["maximum"] = max(element["maximum"], req_qty.required_quantity)
+        detail["quantity"] = req_qty.required_quantity
+
+    element["detail"].append(detail)
+    return element
+
+
+def get_required_quantities(req_qty_list):
+    """Return the required quantities indexed by base element ID.
+
+    The index is built in a single pass and can be shared by all consumers
+    (parsers, search, exports) of the same allowance set.
+
+    :param req_qty_list: Required quantities of \
+    :class:`pharmaship.inventory.models.Molecule` or \
+    :class:`pharmaship.inventory.models.Equipment`
+    :type req_qty_list: django.db.models.query.QuerySet
+
+    :return: Dictionary of required quantities. Keys are base elements ID, \
+    values are dictionaries with ``additional``, ``maximum`` and ``detail`` \
+    keys.
+    :rtype: dict
+    """
+    index = {}
+    if isinstance(req_qty_list, QuerySet):
+        req_qty_list = req_qty_list.select_related('allowance').order_by('allowance_id', 'id')
+
+    for item in req_qty_list:
+        add_required_quantity(index, item.base_id, item)
+
+    return index
+
+
+def required_quantity(index, base_id):
+    """Return the required quantity of an element from an index.
+
+    :param dict index: Required quantities index (see \
+    :func:`get_required_quantities`)
+    :param int base_id: ID of the element
+
+    :return: Computed quantity of the element and the required quantity details
+             (name and quantity of each related allowance)
+    :rtype: tuple(int, list(dict))
+    """
+    if base_id not in index:
+        return 0, []
+
+    element = index[base_id]
+    return element["additional"] + element["maximum"], element["detail"]
 
 
 def req_qty_element(element, req_qty_list):
     """Return the required quantity of an element.
 
-    Use the allowance list and required quantities list.
+    Use the allowance list and required quantities list. When several
+    elements are processed, build once the index with
+    :func:`get_required_quantities` and use :func:`required_quantity`.
 
     :param element: Reference element
     :type element: pharmaship.inventory.models.Equipment or \
@@ -50,26 +227,7 @@ def req_qty_element(element, req_qty_list):
              (name and quantity of each related allowance)
     :rtype: tuple(int, list(dict))
     """
-    # Required quantity
-    maximum = [0, ]
-    additional = 0
-    allowance_list = []
-    for item in req_qty_list:
-        if item.base != element:
-            continue
-        if item.allowance.additional is True:
-            additional += item.required_quantity
-            allowance_list.append({
-                "quantity": "+{0}".format(item.required_quantity),
-                "name": item.allowance.name
-            })
-        else:
-            maximum.append(item.required_quantity)
-            allowance_list.append({
-                "quantity": item.required_quantity,
-                "name": item.allowance.name
-            })
-    return (additional + max(maximum)), allowance_list
+    return required_quantity(get_required_quantities(req_qty_list), element.id)
 
 
 def filepath(instance, filename):
@@ -93,10 +251,45 @@ def filepath(instance, filename):
     return path
 
 
-def get_location_list(show_reserved=True):
+# Content-addressed picture name: SHA-256 checksum and lowercase extension
+PICTURE_NAME = re.compile(r"^[0-9a-f]{64}(\.[0-9a-z]+)?$")
+
+
+def get_picture_name(checksum, filename):
+    """Return the content-addressed name of a picture.
+
+    :param str checksum: SHA-256 checksum of the picture (hexadecimal).
+    :param str filename: Name of the picture file (for its extension).
+
+    :return: Picture name (``<checksum><extension>``).
+    :rtype: str
+    """
+    return "{0}{1}".format(checksum, PurePath(filename).suffix.lower())
+
+
+def is_picture_name(name):
+    """Check if a picture name is content-addressed.
+
+    :param str name: Name of the picture file.
+
+    :return: ``True`` if the name is made of the SHA-256 checksum of the \
+    picture (see :func:`get_picture_name`).
+    :rtype: bool
+    """
+    return PICTURE_NAME.match(name) is not None
+
+
+def get_location_list(show_reserved=True, root=None):
     """Return a list of pseudo-serialized Locations.
 
+    Locations are fetched with one query ordered by tree and ``lft`` (MPTT
+    pre-order), so the sequence of each item is built from its parents
+    sequences indexed by ``level``.
+
     :param bool show_reserved: if ``True``, show locations with id > 100.
+    :param root: Root of the subtree to serialize (``None`` for all \
+    locations). The root sequence starts with its ancestors names.
+    :type root: pharmaship.inventory.models.Location or int
 
     :return: List of serialized :mod:`pharmaship.inventory.models.Location`.
     :rtype: list(dict)
@@ -104,56 +297,69 @@ def get_location_list(show_reserved=True):
     locations = []
 
     location_list = models.Location.objects.all()
-    roots = get_cached_trees(location_list)
+    # Sequences of names of current item parents, indexed by level
+    sequence = []
+    if root is not None:
+        if not isinstance(root, models.Location):
+            root = models.Location.objects.get(id=root)
+        sequence = list(root.get_ancestors().values_list("name", flat=True))
+        location_list = location_list.filter(
+            tree_id=root.tree_id,
+            lft__gte=root.lft,
+            rght__lte=root.rght
+            )
+        # Tree root (ie: default or reserved location)
+        tree_root = root.get_root().id
+    else:
+        tree_root = None
+
+    location_list = location_list.order_by("tree_id", "lft").values_list(
+        "id", "name", "parent_id", "is_rescue_bag", "level"
+        )
+
+    for item_id, name, parent_id, is_rescue_bag, level in location_list:
+        if level == 0:
+            tree_root = item_id
 
-    for root in roots:
         # Do not list the default location
-        if root.id == 0:
+        if tree_root == 0:
             continue
 
-        if show_reserved is False and root.id < 100:
+        if show_reserved is False and tree_root < 100:
             continue
 
+        del sequence[level:]
+        sequence.append(name)
+
         locations.append({
-            "sequence": [root.name],
-            "id": root.id,
-            "parent": None,
-            "rescue_bag": root.is_rescue_bag
+            "sequence": list(sequence),
+            "id": item_id,
+            "parent": parent_id,
+            "rescue_bag": is_rescue_bag
         })
 
-        children = root.get_children()
-        if children:
-            locations += location_iterator([root.name], children, root.id)
-
     return locations
 
 
-def location_iterator(parent, items, parent_id):
-    """Iterate over the Locations tree.
+def get_location_map(locations):
+    """Return a dictionary of pseudo-serialized Locations indexed by ID.
 
-    :param list parent: Sequence of parent serialized locations
-    :param iterator items: Children to serialize (iterator of
-                           :mod:`pharmaship.inventory.models.Location`)
-    :param int parent_id: Parent Location ID
+    The human-readable string of each location ("A > B > C") is computed
+    once. The position of the location in the tree is kept for sorting.
 
-    :return: List of serialized :mod:`pharmaship.inventory.models.Location`.
-    :rtype: list(dict)
-    """
-    locations = []
+    :param list locations: List of serialized Locations as returned by \
+    :func:`get_location_list`.
 
-    for item in items:
-        sequence = copy.deepcopy(parent)
-        sequence.append(item.name)
-
-        locations.append({
-            "sequence": sequence,
-            "id": item.id,
-            "parent": parent_id,
-            "rescue_bag": item.is_rescue_bag
-        })
-
-        children = item.get_children()
-        if children:
-            locations += location_iterator(sequence, children, item.id)
-
-    return locations
+    :return: Dictionary with Location ID as keys and a dictionary with \
+    ``location`` (serialized Location), ``display`` (human-readable \
+    string) and ``order`` (position in the tree) keys as values.
+    :rtype: dict
+    """
+    location_map = {}
+    for index, item in enumerate(locations):
+        location_map[item["id"]] = {
+            "location": item,
+            "display": " > ".join(item["sequence"]),
+            "order": index
+        }
+    return location_map
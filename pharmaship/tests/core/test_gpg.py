@@ -145,3 +145,40 @@ class GPGTestCase(TestCase):
             self.assertIsInstance(result, bytes)
         for item in cm.output:
             self.assertIn("Package signature correct and verified", item)
+
+    def test_check_signature_file(self):
+        """Check signature verification of a file."""
+        directory = Path(settings.BASE_DIR) / "tests/core/keyring/data"
+        directory.mkdir()
+        output = directory / "package.tar"
+        data = b"Some package content\n" * 1000
+
+        key = self.km.gpg.gen_key(self.km.gpg.gen_key_input(
+            name_email="test@example.com",
+            key_type="RSA",
+            key_length=1024,
+            no_protection=True
+            ))
+
+        # All good
+        signed = directory / "package.tar.asc"
+        signed.write_bytes(self.km.gpg.sign(data, keyid=key.fingerprint).data)
+        with self.assertLogs(log, level='INFO') as cm:
+            self.assertTrue(self.km.check_signature_file(signed, output))
+        self.assertIn("Package signature correct and verified", cm.output[0])
+        self.assertEqual(output.read_bytes(), data)
+
+        # No signature: nothing is written
+        output.unlink()
+        unsigned = directory / "unsigned.asc"
+        unsigned.write_bytes(data)
+        with self.assertLogs(log, level='WARNING'):
+            self.assertFalse(self.km.check_signature_file(unsigned, output))
+        self.assertFalse(output.exists())
+
+        # Key not in the keyring anymore: extracted data is removed
+        self.km.gpg.delete_keys(key.fingerprint, secret=True, passphrase="")
+        self.km.gpg.delete_keys(key.fingerprint)
+        with self.assertLogs(log, level='WARNING'):
+            self.assertFalse(self.km.check_signature_file(signed, output))
+        self.assertFalse(output.exists())
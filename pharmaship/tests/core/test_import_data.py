@@ -3,9 +3,12 @@
 from django.test import TestCase
 from django.conf import settings
 
+import hashlib
 import io
 import tarfile
+import tempfile
 from pathlib import Path
+from unittest import mock
 
 from pharmaship.core.utils import log
 
@@ -22,6 +25,26 @@ def remove_keyring(path):
     path.rmdir()
 
 
+def create_package(filename, mode):
+    """Create a package tar file with its MANIFEST."""
+    files = {
+        "package.yaml": b"info: {}\n",
+        "pictures/picture.jpg": b"picture" * 10000,
+    }
+    files["MANIFEST"] = "".join(
+        "{0}  {1}\n".format(hashlib.sha256(data).hexdigest(), name)
+        for name, data in files.items()
+        ).encode("ascii")
+
+    with tarfile.open(filename, mode=mode) as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    return files
+
+
 class ImportDataMethodsTestCase(TestCase):
     """Tests for `core.import_data` methods."""
 
@@ -69,6 +92,20 @@ class ImportDataMethodsTestCase(TestCase):
         result = import_data.check_tarfile(data)
         self.assertIsInstance(result, tarfile.TarFile)
 
+        # Good tar file read from its path
+        result = import_data.check_tarfile(self.assets / "good_tar.tar")
+        self.assertIsInstance(result, tarfile.TarFile)
+        result.close()
+
+    def test_get_hash(self):
+        """Check that a file hash is computed by blocks."""
+        content = b"0123456789" * import_data.CHUNK_SIZE
+        fileobj = io.BytesIO(content)
+        self.assertEqual(
+            import_data.get_hash(fileobj),
+            hashlib.sha256(content).hexdigest()
+            )
+
     def test_check_integrity(self):
         """Verify that tarfile integrity check handles incoherent content."""
         # No MANIFEST
@@ -92,6 +129,67 @@ class ImportDataMethodsTestCase(TestCase):
         for item in cm.output:
             self.assertIn("File corrupted: package.yaml", item)
 
+    def test_check_integrity_all_files(self):
+        """Verify that all missing and corrupted files are reported."""
+        files = {
+            "good": b"good content" * 10000,
+            "corrupted": b"corrupted content",
+            "other": b"",
+        }
+        manifest = [
+            (hashlib.sha256(files["good"]).hexdigest(), "good"),
+            (hashlib.sha256(b"original content").hexdigest(), "corrupted"),
+            (hashlib.sha256(b"").hexdigest(), "other"),
+            (hashlib.sha256(b"").hexdigest(), "missing"),
+        ]
+        files["MANIFEST"] = "".join(
+            "{0}  {1}\n".format(*item) for item in manifest
+            ).encode("ascii")
+
+        for mode in ("w", "w:gz"):
+            content = io.BytesIO()
+            with tarfile.open(fileobj=content, mode=mode) as tar:
+                for name, data in files.items():
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+
+            tar_obj = import_data.check_tarfile(content.getvalue())
+            with self.assertLogs(log, level='ERROR') as cm:
+                self.assertFalse(import_data.check_integrity(tar_obj))
+            self.assertEqual(len(cm.output), 2, mode)
+            self.assertIn("File not in the tar file: missing", cm.output[0])
+            self.assertIn("File corrupted: corrupted", cm.output[1])
+
+    def test_decompress_file(self):
+        """Check compressed packages are hashed from an uncompressed file."""
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory)
+            output = directory / "package.tar"
+            for mode in ("w", "w:gz", "w:xz", "w:bz2"):
+                filename = directory / "package.data"
+                files = create_package(filename, mode)
+
+                data = import_data.decompress_file(filename, output)
+                self.assertEqual(data, output if mode != "w" else filename, mode)
+
+                tar_obj = import_data.check_tarfile(data)
+                with mock.patch.object(
+                        import_data,
+                        "get_member_hash",
+                        wraps=import_data.get_member_hash) as get_member_hash:
+                    self.assertTrue(import_data.check_integrity(tar_obj))
+                # Members are hashed in the thread pool
+                self.assertEqual(get_member_hash.call_count, len(files) - 1, mode)
+                tar_obj.close()
+
+            # Corrupted compressed file
+            filename.write_bytes(b"\x1f\x8b" + b"corrupted" * 10)
+            with self.assertLogs(log, level='ERROR') as cm:
+                self.assertIsNone(import_data.decompress_file(filename, output))
+            self.assertIn("Unable to decompress the package.", cm.output[0])
+            self.assertFalse(output.exists())
+
     def test_load_module(self):
         """Check Pharmaship module import."""
         # Non existing module
@@ -254,3 +352,30 @@ class ImportDataImporterTestCase(TestCase):
         asset = self.assets / "good_tar.tar"
         self.importer.data = asset.read_bytes()
         self.assertTrue(self.importer.check_conformity())
+
+    def test_check_signature_compressed(self):
+        """Check a compressed signed package is decompressed on disk."""
+        gpg = self.importer.km.gpg
+        key = gpg.gen_key(gpg.gen_key_input(
+            name_email="test@example.com",
+            key_type="RSA",
+            key_length=1024,
+            no_protection=True
+            ))
+
+        workdir = self.importer.get_workdir()
+        create_package(workdir / "source.tar.gz", "w:gz")
+        with open(workdir / "source.tar.gz", "rb") as fdesc:
+            signed = gpg.sign_file(fdesc, keyid=key.fingerprint, clearsign=False)
+        (workdir / "source.tar.gz.asc").write_bytes(signed.data)
+
+        self.assertTrue(self.importer.read_package(workdir / "source.tar.gz.asc"))
+        self.assertTrue(self.importer.check_signature())
+        self.assertEqual(self.importer.data, workdir / "package.tar")
+        self.assertFalse((workdir / "signed_data").exists())
+
+        tar_obj = import_data.check_tarfile(self.importer.data)
+        self.assertIsInstance(tar_obj.fileobj, io.BufferedReader)
+        self.assertTrue(import_data.check_integrity(tar_obj))
+        tar_obj.close()
+        self.importer.close()
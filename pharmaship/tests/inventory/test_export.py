@@ -0,0 +1,318 @@
+# -*- coding: utf-8; -*-
+"""Test suite for `export` module."""
+import hashlib
+import io
+import json
+import tarfile
+import tempfile
+
+from pathlib import Path, PurePath
+
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.conf import settings
+from django.db import connection, transaction
+
+from yaml import safe_load
+
+from pharmaship.core import import_data as core_import_data
+from pharmaship.core.config import read_config, load_config
+from pharmaship.core.utils import log
+from pharmaship.core.utils import get_content_types
+from pharmaship.inventory import export
+from pharmaship.inventory import import_data
+from pharmaship.inventory import models
+from pharmaship.inventory import utils
+from pharmaship.tests.inventory.utils import create_mo
+
+
+def get_picture_names(allowance):
+    """Return the names of the pictures of an allowance equipments."""
+    return sorted(set(
+        models.Equipment.objects.filter(allowances=allowance).exclude(
+            picture=""
+            ).values_list("picture", flat=True)
+        ))
+
+
+class ExportTestCase(TestCase):
+    """Tests for `inventory.export` methods."""
+
+    def setUp(self):  # noqa: D102
+        self.assets = Path(settings.BASE_DIR) / "tests/inventory/assets"
+        call_command("loaddata", self.assets / "test.dump.yaml")
+
+        # Empty pictures folder
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.pictures = Path(directory.name)
+        pictures_folder = override_settings(PICTURES_FOLDER=self.pictures)
+        pictures_folder.enable()
+        self.addCleanup(pictures_folder.disable)
+
+    def test_serialize_allowance(self):
+        """Check the number of queries does not depend on the allowance."""
+        content_types = get_content_types()
+
+        for allowance in models.Allowance.objects.exclude(id=0):
+            queries = []
+
+            def count_queries(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_queries):
+                data, equipment_list, molecule_list = export.serialize_allowance(
+                    allowance,
+                    content_types
+                    )
+                export.get_pictures(equipment_list)
+            self.assertLessEqual(len(queries), len(export.REQUIRED) + 2)
+
+            data = dict(data)
+            self.assertNotIn("pk:", data["inventory/molecule_obj.yaml"])
+            self.assertNotIn("pk:", data["inventory/allowance.yaml"])
+            required = json.loads(data["inventory/molecule_reqqty.json"])
+            self.assertEqual(
+                len(required),
+                models.MoleculeReqQty.objects.filter(allowance=allowance).count()
+                )
+
+    def test_create_archive(self):
+        """Check an exported allowance is imported without change."""
+        allowance = models.Allowance.objects.get(name="GSMU")
+        allowance.active = True
+        allowance.save()
+
+        content = io.BytesIO()
+        self.assertTrue(export.create_archive(allowance, content))
+        content.seek(0)
+
+        tar = tarfile.open(fileobj=content)
+        key = {"keyid": allowance.signature}
+        data_import = import_data.DataImport(tar, read_config(), key)
+        self.assertTrue(data_import.update(dry_run=True))
+        self.assertEqual(data_import.changes, {})
+
+    def test_create_archive_compression(self):
+        """Check compressed archives content and MANIFEST."""
+        allowance = models.Allowance.objects.get(name="GSMU")
+        pictures = get_picture_names(allowance)
+        self.assertTrue(pictures)
+
+        # Pictures larger than a block
+        for item in pictures:
+            (self.pictures / item).write_bytes(item.encode() * export.CHUNK_SIZE)
+
+        content = pictures[0].encode() * export.CHUNK_SIZE
+        arcname = utils.get_picture_name(hashlib.sha256(content).hexdigest(), pictures[0])
+
+        for compression in (None,) + export.COMPRESSIONS:
+            content = io.BytesIO()
+            self.assertTrue(export.create_archive(allowance, content, compression))
+
+            tar = core_import_data.check_tarfile(content.getvalue())
+            self.assertTrue(core_import_data.check_integrity(tar))
+            self.assertEqual(
+                tar.extractfile("pictures/" + arcname).read(),
+                pictures[0].encode() * export.CHUNK_SIZE
+                )
+            self.assertNotIn("pictures/" + pictures[0], tar.getnames())
+
+        with self.assertRaises(ValueError):
+            export.create_archive(allowance, io.BytesIO(), "zip")
+
+    def test_export_allowances(self):
+        """Check allowances exported in parallel with a shared catalog."""
+        allowances = models.Allowance.objects.exclude(id=0).order_by("id")
+        content_types = get_content_types()
+        catalog = export.get_catalog()
+        required = export.get_required(allowances, content_types)
+
+        # Preloaded data gives the same result
+        for allowance in allowances:
+            expected = export.serialize_allowance(allowance, content_types)
+            output = export.serialize_allowance(
+                allowance,
+                content_types,
+                catalog=catalog,
+                required=required[allowance.id]
+                )
+            self.assertEqual(output[0], expected[0])
+            self.assertEqual(output[1], list(expected[1]))
+            self.assertEqual(output[2], list(expected[2]))
+
+        with tempfile.TemporaryDirectory() as directory:
+            result = export.export_allowances(allowances, directory, "gz", max_workers=2)
+            self.assertEqual([item[0] for item in result], list(allowances))
+
+            for allowance, filename, duration in result:
+                self.assertEqual(filename.name, export.get_archive_name(allowance, "gz"))
+                self.assertIsInstance(duration, float)
+
+                tar = core_import_data.check_tarfile(filename)
+                self.assertTrue(core_import_data.check_integrity(tar))
+                data = dict(export.serialize_allowance(allowance, content_types)[0])
+                for name, content in data.items():
+                    if isinstance(content, str):
+                        content = content.encode("utf-8")
+                    self.assertEqual(tar.extractfile(name).read(), content)
+                tar.close()
+
+    def test_create_delta_archive(self):
+        """Check a delta package contains only changes and is applied."""
+        allowance = models.Allowance.objects.get(name="GSMU")
+        pictures = get_picture_names(allowance)
+
+        for item in pictures:
+            (self.pictures / item).write_bytes(item.encode())
+
+        # Translation file unchanged between base and delta packages
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        translations_folder = override_settings(TRANSLATIONS_FOLDER=Path(directory.name))
+        translations_folder.enable()
+        self.addCleanup(translations_folder.disable)
+        mo_filename = "locale/fr/LC_MESSAGES/gsmu.mo"
+        mo_path = Path(directory.name) / "fr/LC_MESSAGES/gsmu.mo"
+        mo_path.parent.mkdir(parents=True)
+        mo_path.write_bytes(create_mo({"Delta molecule": "Molécule delta"}))
+
+        base = io.BytesIO()
+        self.assertTrue(export.create_archive(allowance, base))
+        base.seek(0)
+        with tarfile.open(fileobj=base) as tar:
+            self.assertIn(mo_filename, tar.getnames())
+
+        # Base package with the same version
+        base.seek(0)
+        with self.assertLogs(log, level="ERROR") as cm:
+            self.assertFalse(export.create_archive(allowance, io.BytesIO(), base=base))
+        self.assertIn("Base package has the same version", cm.output[0])
+
+        # Base package of another allowance
+        other = io.BytesIO()
+        self.assertTrue(export.create_archive(
+            models.Allowance.objects.exclude(id__in=[0, allowance.id]).first(),
+            other
+            ))
+        other.seek(0)
+        with self.assertLogs(log, level="ERROR") as cm:
+            self.assertFalse(export.create_archive(allowance, io.BytesIO(), base=other))
+        self.assertIn("Base package is not a package of GSMU", cm.output[0])
+
+        # Modify the allowance
+        sid = transaction.savepoint()
+        allowance.version = "2019"
+        allowance.save()
+        req_qty_list = models.MoleculeReqQty.objects.filter(allowance=allowance)
+        req_qty = req_qty_list[0]
+        req_qty.required_quantity += 5
+        req_qty.save()
+        req_qty_list[1].delete()
+        molecule = models.Molecule.objects.create(
+            name="Delta molecule",
+            roa=1,
+            dosage_form=1,
+            composition="1 mg",
+            medicine_list=0,
+            group=models.MoleculeGroup.objects.first()
+            )
+        models.MoleculeReqQty.objects.create(
+            allowance=allowance,
+            base=molecule,
+            required_quantity=3
+            )
+        expected = export.serialize_allowance(allowance, get_content_types())[0]
+
+        delta = io.BytesIO()
+        base.seek(0)
+        self.assertTrue(export.create_archive(allowance, delta, base=base))
+        transaction.savepoint_rollback(sid)
+
+        self.assertLess(len(delta.getvalue()), len(base.getvalue()))
+        tar = core_import_data.check_tarfile(delta.getvalue())
+        self.assertTrue(core_import_data.check_integrity(tar))
+        self.assertFalse([name for name in tar.getnames() if name.startswith("pictures/")])
+        self.assertNotIn(mo_filename, tar.getnames())
+
+        conf = load_config(tar.extractfile("package.yaml").read(), "package.json")
+        self.assertEqual(conf["info"]["version"], "2019")
+        self.assertEqual(conf["info"]["base_version"], "2018")
+
+        molecules = safe_load(tar.extractfile("inventory/molecule_obj.yaml"))
+        self.assertEqual([item["fields"]["name_en"] for item in molecules], ["Delta molecule"])
+        self.assertEqual(safe_load(tar.extractfile("inventory/equipment_obj.yaml")), [])
+        required = json.loads(tar.extractfile("inventory/molecule_reqqty.json").read())
+        self.assertEqual(len(required), 3)
+        self.assertEqual([item.get("removed", False) for item in required], [False, False, True])
+        self.assertEqual(json.loads(tar.extractfile("inventory/equipment_reqqty.json").read()), [])
+
+        # Delta package applied on the base version
+        key = {"keyid": allowance.signature}
+        data_import = import_data.DataImport(tar, conf, key)
+        self.assertTrue(data_import.update())
+        allowance.refresh_from_db()
+        self.assertEqual(allowance.version, "2019")
+        output = export.serialize_allowance(allowance, get_content_types())[0]
+        self.assertEqual(output, expected)
+
+        # New objects are translated with the installed translation file
+        molecule = models.Molecule.objects.get(name_en="Delta molecule")
+        self.assertEqual(molecule.name_fr, "Molécule delta")
+
+        # Not applied on another version
+        data_import = import_data.DataImport(tar, conf, key)
+        with self.assertLogs(log, level="ERROR") as cm:
+            self.assertFalse(data_import.update())
+        self.assertIn("Delta package for version 2018", cm.output[0])
+
+    def test_create_archive_pictures(self):
+        """Check pictures are content-addressed and not extracted twice."""
+        allowance = models.Allowance.objects.get(name="GSMU")
+        allowance.active = True
+        allowance.save()
+        pictures = get_picture_names(allowance)
+
+        # Two pictures with the same content
+        for item in pictures:
+            (self.pictures / item).write_bytes(item.encode())
+        (self.pictures / pictures[1]).write_bytes(pictures[0].encode())
+
+        content = io.BytesIO()
+        self.assertTrue(export.create_archive(allowance, content))
+
+        with tempfile.TemporaryDirectory() as destination:
+            tar = core_import_data.check_tarfile(content.getvalue())
+            self.assertTrue(core_import_data.check_integrity(tar))
+            names = [
+                PurePath(name).name for name in tar.getnames()
+                if name.startswith("pictures/")
+            ]
+            self.assertEqual(len(names), len(pictures) - 1)
+            for name in names:
+                self.assertTrue(utils.is_picture_name(name))
+                self.assertEqual(
+                    hashlib.sha256(tar.extractfile("pictures/" + name).read()).hexdigest(),
+                    PurePath(name).stem
+                    )
+
+            key = {"keyid": allowance.signature}
+            with override_settings(PICTURES_FOLDER=Path(destination)):
+                data_import = import_data.DataImport(tar, read_config(), key)
+                self.assertTrue(data_import.update())
+
+                # Equipments use the content-addressed pictures
+                self.assertEqual(sorted(get_picture_names(allowance)), sorted(names))
+                self.assertEqual(sorted(item.name for item in Path(destination).iterdir()), sorted(names))
+
+                # Pictures already present are not extracted again
+                self.assertEqual(list(import_data.pictures_files(tar, destination)), [])
+
+                # Exported again without change
+                content = io.BytesIO()
+                self.assertTrue(export.create_archive(allowance, content))
+                tar = core_import_data.check_tarfile(content.getvalue())
+                data_import = import_data.DataImport(tar, read_config(), key)
+                self.assertTrue(data_import.update(dry_run=True))
+                self.assertEqual(data_import.changes, {})
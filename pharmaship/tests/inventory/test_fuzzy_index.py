@@ -0,0 +1,50 @@
+# -*- coding: utf-8; -*-
+"""Test suite for `fuzzy_index` module."""
+from pathlib import Path
+
+from django.test import TestCase
+from django.conf import settings
+
+from django.core.management import call_command
+
+from pharmaship.inventory import models
+from pharmaship.inventory import fuzzy_index
+
+
+class FuzzyIndexTestCase(TestCase):
+    """Tests for `inventory.fuzzy_index` methods."""
+
+    def setUp(self):  # noqa: D102
+        self.assets = Path(settings.BASE_DIR) / "tests/inventory/assets"
+        call_command("loaddata", self.assets / "test.dump.yaml")
+
+    def test_fold(self):
+        self.assertEqual(fuzzy_index.fold("Paracétamol"), "paracetamol")
+        self.assertEqual(fuzzy_index.get_words("Unité, ŒIL"), ["unite", "œil"])
+
+    def test_get_score(self):
+        self.assertEqual(fuzzy_index.get_score("paracetamol", "paracetamol"), 1)
+        # Beginning of a word
+        self.assertEqual(fuzzy_index.get_score("parac", "paracetamol"), fuzzy_index.PREFIX_FACTOR)
+        # Typos
+        self.assertGreater(fuzzy_index.get_score("paracetmol", "paracetamol"), 0.9)
+        self.assertIsNotNone(fuzzy_index.get_score("doliprnae", "doliprane"))
+        self.assertIsNone(fuzzy_index.get_score("dol", "amiodarone"))
+
+    def test_search(self):
+        # Accents
+        self.assertEqual(fuzzy_index.search("paracetamol", "molecule")[:2], [80, 81])
+        # Typos in a brand name
+        self.assertEqual(fuzzy_index.search("dolipran", "molecule"), [81])
+        self.assertEqual(fuzzy_index.search("dolipane 500", "molecule"), [81])
+        self.assertEqual(fuzzy_index.search("dolipane", "equipment"), [])
+        self.assertEqual(fuzzy_index.search("xyzxyz", "molecule"), [])
+
+    def test_clear(self):
+        self.assertEqual(fuzzy_index.search("efferalgan", "molecule"), [])
+
+        medicine = models.Medicine.objects.get(id=6)
+        medicine.name = "Efferalgan"
+        medicine.save()
+
+        self.assertEqual(fuzzy_index.search("eferalgan", "molecule"), [81])
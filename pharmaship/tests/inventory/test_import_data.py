@@ -2,6 +2,9 @@
 """Test suite for `import_data` subpackage."""
 import tarfile
 import datetime
+import hashlib
+import io
+import tempfile
 
 from pathlib import Path
 
@@ -11,8 +14,11 @@ from django.conf import settings
 
 from pharmaship.core.utils import log
 from pharmaship.core.config import read_config
+from pharmaship.inventory import fuzzy_index
 from pharmaship.inventory import import_data
 from pharmaship.inventory import models
+from pharmaship.inventory import search_index
+from pharmaship.inventory.parsers import cache
 
 
 class ImportMethodTestCase(TestCase):
@@ -30,6 +36,34 @@ class ImportMethodTestCase(TestCase):
         for item in import_data.pictures_files(tar_file):
             self.assertIn(item.name, allowed_files)
 
+    def test_picture_files_present(self):
+        """Check content-addressed pictures already present are skipped."""
+        checksum = hashlib.sha256(b"picture").hexdigest()
+        files = {
+            "pictures/{0}.jpg".format(checksum): b"picture",
+            "pictures/other.jpg": b"other",
+        }
+        content = io.BytesIO()
+        with tarfile.open(fileobj=content, mode="w") as tar:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+        with tempfile.TemporaryDirectory() as directory:
+            content.seek(0)
+            tar_file = tarfile.open(fileobj=content)
+            names = [item.name for item in import_data.pictures_files(tar_file, directory)]
+            self.assertEqual(names, ["{0}.jpg".format(checksum), "other.jpg"])
+
+            # Pictures already extracted
+            (Path(directory) / "{0}.jpg".format(checksum)).write_bytes(b"picture")
+            (Path(directory) / "other.jpg").write_bytes(b"old")
+            content.seek(0)
+            tar_file = tarfile.open(fileobj=content)
+            names = [item.name for item in import_data.pictures_files(tar_file, directory)]
+            self.assertEqual(names, ["other.jpg"])
+
     def test_get_file(self):
         tar_filename = self.assets / "picture_file.tar"
         tar_file = tarfile.open(tar_filename)
@@ -145,6 +179,48 @@ class ImportMethodTestCase(TestCase):
         for item in output:
             self.assertIsInstance(item, data["model"])
 
+    def test_natural_key_resolver(self):
+        call_command("loaddata", self.assets / "deserialize_test.yaml")
+
+        tar_filename = self.assets / "json_serialize.tar"
+        tar_file = tarfile.open(tar_filename)
+        data = {
+            "filename": "good_molecule.json",
+            "model": models.FirstAidKitReqQty
+        }
+        allowance = models.Allowance.objects.create(
+            name="Allowance Test",
+            author="Pharmaship test",
+            signature="a",
+            date=datetime.datetime.now(),
+            version="Vertest",
+            additional=False,
+            active=True
+        )
+
+        resolver = import_data.NaturalKeyResolver()
+        expected = import_data.deserialize_json_file(data, tar_file, allowance)
+        output = import_data.deserialize_json_file(data, tar_file, allowance, resolver)
+        self.assertEqual(
+            [(item.base, item.required_quantity) for item in output],
+            [(item.base, item.required_quantity) for item in expected]
+            )
+
+        # Cached natural keys: no more query
+        with self.assertNumQueries(0):
+            import_data.deserialize_json_file(data, tar_file, allowance, resolver)
+
+        content = {
+          "name_en": "Unknown",
+          "roa": 5,
+          "dosage_form": 50,
+          "composition_en": "5% - 500 mL"
+        }
+        with self.assertLogs(log, level='ERROR'):
+            self.assertIsNone(resolver.get_base(models.MoleculeReqQty.base, content))
+        with self.assertLogs(log, level='ERROR'):
+            self.assertIsNone(resolver.get_base(models.MoleculeReqQty.base, {"name": "Unknown"}))
+
     def test_required_quantity(self):
         call_command("loaddata", self.assets / "deserialize_test.yaml")
 
@@ -333,3 +409,161 @@ class ImportClassTestCase(TestCase):
         with self.assertLogs(log, level='DEBUG'):
             output = cls.update()
             self.assertTrue(output)
+
+    def test_update_bulk(self):
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "Allowance.yaml"
+            )
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "MoleculeGroup.yaml"
+            )
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "EquipmentGroup.yaml"
+            )
+        tag = models.Tag.objects.create(name="Tag test")
+
+        # Nothing is imported in case of error
+        tar_file = tarfile.open(self.assets / "update_bad_required_qty_01_corrupted.tar")
+        cls = import_data.DataImport(tar_file, self.conf, self.key)
+        with self.assertLogs(log):
+            self.assertFalse(cls.update())
+        self.assertEqual(models.Molecule.objects.count(), 0)
+        self.assertEqual(models.Equipment.objects.count(), 0)
+        self.assertEqual(models.Allowance.objects.count(), 1)
+
+        tar_filename = self.assets / "update_all_good.tar"
+        tar_file = tarfile.open(tar_filename)
+        cls = import_data.DataImport(tar_file, self.conf, self.key)
+        self.assertTrue(cls.update())
+
+        molecule_count = models.Molecule.objects.count()
+        equipment_count = models.Equipment.objects.count()
+        self.assertEqual(molecule_count, len(cls.molecules))
+        self.assertEqual(equipment_count, len(cls.equipments))
+
+        molecule = models.Molecule.objects.get_by_natural_key(
+            name_en="Amoxicillin",
+            roa=1,
+            dosage_form=3,
+            composition_en="500 mg"
+            )
+        self.assertEqual(molecule.group.name, "Infectiology - Parasitology")
+        self.assertEqual(molecule.medicine_list, 1)
+
+        # Modified values are updated, tags are kept
+        molecule.medicine_list = 0
+        molecule.save()
+        molecule.tag.add(tag)
+
+        tar_file = tarfile.open(tar_filename)
+        cls = import_data.DataImport(tar_file, self.conf, self.key)
+        self.assertTrue(cls.update())
+
+        self.assertEqual(models.Molecule.objects.count(), molecule_count)
+        self.assertEqual(models.Equipment.objects.count(), equipment_count)
+        molecule.refresh_from_db()
+        self.assertEqual(molecule.medicine_list, 1)
+        self.assertEqual(list(molecule.tag.all()), [tag])
+        self.assertIn(molecule, cls.molecules)
+
+    def test_update_dry_run(self):
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "Allowance.yaml"
+            )
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "MoleculeGroup.yaml"
+            )
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "EquipmentGroup.yaml"
+            )
+        tar_filename = self.assets / "update_all_good.tar"
+
+        # Dry run: changes are reported, nothing is imported
+        cls = import_data.DataImport(tarfile.open(tar_filename), self.conf, self.key)
+        self.assertTrue(cls.update(dry_run=True))
+        self.assertEqual(models.Molecule.objects.count(), 0)
+        self.assertEqual(models.Allowance.objects.count(), 1)
+        self.assertEqual(cls.changes["Allowance"]["added"], ["GSMU (2018)"])
+        self.assertEqual(
+            len(cls.changes["Molecule"]["added"]),
+            len(cls.molecules)
+            )
+        expected = cls.changes
+
+        cls = import_data.DataImport(tarfile.open(tar_filename), self.conf, self.key)
+        self.assertTrue(cls.update())
+        self.assertEqual(cls.changes, expected)
+        self.assertEqual(models.Molecule.objects.count(), len(cls.molecules))
+        self.assertTrue(models.Allowance.objects.get(name="GSMU").active)
+
+        # Same package: nothing to change
+        cls = import_data.DataImport(tarfile.open(tar_filename), self.conf, self.key)
+        self.assertTrue(cls.update(dry_run=True))
+        self.assertEqual(cls.changes, {})
+
+        # Modified rows are reported and only them are updated
+        req_qty = models.MoleculeReqQty.objects.exclude(allowance_id=0).first()
+        required_quantity = req_qty.required_quantity
+        req_qty.required_quantity += 1
+        req_qty.save()
+        models.EquipmentReqQty.objects.exclude(allowance_id=0).first().delete()
+        id_list = list(models.MoleculeReqQty.objects.values_list("id", flat=True))
+
+        cls = import_data.DataImport(tarfile.open(tar_filename), self.conf, self.key)
+        self.assertTrue(cls.update())
+        self.assertEqual(
+            cls.changes["MoleculeReqQty"]["changed"],
+            ["{0}: {1}".format(req_qty.base, required_quantity)]
+            )
+        self.assertEqual(len(cls.changes["EquipmentReqQty"]["added"]), 1)
+        self.assertEqual(list(cls.changes), ["MoleculeReqQty", "EquipmentReqQty"])
+        self.assertEqual(
+            list(models.MoleculeReqQty.objects.values_list("id", flat=True)),
+            id_list
+            )
+        req_qty.refresh_from_db()
+        self.assertEqual(req_qty.required_quantity, required_quantity)
+
+    def test_update_on_commit(self):
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "Allowance.yaml"
+            )
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "MoleculeGroup.yaml"
+            )
+        call_command(
+            "loaddata",
+            settings.PHARMASHIP_DATA / "EquipmentGroup.yaml"
+            )
+        tar_filename = self.assets / "update_all_good.tar"
+
+        # Dry run: nothing is done after the rollback
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            cls = import_data.DataImport(tarfile.open(tar_filename), self.conf, self.key)
+            self.assertTrue(cls.update(dry_run=True))
+        self.assertEqual(callbacks, [])
+
+        # Caches and indexes are updated once the import is committed
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            cls = import_data.DataImport(tarfile.open(tar_filename), self.conf, self.key)
+            self.assertTrue(cls.update())
+            molecule = models.Molecule.objects.order_by("id").first()
+            if search_index.is_available():
+                self.assertEqual(search_index.search(molecule.name_en, "molecule"), [])
+            cache_generation = cache._generation
+            fuzzy_generation = fuzzy_index._generation
+
+        self.assertIn(cache.clear, callbacks)
+        self.assertIn(fuzzy_index.clear, callbacks)
+        self.assertGreater(cache._generation, cache_generation)
+        self.assertGreater(fuzzy_index._generation, fuzzy_generation)
+        if search_index.is_available():
+            self.assertIn(molecule.id, search_index.search(molecule.name_en, "molecule"))
@@ -183,3 +183,40 @@ class ParserMethodTestCase(TestCase):
             log.error(validator.errors)
             log.debug(output)
         self.assertTrue(result)
+
+    def test_incremental_parser(self):
+        """Check incremental parsing gives the same elements as full parsing."""
+        for parser in [parsers.medicines.parser, parsers.equipment.parser]:
+            output = parser(self.params)
+            for group in output:
+                for element in output[group]:
+                    result = parser(self.params, parent_ids=[element["id"]])
+                    self.assertEqual(result, {group: [element]})
+
+        for parser in [parsers.laboratory.parser, parsers.telemedical.parser]:
+            output = parser(self.params)
+            for element in output:
+                result = parser(self.params, parent_ids=[element["id"]])
+                self.assertEqual(result, [element])
+
+    def test_parser_cache(self):
+        """Check parsers results are cached and cleared on modifications."""
+        output = parsers.medicines.parser(self.params)
+        cached = parsers.medicines.parser(self.params)
+        self.assertEqual(output, cached)
+        self.assertIsNot(output, cached)
+
+        medicine = models.Medicine.objects.filter(used=False).first()
+        group = medicine.parent.group
+        element = [item for item in output[group] if item["id"] == medicine.parent_id][0]
+        quantity = [item for item in element["medicines"] if item["id"] == medicine.id][0]["quantity"]
+
+        models.QtyTransaction.objects.create(
+            transaction_type=8,
+            value=quantity + 10,
+            content_object=medicine
+            )
+        output = parsers.medicines.parser(self.params)
+        element = [item for item in output[group] if item["id"] == medicine.parent_id][0]
+        result = [item for item in element["medicines"] if item["id"] == medicine.id][0]["quantity"]
+        self.assertEqual(result, quantity + 10)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8; -*-
+"""Benchmark suite for `parsers.medicines` and `parsers.equipment` modules."""
+import datetime
+import time
+
+from django.db import transaction
+from django.test import TestCase
+from django.contrib.contenttypes.models import ContentType
+
+from pharmaship.core.utils import log
+from pharmaship.gui.view import GlobalParameters
+from pharmaship.inventory import models
+from pharmaship.inventory import parsers
+from pharmaship.inventory.parsers import cache
+from pharmaship.inventory.utils import rebuild_stock
+
+# Number of parent items (Molecule/Equipment) of the dataset
+PARENTS = 50
+# Number of transactions per child item (Medicine/Article)
+TRANSACTIONS = 20
+# Dataset sizes (number of child items)
+SMALL = 1000
+LARGE = 5000
+# Maximum accepted ratio between large and small dataset parse times.
+# Linear parse gives LARGE / SMALL (5), quadratic parse gives 25.
+MAX_RATIO = 10
+
+
+class ParserBenchmarkTestCase(TestCase):
+    """Check parsers time is linear with the number of items.
+
+    Largest dataset has 5,000 items and 100,000 transactions.
+    """
+
+    def setUp(self):  # noqa: D102
+        self.allowance = models.Allowance.objects.create(
+            name="Benchmark",
+            author="Pharmaship",
+            signature="system",
+            date=datetime.date(2020, 1, 1),
+            version="1",
+            active=True
+            )
+        self.location = models.Location.objects.create(name="Benchmark")
+        self.params = GlobalParameters()
+
+    def create_transactions(self, items):
+        """Create ``TRANSACTIONS`` transactions for each item of `items`."""
+        content_type = ContentType.objects.get_for_model(items[0])
+        date = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+        transactions = []
+        for item in items:
+            transactions.append(models.QtyTransaction(
+                transaction_type=1,
+                value=TRANSACTIONS,
+                content_type=content_type,
+                object_id=item.id
+                ))
+            for _index in range(1, TRANSACTIONS):
+                transactions.append(models.QtyTransaction(
+                    transaction_type=2,
+                    value=1,
+                    content_type=content_type,
+                    object_id=item.id
+                    ))
+        models.QtyTransaction.objects.bulk_create(transactions, batch_size=5000)
+        # Use an unique date for all transactions (auto_now_add is applied)
+        models.QtyTransaction.objects.update(date=date)
+        # Bulk operations do not send signals
+        rebuild_stock()
+        cache.clear()
+
+    def create_medicines(self, count):
+        """Create a dataset of `count` medicines."""
+        group = models.MoleculeGroup.objects.create(name="Benchmark", order=1)
+        molecules = models.Molecule.objects.bulk_create([
+            models.Molecule(
+                name="Molecule {0}".format(index),
+                roa=1,
+                dosage_form=1,
+                composition="{0} mg".format(index),
+                medicine_list=0,
+                group=group
+                )
+            for index in range(PARENTS)
+            ])
+        models.MoleculeReqQty.objects.bulk_create([
+            models.MoleculeReqQty(
+                allowance=self.allowance,
+                base=molecule,
+                required_quantity=10
+                )
+            for molecule in molecules
+            ])
+        medicines = models.Medicine.objects.bulk_create([
+            models.Medicine(
+                name="Medicine {0}".format(index),
+                exp_date=datetime.date(2030, 1, 1),
+                location=self.location,
+                parent=molecules[index % PARENTS]
+                )
+            for index in range(count)
+            ])
+        self.create_transactions(medicines)
+
+    def create_articles(self, count):
+        """Create a dataset of `count` articles."""
+        group = models.EquipmentGroup.objects.create(name="Benchmark", order=1)
+        equipments = models.Equipment.objects.bulk_create([
+            models.Equipment(
+                name="Equipment {0}".format(index),
+                packaging="Box",
+                group=group
+                )
+            for index in range(PARENTS)
+            ])
+        models.EquipmentReqQty.objects.bulk_create([
+            models.EquipmentReqQty(
+                allowance=self.allowance,
+                base=equipment,
+                required_quantity=10
+                )
+            for equipment in equipments
+            ])
+        articles = models.Article.objects.bulk_create([
+            models.Article(
+                name="Article {0}".format(index),
+                exp_date=datetime.date(2030, 1, 1),
+                location=self.location,
+                parent=equipments[index % PARENTS]
+                )
+            for index in range(count)
+            ])
+        self.create_transactions(articles)
+
+    def measure(self, create, parser, count):
+        """Return the parse time of a dataset of `count` items.
+
+        The dataset is deleted after measure.
+        """
+        sid = transaction.savepoint()
+        create(count)
+
+        start = time.perf_counter()
+        output = parser(self.params)
+        duration = time.perf_counter() - start
+
+        total = 0
+        for group in output:
+            for element in output[group]:
+                total += element["quantity"]
+        # One unit left for each item
+        self.assertEqual(total, count)
+
+        transaction.savepoint_rollback(sid)
+        return duration
+
+    def check_linear(self, create, parser):
+        """Compare parse times of small and large datasets."""
+        small = self.measure(create, parser, SMALL)
+        large = self.measure(create, parser, LARGE)
+        log.info("Parse time: %s items in %.3fs, %s items in %.3fs", SMALL, small, LARGE, large)
+        self.assertLess(large / small, MAX_RATIO)
+
+    def test_medicines_parser(self):
+        """Check medicines parse time is linear."""
+        self.check_linear(self.create_medicines, parsers.medicines.parser)
+
+    def test_equipment_parser(self):
+        """Check equipment parse time is linear."""
+        self.check_linear(self.create_articles, parsers.equipment.parser)
@@ -5,6 +5,8 @@ import json
 from pathlib import Path
 
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.conf import settings
 
 from django.core.management import call_command
@@ -42,10 +44,10 @@ class UtilsTestCase(TestCase):
         call_command("loaddata", self.assets / "locations.yaml")
 
         params = GlobalParameters()
-        locations = params.locations
+        location_map = params.location_map
 
         location_id_list = [9, 10]
-        result = search.location_display(location_id_list, locations)
+        result = search.location_display(location_id_list, location_map)
 
         expected_result = [
             'Location A > Location C > Bag One',
@@ -118,6 +120,73 @@ class UtilsTestCase(TestCase):
             log.debug(output)
         self.assertTrue(result)
 
+    def test_iter_search(self):
+        call_command("loaddata", self.assets / "test.dump.yaml")
+        params = GlobalParameters()
+
+        output = list(search.iter_search("Doli", params))
+        # One list of results per set with results (molecules)
+        self.assertEqual(len(output), 1)
+        self.assertEqual([item["id"] for item in output[0]], [81])
+        self.assertEqual(output[0], search.search("Doli", params))
+
+        output = list(search.iter_search("am", params))
+        # Molecules, then equipments
+        self.assertEqual(len(output), 2)
+        self.assertEqual(output[0] + output[1], search.search("am", params))
+
+        self.assertEqual(list(search.iter_search("D", params)), [])
+
+    def test_search_fuzzy(self):
+        call_command("loaddata", self.assets / "test.dump.yaml")
+        params = GlobalParameters()
+
+        self.assertEqual(search.get_molecules("Dolipane", params), [])
+        output = search.get_molecules("Dolipane", params, fuzzy=True)
+        self.assertEqual([item["id"] for item in output], [81])
+
+    def test_search_quantities(self):
+        call_command("loaddata", self.assets / "test.dump.yaml")
+        params = GlobalParameters()
+
+        with CaptureQueriesContext(connection) as narrow:
+            search.search("Doli", params)
+        with CaptureQueriesContext(connection) as broad:
+            output = search.search("am", params)
+
+        # Number of queries does not depend on the number of results
+        self.assertGreater(len(output), 10)
+        self.assertEqual(len(broad), len(narrow))
+
+        for item in search.get_molecules("am", params):
+            medicines = models.Medicine.objects.filter(parent_id=item["id"], used=False)
+            quantity = sum(
+                search.get_quantity(medicine.transactions.all().order_by("date", "id"))
+                for medicine in medicines
+                )
+            self.assertEqual(item["quantity"], quantity)
+
+    def test_search_page(self):
+        call_command("loaddata", self.assets / "test.dump.yaml")
+        params = GlobalParameters()
+        expected = search.search("am", params)
+
+        output = search.search_page("am", params, limit=5, offset=3)
+        self.assertEqual(output["total"], len(expected))
+        self.assertEqual(output["results"], expected[3:8])
+
+        self.assertEqual(search.search("am", params, limit=5, offset=3), expected[3:8])
+
+        # Page including molecules and equipments
+        matches = search.get_matches("am")
+        kinds = [kind for kind, _id in matches]
+        offset = kinds.index("equipment") - 2
+        output = search.search_page("am", params, limit=4, offset=offset)
+        self.assertEqual(output["results"], expected[offset:offset + 4])
+
+        output = search.search_page("am", params, offset=len(expected))
+        self.assertEqual(output["results"], [])
+
     def test_parse_items(self):
         call_command(
             "loaddata",
@@ -0,0 +1,100 @@
+# -*- coding: utf-8; -*-
+"""Test suite for `search_index` module."""
+import datetime
+import tempfile
+
+from pathlib import Path
+
+from django.test import TestCase
+from django.conf import settings
+
+from django.core.management import call_command
+
+from pharmaship.inventory import models
+from pharmaship.inventory import search_index
+from pharmaship.tests.inventory.utils import create_mo
+
+
+class SearchIndexTestCase(TestCase):
+    """Tests for `inventory.search_index` methods."""
+
+    def setUp(self):  # noqa: D102
+        self.assets = Path(settings.BASE_DIR) / "tests/inventory/assets"
+        call_command("loaddata", self.assets / "test.dump.yaml")
+
+    def test_is_available(self):
+        self.assertTrue(search_index.is_available())
+
+    def test_search(self):
+        # Brand name of a medicine
+        self.assertEqual(search_index.search("doli", "molecule"), [81])
+        self.assertEqual(search_index.search("doli", "equipment"), [])
+        # Words may be in different columns
+        self.assertEqual(search_index.search("paracétamol 500 mg", "molecule")[0], 81)
+        # Short words only
+        self.assertIn(81, search_index.search("50", "molecule"))
+        self.assertEqual(search_index.search("", "molecule"), [])
+
+    def test_ranking(self):
+        molecule = models.Molecule.objects.get(id=81)
+        models.Medicine.objects.create(
+            name="Amiodarone generic",
+            exp_date=datetime.date(2030, 1, 1),
+            parent=molecule,
+            location_id=110
+            )
+
+        output = search_index.search("amiodarone", "molecule")
+        # Molecules names first, then medicine name
+        self.assertIn(8, output)
+        self.assertEqual(output[-1], 81)
+
+    def test_signals(self):
+        molecule = models.Molecule.objects.get(id=81)
+        medicine = models.Medicine.objects.get(id=6)
+
+        medicine.name = "Efferalgan"
+        medicine.save()
+        self.assertEqual(search_index.search("doli", "molecule"), [])
+        self.assertEqual(search_index.search("efferal", "molecule"), [81])
+
+        molecule.name_fr = "Acétaminophène"
+        molecule.save()
+        self.assertEqual(search_index.search("acétamin", "molecule"), [81])
+
+        tag = models.Tag.objects.create(name="Antalgic")
+        molecule.tag.add(tag)
+        self.assertEqual(search_index.search("antalgic", "molecule"), [81])
+        tag.delete()
+        self.assertEqual(search_index.search("antalgic", "molecule"), [])
+
+        molecule.delete()
+        self.assertEqual(search_index.search("efferal", "molecule"), [])
+
+    def test_translate_allowance(self):
+        allowance = models.Allowance.objects.get(name="GSMU")
+        molecule = models.Molecule.objects.filter(allowances=allowance).first()
+        self.assertEqual(search_index.search("Traduction française", "molecule"), [])
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = Path(directory) / "fr/LC_MESSAGES/gsmu.mo"
+            filename.parent.mkdir(parents=True)
+            filename.write_bytes(create_mo({molecule.name_en: "Traduction française"}))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command(
+                    "translate_allowance",
+                    "--id={0}".format(allowance.id),
+                    "merge",
+                    "--lang=fr",
+                    "--filename={0}".format(directory)
+                    )
+
+        molecule.refresh_from_db()
+        self.assertEqual(molecule.name_fr, "Traduction française")
+        self.assertEqual(search_index.search("Traduction française", "molecule"), [molecule.id])
+
+    def test_rebuild(self):
+        count = search_index.rebuild()
+        self.assertEqual(count, models.Molecule.objects.count() + models.Equipment.objects.count())
+        self.assertEqual(search_index.search("doli", "molecule"), [81])
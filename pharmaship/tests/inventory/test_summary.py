@@ -0,0 +1,78 @@
+# -*- coding: utf-8; -*-
+"""Test suite for `summary` module."""
+from pathlib import Path
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.conf import settings
+
+from pharmaship.gui.view import GlobalParameters
+from pharmaship.gui.views.dashboard import get_data_items
+from pharmaship.inventory import models
+from pharmaship.inventory import parsers
+from pharmaship.inventory import summary
+from pharmaship.inventory.utils import get_required_quantities
+
+
+def get_counters(data):
+    """Return the counters of a dashboard section data."""
+    result = {}
+    for key in summary.COUNTERS:
+        if isinstance(data[key], list):
+            result[key] = len(data[key])
+        else:
+            result[key] = data[key]
+    return result
+
+
+class SummaryTestCase(TestCase):
+    """Tests for `inventory.summary` methods."""
+
+    def setUp(self):  # noqa: D102
+        self.assets = Path(settings.BASE_DIR) / "tests/inventory/assets"
+
+    def check_sections(self):
+        """Compare summary counters with parsers results."""
+        params = GlobalParameters()
+        params.setting.has_laboratory = True
+        params.setting.has_telemedical = True
+
+        expected = {
+            "molecules": parsers.medicines.parser(params),
+            "equipment": parsers.equipment.parser(params),
+            "laboratory": {"data": parsers.laboratory.parser(params)},
+            "telemedical": {"data": parsers.telemedical.parser(params)},
+            "rescue_bag": {"data": parsers.rescue_bag.parser(params)["all"]["elements"]},
+            "first_aid_kit": {kit["name"]: kit["elements"] for kit in parsers.first_aid.parser(params)},
+        }
+
+        output = summary.get_summary(params)
+        for section in expected:
+            self.assertEqual(
+                output[section],
+                get_counters(get_data_items(expected[section])),
+                section
+                )
+
+    def test_get_summary(self):
+        call_command("loaddata", self.assets / "test.dump.yaml")
+        self.check_sections()
+
+    def test_get_summary_rescue_bag(self):
+        call_command("loaddata", self.assets / "parsers" / "rescue_bag.yaml")
+        self.check_sections()
+
+    def test_get_summary_first_aid_kit(self):
+        call_command("loaddata", self.assets / "parsers" / "first_aid_kit.yaml")
+        self.check_sections()
+
+    def test_get_required(self):
+        call_command("loaddata", self.assets / "test.dump.yaml")
+        allowances = models.Allowance.objects.filter(active=True)
+        req_qty_list = models.MoleculeReqQty.objects.filter(allowance__in=allowances)
+
+        output = summary.get_required(req_qty_list, "base_id")
+
+        index = get_required_quantities(req_qty_list)
+        for base_id, element in index.items():
+            self.assertEqual(output[base_id], element["maximum"] + element["additional"])
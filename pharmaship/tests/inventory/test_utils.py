@@ -6,6 +6,7 @@ from pathlib import Path
 
 from django.test import TestCase
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 
 from django.core.management import call_command
 
@@ -36,6 +37,18 @@ class UtilsTestCase(TestCase):
         res = utils.filepath(obj, filename)
         self.assertEqual(res, output)
 
+    def test_get_picture_name(self):
+        """Check content-addressed picture names."""
+        checksum = "0123456789abcdef" * 4
+        name = utils.get_picture_name(checksum, "dummy_filename.PNG")
+        self.assertEqual(name, checksum + ".png")
+        self.assertTrue(utils.is_picture_name(name))
+        self.assertTrue(utils.is_picture_name(checksum))
+
+        self.assertFalse(utils.is_picture_name("dummy_filename.png"))
+        self.assertFalse(utils.is_picture_name(checksum[1:] + ".png"))
+        self.assertFalse(utils.is_picture_name("../" + name))
+
     def test_get_location_list(self):
         raw_schema = (settings.VALIDATOR_PATH / "location_list.json").read_text()
 
@@ -57,6 +70,30 @@ class UtilsTestCase(TestCase):
         dict_result = {"data": result}
         self.assertTrue(validator.validate(dict_result))
 
+    def test_get_location_list_subtree(self):
+        """Check the serialization of a locations subtree."""
+        call_command("loaddata", self.assets / "locations.yaml")
+
+        locations = utils.get_location_list()
+        root = models.Location.objects.get(id=3)
+        result = utils.get_location_list(root=root)
+        expected = [item for item in locations if item["sequence"][:2] == ["Location A", "Location C"]]
+        self.assertEqual(result, expected)
+        self.assertEqual(result[0]["id"], 3)
+        self.assertEqual(utils.get_location_list(root=3), expected)
+
+    def test_get_location_map(self):
+        """Check locations are indexed by ID with their display string."""
+        call_command("loaddata", self.assets / "locations.yaml")
+
+        locations = utils.get_location_list()
+        result = utils.get_location_map(locations)
+        self.assertEqual(len(result), len(locations))
+        self.assertEqual(result[9]["display"], "Location B > Location 3b")
+        self.assertEqual(result[10]["display"], "Location A > Location C > Bag One")
+        self.assertEqual(result[10]["location"]["id"], 10)
+        self.assertLess(result[10]["order"], result[9]["order"])
+
     def test_req_qty_element(self):
         """Check result from a specific dataset."""
         call_command("loaddata", self.assets / "req_qty_test.yaml")
@@ -78,3 +115,50 @@ class UtilsTestCase(TestCase):
         element = models.Molecule.objects.get(id=3)
         total_quantity, detail = utils.req_qty_element(element, req_qty_list)
         self.assertEqual(total_quantity, 0)
+
+    def test_get_required_quantities(self):
+        """Check the required quantities index from a specific dataset."""
+        call_command("loaddata", self.assets / "req_qty_test.yaml")
+        allowances = models.Allowance.objects.filter(active=True)
+        req_qty_list = models.MoleculeReqQty.objects.filter(
+            allowance__in=allowances
+            )
+
+        index = utils.get_required_quantities(req_qty_list)
+        self.assertEqual(sorted(index.keys()), [1, 2])
+
+        total_quantity, detail = utils.required_quantity(index, 1)
+        self.assertEqual(total_quantity, 150)
+        self.assertEqual(len(detail), 3)
+
+        total_quantity, detail = utils.required_quantity(index, 3)
+        self.assertEqual(total_quantity, 0)
+        self.assertEqual(detail, [])
+
+    def test_get_stock(self):
+        """Check stock is kept up-to-date with transactions."""
+        call_command("loaddata", self.assets / "search_transactions.yaml")
+        medicine = models.Medicine.objects.get(id=1)
+        content_type = ContentType.objects.get_for_model(medicine)
+
+        result = utils.get_stock(content_type.id, [medicine.id])
+        self.assertEqual(result, {medicine.id: 17})
+
+        models.QtyTransaction.objects.create(
+            transaction_type=2,
+            value=7,
+            content_object=medicine
+            )
+        self.assertEqual(medicine.get_quantity(), 10)
+
+        models.QtyTransaction.objects.filter(transaction_type=8).delete()
+        self.assertEqual(medicine.get_quantity(), 3)
+
+        # Rebuild from transactions history
+        models.QtyStock.objects.all().delete()
+        self.assertEqual(utils.get_stock(content_type.id), {})
+        self.assertEqual(utils.rebuild_stock(), 1)
+        self.assertEqual(medicine.get_quantity(), 3)
+
+        medicine.transactions.all().delete()
+        self.assertEqual(utils.get_stock(content_type.id), {})
@@ -0,0 +1,39 @@
+# -*- coding: utf-8; -*-
+"""Utilities for `inventory` tests."""
+import struct
+
+
+def create_mo(messages):
+    """Return the content of a GNU gettext message catalog (``.mo`` file).
+
+    :param dict messages: Translations indexed by original string.
+
+    :return: Compiled catalog (UTF-8 encoded, without hash table).
+    :rtype: bytes
+    """
+    messages = dict(messages)
+    messages[""] = "Content-Type: text/plain; charset=UTF-8\n"
+    keys = sorted(messages)
+    originals = [key.encode("utf-8") for key in keys]
+    translations = [messages[key].encode("utf-8") for key in keys]
+
+    # Header, then tables of (length, offset) of original and translated
+    # strings, then strings (NUL terminated)
+    offset = 28 + 16 * len(keys)
+    tables = []
+    data = b""
+    for strings in (originals, translations):
+        table = []
+        for item in strings:
+            table.append((len(item), offset + len(data)))
+            data += item + b"\0"
+        tables.append(table)
+
+    header = struct.pack(
+        "<7I", 0x950412de, 0, len(keys), 28, 28 + 8 * len(keys), 0, 0
+        )
+    content = header
+    for table in tables:
+        for length, position in table:
+            content += struct.pack("<2I", length, position)
+    return content + data